@@ -0,0 +1,261 @@
+"""自适应选题
+
+根据逐题统计为每个用户挑选下一道题，让练习集中在薄弱的章节和容易错的题目上。
+
+统计分两层，都在每次作答后增量更新：
+    全体用户  每道题的作答次数、失误数和平均用时，失误率即题目难度
+    单个用户  每道题和每章的作答次数、失误数
+
+答错记1次失误；答对但用时超过该题平均用时的两倍记半次失误。
+
+用户对某道题的权重是其失误率的估计：作答次数少时向题目难度收缩。
+选题分两步：先按“章节失误率的平方 × 章内权重之和”抽一章，再在章内按权重抽一题。
+每个用户的题目权重保存在树状数组（Fenwick 树）中，题目按id排序，同一章是连续的一段，
+章内抽样和单题更新都是 O(log n)，各章权重之和随更新同步维护，抽章只需遍历章节。
+刚作答过的题目进入冷却队列，权重暂时为0，避免同一道题反复出现。
+
+每个用户模型包含几个与题库等长的数组，只保留最近使用的 MAX_USERS 个；
+被淘汰的用户下次选题时从存储中的作答记录重建（冷却队列随之清空）。
+
+题目统计用 array 保存，不依赖 NumPy。
+"""
+import random
+import threading
+from array import array
+from collections import OrderedDict, deque
+
+from question_store import NUMBER_BITS
+
+# 题目难度的先验：相当于每道题已有 PRIOR_ATTEMPTS 次作答、失误率 PRIOR_DIFFICULTY
+PRIOR_ATTEMPTS = 2.0
+PRIOR_DIFFICULTY = 0.3
+# 用户失误率向题目难度收缩的强度
+SHRINK = 3.0
+# 答对的题目仍保留的最低权重，保证偶尔复习
+MIN_WEIGHT = 0.02
+SLOW_FACTOR = 2.0
+# 章节薄弱度的指数，越大越集中在最薄弱的章节
+CHAPTER_FOCUS = 2.0
+COOLDOWN = 10
+# 内存中最多保留的用户模型数
+MAX_USERS = 256
+
+
+class FenwickTree:
+    """支持单点修改、前缀和与按前缀和查找的树状数组"""
+
+    def __init__(self, weights):
+        n = len(weights)
+        self.values = array('d', weights)
+        tree = array('d', bytes(8 * (n + 1)))
+        for i, w in enumerate(self.values, 1):
+            tree[i] += w
+            parent = i + (i & -i)
+            if parent <= n:
+                tree[parent] += tree[i]
+        self._tree = tree
+        self._top = 1 << n.bit_length() if n else 0
+
+    def __len__(self):
+        return len(self.values)
+
+    def set(self, i, weight):
+        """把第 i 项设为 weight，返回变化量"""
+        delta = weight - self.values[i]
+        if delta:
+            self.values[i] = weight
+            tree = self._tree
+            n = len(tree) - 1
+            i += 1
+            while i <= n:
+                tree[i] += delta
+                i += i & -i
+        return delta
+
+    def prefix(self, i):
+        """前 i 项之和"""
+        total = 0.0
+        tree = self._tree
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, x):
+        """前缀和超过 x 的最小下标"""
+        tree = self._tree
+        n = len(tree) - 1
+        pos = 0
+        step = self._top
+        while step:
+            nxt = pos + step
+            if nxt <= n and tree[nxt] <= x:
+                pos = nxt
+                x -= tree[nxt]
+            step >>= 1
+        return min(pos, n - 1)
+
+
+class QuestionStats:
+    """全体用户的逐题统计，与题库的题目顺序对齐"""
+
+    def __init__(self, store):
+        self.store = store
+        n = len(store)
+        self.attempts = array('I', bytes(4 * n))
+        self.misses = array('d', bytes(8 * n))
+        self.timed = array('I', bytes(4 * n))
+        self.time_sum = array('d', bytes(8 * n))
+
+    def load(self, rows):
+        """载入 storage.answer_stats() 的汇总结果"""
+        for qid, attempts, wrong, timed, time_sum in rows:
+            i = self.store.position(qid)
+            if i is not None:
+                self.attempts[i] += attempts
+                self.misses[i] += wrong
+                self.timed[i] += timed
+                self.time_sum[i] += time_sum
+
+    def difficulty(self, i):
+        return ((self.misses[i] + PRIOR_ATTEMPTS * PRIOR_DIFFICULTY)
+                / (self.attempts[i] + PRIOR_ATTEMPTS))
+
+    def mean_time(self, i):
+        return self.time_sum[i] / self.timed[i] if self.timed[i] else None
+
+    def miss(self, i, correct, seconds):
+        """本次作答计几次失误"""
+        if not correct:
+            return 1.0
+        mean = self.mean_time(i)
+        if seconds is not None and mean is not None and seconds > SLOW_FACTOR * mean:
+            return 0.5
+        return 0.0
+
+    def record(self, i, miss, seconds):
+        self.attempts[i] += 1
+        self.misses[i] += miss
+        if seconds is not None:
+            self.timed[i] += 1
+            self.time_sum[i] += seconds
+
+
+class UserModel:
+    """一个用户的逐题、逐章统计和抽样权重"""
+
+    def __init__(self, stats, rows=()):
+        self.stats = stats
+        store = stats.store
+        n = len(store)
+        self.attempts = array('I', bytes(4 * n))
+        self.misses = array('d', bytes(8 * n))
+        self.chapter_attempts = {}
+        self.chapter_misses = {}
+        for qid, attempts, wrong, _, _ in rows:
+            i = store.position(qid)
+            if i is not None:
+                self.attempts[i] += attempts
+                self.misses[i] += wrong
+                chapter = qid >> NUMBER_BITS
+                self.chapter_attempts[chapter] = self.chapter_attempts.get(chapter, 0) + attempts
+                self.chapter_misses[chapter] = self.chapter_misses.get(chapter, 0) + wrong
+
+        self.tree = FenwickTree([self.weight(i) for i in range(n)])
+        self.chapter_sums = {}
+        for chapter in store.chapters():
+            start, end = store.chapter_range(chapter)
+            self.chapter_sums[chapter] = self.tree.prefix(end) - self.tree.prefix(start)
+        self.cooldown = deque()
+
+    def weight(self, i):
+        """该用户在第 i 题上的失误率估计"""
+        prior = self.stats.difficulty(i)
+        return max(MIN_WEIGHT, (self.misses[i] + SHRINK * prior) / (self.attempts[i] + SHRINK))
+
+    def chapter_weakness(self, chapter):
+        rate = (self.chapter_misses.get(chapter, 0) + 1) / (self.chapter_attempts.get(chapter, 0) + 2)
+        return rate ** CHAPTER_FOCUS
+
+    def _set(self, i, weight):
+        chapter = self.stats.store.ids()[i] >> NUMBER_BITS
+        self.chapter_sums[chapter] += self.tree.set(i, weight)
+
+    def pick(self, rng, chapter=None):
+        """按权重抽一道题，返回其位置；没有可选的题目时返回None"""
+        chapters = [chapter] if chapter is not None else list(self.chapter_sums)
+        masses = [self.chapter_weakness(c) * self.chapter_sums.get(c, 0.0) for c in chapters]
+        total = sum(masses)
+        if total <= 0:
+            return None
+        x = rng.random() * total
+        for c, mass in zip(chapters, masses):
+            if x < mass or c == chapters[-1]:
+                break
+            x -= mass
+        start, end = self.stats.store.chapter_range(c)
+        base = self.tree.prefix(start)
+        i = self.tree.find(base + rng.random() * self.chapter_sums[c])
+        return min(max(i, start), end - 1)
+
+    def record(self, i, miss):
+        self.attempts[i] += 1
+        self.misses[i] += miss
+        chapter = self.stats.store.ids()[i] >> NUMBER_BITS
+        self.chapter_attempts[chapter] = self.chapter_attempts.get(chapter, 0) + 1
+        self.chapter_misses[chapter] = self.chapter_misses.get(chapter, 0) + miss
+
+        # 刚作答的题目冷却一段时间，期满后按最新统计恢复权重
+        self._set(i, 0.0)
+        self.cooldown.append(i)
+        if len(self.cooldown) > COOLDOWN:
+            j = self.cooldown.popleft()
+            if j not in self.cooldown:
+                self._set(j, self.weight(j))
+
+
+class AdaptiveSelector:
+    """为每个用户选题；统计可从存储后端的作答记录载入"""
+
+    def __init__(self, store, storage=None, max_users=MAX_USERS):
+        self.store = store
+        self.storage = storage
+        self.max_users = max_users
+        self.stats = QuestionStats(store)
+        if storage is not None:
+            self.stats.load(storage.answer_stats())
+        self._users = OrderedDict()   # 按最近使用排列
+        self._lock = threading.Lock()
+
+    def user(self, user):
+        with self._lock:
+            model = self._users.get(user)
+            if model is not None:
+                self._users.move_to_end(user)
+                return model
+            rows = self.storage.answer_stats(user) if self.storage is not None else ()
+            model = self._users[user] = UserModel(self.stats, rows)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+            return model
+
+    def pick(self, user, rng=random, chapter=None):
+        """为用户选下一道题，返回题目对象；没有可选的题目时返回None"""
+        model = self.user(user)
+        with self._lock:
+            i = model.pick(rng, chapter)
+        return None if i is None else self.store[i]
+
+    def record(self, user, qid, correct, seconds=None):
+        """记录一次作答，增量更新全体和该用户的统计"""
+        i = self.store.position(qid)
+        if i is None:
+            return
+        with self._lock:
+            miss = self.stats.miss(i, correct, seconds)
+            self.stats.record(i, miss, seconds)
+            # 不在内存中的用户不必为此建立模型：作答已先写入存储，下次选题时重建的模型中包含这一次
+            model = self._users.get(user)
+            if model is not None:
+                self._users.move_to_end(user)
+                model.record(i, miss)
@@ -0,0 +1,231 @@
+"""预编译题库
+
+把 quiz.md 编译成紧凑的二进制文件（与源文件同名，扩展名为 .bank），
+运行时用 mmap 打开，题目对象只在被访问时才构建。
+同时在旁边生成搜索索引（扩展名为 .search，见 search_index.py）。
+
+用法：
+    python bank_artifact.py                 # 编译 quiz.md 和 api/data/quiz.md
+    python bank_artifact.py a.md b.md       # 编译指定文件
+    python bank_artifact.py --check quiz.md # 只检查产物是否过期
+
+文件格式（小端）：
+    头部    magic(4) 格式版本(u16) 解析器版本(u16) 源文件大小(u64) 源文件mtime_ns(u64)
+            源文件sha256(32) 题目数(u32) 章节表偏移(u32)
+    索引    每题一条：章节(u16) 题号(u32) 答案(u8) 数据偏移(u32)
+    数据    每题五个字符串：题干、A、B、C、D，各自为 u32 长度 + UTF-8
+    章节表  章节数(u16)，每章一条：章节号(u16) + 标题字符串
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import struct
+import sys
+from collections.abc import Sequence
+from pathlib import Path
+
+from question_store import OPTION_KEYS, Question, QuestionStore, question_id
+from quiz_parser import PARSER_VERSION
+
+MAGIC = b'QBNK'
+FORMAT_VERSION = 2
+HEADER = struct.Struct('<4sHHQQ32sII')
+RECORD = struct.Struct('<HIBI')
+LENGTH = struct.Struct('<I')
+CHAPTER = struct.Struct('<H')
+
+
+def artifact_path(source):
+    """返回源文件对应的产物路径"""
+    return Path(source).with_suffix('.bank')
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            h.update(block)
+    return h.digest()
+
+
+def source_unchanged(source, size, mtime_ns, digest):
+    """源文件是否仍是记录时的版本：大小和mtime都对上直接认为一致，否则比较内容哈希"""
+    try:
+        st = Path(source).stat()
+    except OSError:
+        return False
+    if st.st_size != size:
+        return False
+    if st.st_mtime_ns == mtime_ns:
+        return True
+    return file_digest(source) == digest
+
+
+def compile_bank(source, questions, target=None):
+    """把已解析的题目写入产物文件，返回产物路径"""
+    source = Path(source)
+    target = Path(target) if target else artifact_path(source)
+    st = source.stat()
+
+    def pack_string(text):
+        encoded = text.encode('utf-8')
+        return LENGTH.pack(len(encoded)) + encoded
+
+    index = bytearray()
+    data = bytearray()
+    for q in questions:
+        index += RECORD.pack(q.chapter, q.number, q.answer, len(data))
+        for text in (q.text,) + q.options:
+            data += pack_string(text)
+
+    titles = getattr(questions, 'chapter_titles', {})
+    data_start = HEADER.size + len(index)
+    table = bytearray(CHAPTER.pack(len(titles)))
+    for chapter, title in sorted(titles.items()):
+        table += CHAPTER.pack(chapter) + pack_string(title)
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, PARSER_VERSION, st.st_size, st.st_mtime_ns,
+                         file_digest(source), len(questions), data_start + len(data))
+
+    # 先写临时文件再改名，读者不会看到写了一半的产物
+    tmp = target.with_name(target.name + '.tmp')
+    with open(tmp, 'wb') as f:
+        f.write(header)
+        f.write(index)
+        f.write(data)
+        f.write(table)
+    os.replace(tmp, target)
+    return target
+
+
+class BankArtifact(Sequence):
+    """mmap 打开的题库产物，按下标访问时才构建题目对象
+
+    cache 为 False 时不保留构建过的题目对象，每次访问都从映射的页面重新构建，
+    多个进程映射同一个文件时题库只占一份内存（见 shared_bank.py）。
+    """
+
+    def __init__(self, path, cache=True):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (magic, version, self.parser_version, self.source_size, self.source_mtime_ns,
+         self.source_digest, self._count, titles_offset) = HEADER.unpack_from(self._buf, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self._buf.close()
+            raise ValueError(f"不支持的题库产物格式：{self.path}")
+        self._data_start = HEADER.size + RECORD.size * self._count
+        self._cache = [None] * self._count if cache else None
+        self.chapter_titles = self._read_titles(titles_offset)
+
+    def __len__(self):
+        return self._count
+
+    def _read_string(self, offset):
+        (length,) = LENGTH.unpack_from(self._buf, offset)
+        start = offset + LENGTH.size
+        return self._buf[start:start + length].decode('utf-8'), start + length
+
+    def _read_titles(self, offset):
+        titles = {}
+        (count,) = CHAPTER.unpack_from(self._buf, offset)
+        offset += CHAPTER.size
+        for _ in range(count):
+            (chapter,) = CHAPTER.unpack_from(self._buf, offset)
+            titles[chapter], offset = self._read_string(offset + CHAPTER.size)
+        return titles
+
+    def _build(self, i):
+        chapter, number, answer, offset = RECORD.unpack_from(
+            self._buf, HEADER.size + RECORD.size * i)
+        offset += self._data_start
+        text, offset = self._read_string(offset)
+        options = []
+        for _ in OPTION_KEYS:
+            option, offset = self._read_string(offset)
+            options.append(option)
+        return Question(chapter, number, text, options, answer)
+
+    def ids(self):
+        """只读索引区，依次返回每道题的id，不构建题目对象"""
+        for i in range(self._count):
+            chapter, number, _, _ = RECORD.unpack_from(self._buf, HEADER.size + RECORD.size * i)
+            yield question_id(chapter, number)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(self._count))]
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        if self._cache is None:
+            return self._build(i)
+        q = self._cache[i]
+        if q is None:
+            q = self._cache[i] = self._build(i)
+        return q
+
+    def is_fresh(self, source):
+        """产物是否与源文件一致"""
+        if self.parser_version != PARSER_VERSION:
+            return False
+        return source_unchanged(source, self.source_size, self.source_mtime_ns, self.source_digest)
+
+    def close(self):
+        self._buf.close()
+
+
+def open_artifact(source):
+    """打开源文件对应的产物，不存在、损坏或已过期时返回None"""
+    path = artifact_path(source)
+    if not path.exists():
+        return None
+    try:
+        bank = BankArtifact(path)
+    except (OSError, ValueError, struct.error):
+        return None
+    if not bank.is_fresh(source):
+        bank.close()
+        return None
+    return bank
+
+
+def load_bank(source, parse):
+    """优先使用预编译产物，缺失或过期时退回 parse(source) 解析 Markdown"""
+    bank = open_artifact(source)
+    if bank is not None:
+        return QuestionStore(bank, bank.chapter_titles)
+    return parse(source)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='把 quiz.md 编译成二进制题库产物')
+    parser.add_argument('sources', nargs='*', help='题库 Markdown 文件')
+    parser.add_argument('--check', action='store_true', help='只检查产物是否过期')
+    args = parser.parse_args(argv)
+
+    from quiz import load_questions
+    from search_index import SearchIndex, index_path, open_index
+
+    base = Path(__file__).parent
+    sources = args.sources or [base / 'quiz.md', base / 'api' / 'data' / 'quiz.md']
+    stale = 0
+    for source in sources:
+        if args.check:
+            fresh = open_artifact(source) is not None and open_index(source) is not None
+            stale += not fresh
+            print(f"{source}: {'最新' if fresh else '需要重新编译'}")
+            continue
+        questions = load_questions(source)
+        target = compile_bank(source, questions)
+        print(f"已生成 {target}（{len(questions)}题，{target.stat().st_size}字节）")
+        search_target = index_path(source)
+        SearchIndex.build(questions).save(search_target, source)
+        print(f"已生成 {search_target}（{search_target.stat().st_size}字节）")
+    return 1 if stale else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,253 @@
+"""题库查重
+
+合并多个章节的题库后，同一道题常以略有不同的形式重复出现：标点和空白不同、
+着重号（如“不．属．于．”）有无、选项顺序不同。解析器只能去掉题干相同、选项归一化后也相同的题，
+这里找出近似重复的题目，并标出其中答案矛盾的一组。
+
+步骤：
+    归一化    NFKC、转小写、去掉标点空白和着重号；选项文本排序，选项顺序不同的同一道题视为相同
+    去重      题干和选项归一化后完全相同的题目先合并，只保留一个代表参与后续计算
+    MinHash   对题干的字符三元组取单次置换 MinHash（一次哈希分桶取最小值，空桶从相邻桶借值），
+              每道题一次遍历即得到签名
+    LSH       签名分成 BANDS 段，任一段相同即为候选对，只有候选对才计算真实的 Jaccard 相似度
+    聚类      题干相似度不低于阈值、且选项相似度不低于 OPTION_THRESHOLD 的题目用并查集合并成组
+
+只看题干会把“描述梅花的诗句/描述菊花的诗句”这类共用选项的题，以及“南窗/无窗的间距”这类
+共用题干模板的题误判为重复，所以题干和选项都要相近。
+
+整体耗时随题目数线性增长，不需要两两比较。
+一组中正确选项的文本不一致时为 conflict，否则为 duplicate；
+题干中否定字（不、非、未、没）的个数不同时标记 polarity，通常是“属于/不属于”这样的反义题而不是重复。
+
+用法：
+    python bank_lint.py                          # 检查 quiz.md
+    python bank_lint.py a.md b.md --json report.json
+    python bank_lint.py --threshold 0.7
+
+存在答案矛盾（且不是反义题）时退出码为 1，可以在合并题库的流程中作为检查步骤。
+"""
+import argparse
+import json
+import sys
+import zlib
+from pathlib import Path
+
+from question_store import OPTION_KEYS
+from quiz_parser import QuestionParser, normalize
+
+SHINGLE = 3
+# 签名长度 = BANDS × ROWS；候选概率约在 Jaccard = (1/BANDS)^(1/ROWS) ≈ 0.5 处陡升
+BANDS = 16
+ROWS = 4
+NUM_BINS = BANDS * ROWS
+DEFAULT_THRESHOLD = 0.8
+OPTION_THRESHOLD = 0.5
+NEGATIONS = '不非未没'
+
+_EMPTY = 1 << 32
+
+
+def comparison_text(q):
+    """(归一化的题干, 排序后的选项)，选项顺序不同的同一道题得到相同的结果"""
+    options = sorted(normalize(q['options'][k]) for k in OPTION_KEYS)
+    return normalize(q['question']), '|'.join(options)
+
+
+def shingles(text):
+    """字符三元组的32位哈希集合"""
+    if len(text) < SHINGLE:
+        return {zlib.crc32(text.encode('utf-8'))}
+    return {zlib.crc32(text[i:i + SHINGLE].encode('utf-8')) for i in range(len(text) - SHINGLE + 1)}
+
+
+def minhash(hashes):
+    """单次置换 MinHash：哈希值按低位分到 NUM_BINS 个桶，每桶保留高位的最小值
+
+    空桶向后找第一个非空桶借值，并加上距离作区分（旋转补齐），保证相同集合得到相同签名。
+    """
+    bins = [_EMPTY] * NUM_BINS
+    for h in hashes:
+        b = h % NUM_BINS
+        v = h // NUM_BINS
+        if v < bins[b]:
+            bins[b] = v
+    if _EMPTY in bins:
+        # 从后往前绕两圈，第二圈时每个空桶都已知道后面最近的非空桶
+        nearest, distance = None, 0
+        for i in range(2 * NUM_BINS - 1, -1, -1):
+            b = i % NUM_BINS
+            if bins[b] < _EMPTY:
+                nearest, distance = bins[b], 0
+                continue
+            distance += 1
+            if i < NUM_BINS and nearest is not None and bins[b] == _EMPTY:
+                bins[b] = nearest + distance * _EMPTY
+    return bins
+
+
+def candidate_pairs(signatures):
+    """LSH 分段：任一段签名相同的两道题成为候选对"""
+    pairs = set()
+    for band in range(BANDS):
+        buckets = {}
+        lo = band * ROWS
+        for i, sig in enumerate(signatures):
+            buckets.setdefault(tuple(sig[lo:lo + ROWS]), []).append(i)
+        for members in buckets.values():
+            if len(members) < 2:
+                continue
+            for a in range(len(members)):
+                for b in range(a + 1, len(members)):
+                    pairs.add((members[a], members[b]))
+    return pairs
+
+
+def jaccard(a, b):
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+class DisjointSet:
+    def __init__(self, n):
+        self.parent = list(range(n))
+
+    def find(self, x):
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[max(ra, rb)] = min(ra, rb)
+
+
+def read_questions(sources):
+    """逐个解析题库文件，保留所有题目（不去重），记录来源文件和行号"""
+    questions = []
+    for source in sources:
+        parser = QuestionParser()
+        with open(source, 'r', encoding='utf-8') as f:
+            for q in parser.iter_questions(f):
+                q['source'] = str(source)
+                q['line'] = parser.last_line
+                questions.append(q)
+    return questions
+
+
+def find_clusters(questions, threshold=DEFAULT_THRESHOLD):
+    """返回近似重复的题目组：[(题目下标列表, 组内最低的题干相似度)]"""
+    # 归一化后完全相同的题目合并为一个代表
+    exact = {}
+    for i, q in enumerate(questions):
+        exact.setdefault(comparison_text(q), []).append(i)
+    texts = list(exact)
+    groups = list(exact.values())
+
+    sets = [shingles(stem) for stem, _ in texts]
+    signatures = [minhash(s) for s in sets]
+    option_sets = {}
+
+    def options_of(i):
+        if i not in option_sets:
+            option_sets[i] = shingles(texts[i][1])
+        return option_sets[i]
+
+    ds = DisjointSet(len(texts))
+    similar = {}
+    for a, b in candidate_pairs(signatures):
+        similarity = jaccard(sets[a], sets[b])
+        if similarity >= threshold and jaccard(options_of(a), options_of(b)) >= OPTION_THRESHOLD:
+            ds.union(a, b)
+            similar[(a, b)] = similarity
+
+    clusters = {}
+    for i in range(len(texts)):
+        clusters.setdefault(ds.find(i), []).append(i)
+    similarity = {}
+    for (a, b), s in similar.items():
+        root = ds.find(a)
+        similarity[root] = min(similarity.get(root, 1.0), s)
+
+    result = []
+    for root, members in clusters.items():
+        indices = sorted(i for m in members for i in groups[m])
+        if len(indices) > 1:
+            result.append((indices, similarity.get(root, 1.0)))
+    result.sort(key=lambda item: item[0][0])
+    return result
+
+
+def answer_text(q):
+    return q['options'][q['correct_answer']]
+
+
+def lint(questions, threshold=DEFAULT_THRESHOLD):
+    """查重并生成可序列化为 JSON 的报告"""
+    clusters = []
+    for indices, similarity in find_clusters(questions, threshold):
+        members = [questions[i] for i in indices]
+        answers = {normalize(answer_text(q)) for q in members}
+        negations = {sum(normalize(q['question']).count(ch) for ch in NEGATIONS) for q in members}
+        clusters.append({
+            'kind': 'conflict' if len(answers) > 1 else 'duplicate',
+            'polarity': len(negations) > 1,
+            'similarity': round(similarity, 3),
+            'questions': [{
+                'source': q['source'],
+                'line': q['line'],
+                'chapter': q['chapter'],
+                'number': int(q['number']),
+                'question': q['question'],
+                'answer': q['correct_answer'],
+                'answer_text': answer_text(q),
+            } for q in members],
+        })
+    return {
+        'questions': len(questions),
+        'threshold': threshold,
+        'clusters': clusters,
+        'summary': {
+            'clusters': len(clusters),
+            'conflicts': sum(c['kind'] == 'conflict' for c in clusters),
+            'duplicates': sum(c['kind'] == 'duplicate' for c in clusters),
+            'polarity': sum(c['polarity'] for c in clusters),
+        },
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='检查题库中近似重复和答案矛盾的题目')
+    parser.add_argument('sources', nargs='*', help='题库 Markdown 文件，默认为 quiz.md')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='判为重复的最低题干 Jaccard 相似度')
+    parser.add_argument('--json', metavar='FILE', help='把报告写入 JSON 文件（- 为标准输出）')
+    args = parser.parse_args(argv)
+
+    sources = args.sources or [Path(__file__).parent / 'quiz.md']
+    report = lint(read_questions(sources), args.threshold)
+
+    if args.json == '-':
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+        for cluster in report['clusters']:
+            label = '答案矛盾' if cluster['kind'] == 'conflict' else '重复'
+            if cluster['polarity']:
+                label += '（否定词不同，可能是反义题）'
+            print(f"\n{label}，相似度 {cluster['similarity']}：")
+            for q in cluster['questions']:
+                print(f"    {q['source']}:{q['line']} 第{q['chapter']}章第{q['number']}题 "
+                      f"答案{q['answer']}（{q['answer_text']}）{q['question'][:40]}")
+        s = report['summary']
+        print(f"\n共 {report['questions']} 道题，{s['clusters']} 组近似重复，"
+              f"其中答案矛盾 {s['conflicts']} 组，否定词不同 {s['polarity']} 组")
+    blocking = [c for c in report['clusters'] if c['kind'] == 'conflict' and not c['polarity']]
+    return 1 if blocking else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,175 @@
+"""预先生成的题库响应
+
+题库内容在一个版本内不变，只有题目顺序和选项顺序随会话变化。这里把内容和随机化分开：
+    内容    每章一份、整个题库一份按id排序的原始题目 JSON（不含答案，由服务端判分），
+            题库版本变化时生成一次，同时保存 gzip（安装了 brotli 时还有 br）压缩后的字节，请求时直接返回
+    随机化  会话只需要种子决定的题目顺序和每道题的选项布局（见 SessionShuffle.layouts），
+            体积小，客户端在缓存的原始题目上还原出洗牌后的题目
+
+每份内容的 ETag 是正文的 sha256 前缀（强校验），不同压缩方式的字节不同，ETag 加上后缀区分。
+客户端带 If-None-Match 重新请求时返回 304，服务端不做任何序列化。
+URL 带 ?v=<版本> 且与当前内容一致时按不可变资源缓存一年，否则要求每次重新验证。
+
+安装了 orjson 时用它序列化，否则退回标准库 json，两者输出相同的紧凑 UTF-8 字节。
+"""
+import gzip
+import hashlib
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 按优先顺序排列的压缩方式
+ENCODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+REVALIDATE = 'public, no-cache'
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def dumps(obj):
+    """序列化为紧凑的 UTF-8 JSON 字节"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def _compress(encoding, body):
+    if encoding == 'br':
+        return brotli.compress(body, quality=11)
+    # mtime 固定为0，同样的内容总是得到同样的字节
+    return gzip.compress(body, 9, mtime=0)
+
+
+def accepted_encodings(header):
+    """Accept-Encoding 中可用（q 不为0）的压缩方式集合"""
+    result = set()
+    for item in (header or '').split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        q = params.strip()
+        if q.startswith('q='):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding == '*':
+            result.update(ENCODINGS)
+        elif coding:
+            result.add(coding)
+    return result
+
+
+def _tags(header):
+    """If-None-Match 中的实体标签（去掉弱校验前缀 W/）"""
+    return {tag.strip()[2:] if tag.strip().startswith('W/') else tag.strip()
+            for tag in (header or '').split(',') if tag.strip()}
+
+
+class Payload:
+    """一份预先序列化好的响应正文及其压缩版本"""
+    __slots__ = ('body', 'version', 'etag', 'variants')
+
+    def __init__(self, obj):
+        self.body = dumps(obj)
+        self.version = hashlib.sha256(self.body).hexdigest()[:20]
+        self.etag = f'"{self.version}"'
+        # 编码 -> (压缩后的字节, ETag)；压缩后没有变小的不保留
+        self.variants = {}
+        for encoding in ENCODINGS:
+            data = _compress(encoding, self.body)
+            if len(data) < len(self.body):
+                self.variants[encoding] = (data, f'"{self.version}-{encoding}"')
+
+    def select(self, accept_encoding):
+        """按 Accept-Encoding 选出 (正文, ETag, 编码)，不压缩时编码为None"""
+        accepted = accepted_encodings(accept_encoding)
+        for encoding in ENCODINGS:
+            if encoding in accepted and encoding in self.variants:
+                data, etag = self.variants[encoding]
+                return data, etag, encoding
+        return self.body, self.etag, None
+
+    def matches(self, if_none_match):
+        """If-None-Match 是否指向这份内容（任一压缩版本的 ETag 都算）"""
+        tags = _tags(if_none_match)
+        if '*' in tags:
+            return True
+        return self.etag in tags or any(etag in tags for _, etag in self.variants.values())
+
+    def serve(self, if_none_match=None, accept_encoding=None, version=None):
+        """返回 (状态码, 正文, 响应头)，与 Web 框架无关
+
+        version 是 URL 中的 ?v= 参数，与这份内容一致时允许客户端长期缓存。
+        """
+        body, etag, encoding = self.select(accept_encoding)
+        headers = {
+            'ETag': etag,
+            'Cache-Control': IMMUTABLE if version == self.version else REVALIDATE,
+            'Vary': 'Accept-Encoding',
+        }
+        if self.matches(if_none_match):
+            return 304, b'', headers
+        if encoding is not None:
+            headers['Content-Encoding'] = encoding
+        return 200, body, headers
+
+
+class BankPayloads:
+    """一个题库版本的全部预生成响应
+
+    all 是整个题库，chapters 是 {章节号: 该章内容}，manifest 列出每份内容的版本和地址，
+    客户端先取 manifest（很小），再按带版本号的地址取内容，内容未变的章节直接用本地缓存。
+    """
+
+    def __init__(self, questions, prefix='/api/bank'):
+        self.prefix = prefix
+        self.all = Payload({'chapter': None, 'questions': [q.to_dict(reveal=False) for q in questions]})
+        self.chapters = {}
+        entries = []
+        for chapter in questions.chapters():
+            payload = Payload({
+                'chapter': chapter,
+                'title': questions.chapter_title(chapter),
+                'questions': [q.to_dict(reveal=False) for q in questions.in_chapter(chapter)],
+            })
+            self.chapters[chapter] = payload
+            entries.append({
+                'chapter': chapter,
+                'title': questions.chapter_title(chapter),
+                'count': questions.chapter_count(chapter),
+                'version': payload.version,
+                'url': self.url(chapter),
+            })
+        self.version = self.all.version
+        self.manifest = Payload({
+            'version': self.version,
+            'total': len(questions),
+            'url': self.url(),
+            'chapters': entries,
+        })
+
+    def get(self, chapter=None):
+        """指定章节（None 为整个题库）的内容，不存在时返回None"""
+        return self.all if chapter is None else self.chapters.get(chapter)
+
+    def url(self, chapter=None):
+        """带版本号的内容地址"""
+        payload = self.get(chapter)
+        name = 'all' if chapter is None else chapter
+        return f'{self.prefix}/{name}?v={payload.version}'
+
+    def size(self):
+        """全部内容的 (原始字节数, 各压缩方式字节数)"""
+        payloads = [self.all, self.manifest, *self.chapters.values()]
+        raw = sum(len(p.body) for p in payloads)
+        compressed = {encoding: sum(len(p.variants.get(encoding, (p.body,))[0]) for p in payloads)
+                      for encoding in ENCODINGS}
+        return raw, compressed
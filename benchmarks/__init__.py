@@ -0,0 +1,5 @@
+"""性能测试
+
+每个脚本都可以单独运行（python benchmarks/<名称>.py），common 中是共用的合成数据和工具，
+suite 是覆盖解析、选题洗牌和各个接口的综合测试，结果可以保存为 JSON 并与基准对比。
+"""
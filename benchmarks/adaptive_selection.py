@@ -0,0 +1,74 @@
+"""自适应选题的性能和效果测试
+
+在合成的大题库上模拟一个有薄弱章节的学生：
+    性能    每次选题、每次记录作答的耗时（p50 / p99）
+    效果    练习中来自薄弱章节的题目所占比例，与随机出题对比
+
+用法：
+    python benchmarks/adaptive_selection.py
+    python benchmarks/adaptive_selection.py --questions 100000 --picks 5000
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from adaptive_selector import AdaptiveSelector
+from benchmarks.common import percentile
+from question_store import Question, QuestionStore
+
+
+def synthetic_store(n, chapters):
+    per_chapter = -(-n // chapters)
+    questions = [Question(c, k, f"第{c}章第{k}题", ['甲', '乙', '丙', '丁'], 0)
+                 for c in range(1, chapters + 1) for k in range(1, per_chapter + 1)][:n]
+    return QuestionStore(questions)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='自适应选题测试')
+    parser.add_argument('--questions', type=int, default=50000)
+    parser.add_argument('--chapters', type=int, default=100)
+    parser.add_argument('--picks', type=int, default=2000)
+    parser.add_argument('--weak', type=int, default=5, help='薄弱章节数')
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    store = synthetic_store(args.questions, args.chapters)
+    weak = set(rng.sample(store.chapters(), args.weak))
+
+    def answer(q):
+        # 薄弱章节答错率 60%，其他章节 10%；用时 5-30 秒
+        correct = rng.random() >= (0.6 if q.chapter in weak else 0.1)
+        return correct, rng.uniform(5, 30)
+
+    start = time.perf_counter()
+    selector = AdaptiveSelector(store)
+    selector.user('student')
+    print(f"{len(store)}题，{args.chapters}章，初始化 {(time.perf_counter() - start) * 1000:.0f}ms")
+
+    pick_times, record_times = [], []
+    weak_shown = 0
+    for _ in range(args.picks):
+        t = time.perf_counter()
+        q = selector.pick('student', rng)
+        pick_times.append(time.perf_counter() - t)
+
+        correct, seconds = answer(q)
+        weak_shown += q.chapter in weak
+
+        t = time.perf_counter()
+        selector.record('student', q.id, correct, seconds)
+        record_times.append(time.perf_counter() - t)
+
+    print(f"选题 p50 {percentile(pick_times, 0.5) * 1e6:.1f}µs  p99 {percentile(pick_times, 0.99) * 1e6:.1f}µs")
+    print(f"记录 p50 {percentile(record_times, 0.5) * 1e6:.1f}µs  p99 {percentile(record_times, 0.99) * 1e6:.1f}µs")
+
+    random_weak = sum(store[rng.randrange(len(store))].chapter in weak for _ in range(args.picks))
+    print(f"薄弱章节题目占比：自适应 {weak_shown / args.picks:.1%}，随机出题 {random_weak / args.picks:.1%}")
+
+
+if __name__ == '__main__':
+    main()
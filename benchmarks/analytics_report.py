@@ -0,0 +1,113 @@
+"""作答分析的性能测试
+
+生成一个学期全年级规模的合成作答记录（默认 100 万条）写入临时数据库，
+计时首次载入、生成报告，以及追加一批新记录后的增量刷新。
+同时抽查还原后的原选项与 shuffle_service 逐条计算的结果一致。
+
+用法：
+    python benchmarks/analytics_report.py
+    python benchmarks/analytics_report.py --answers 3000000 --users 3000
+"""
+import argparse
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from analytics import AnswerAnalytics
+from question_store import question_id
+from shuffle_service import new_seed, option_permutation, original_index, shuffled_letter
+from storage import open_storage
+
+SESSION_SIZE = 20
+
+
+def fill(storage, rng, users, items, answers, start_ts):
+    """写入 answers 条作答：每个用户能力不同，每道题难度不同，答错时偏向某个固定的干扰项"""
+    ability = [rng.gauss(0, 1) for _ in range(users)]
+    difficulty = {qid: rng.gauss(0, 1) for qid in items}
+    lure = {qid: rng.randrange(3) for qid in items}
+    sessions = []
+    rows = []
+    ts = start_ts
+    for s in range(answers // SESSION_SIZE):
+        user = rng.randrange(users)
+        seed = new_seed()
+        sessions.append((f'user{user}', seed, SESSION_SIZE, ts, ts))
+        for position in range(SESSION_SIZE):
+            qid = rng.choice(items)
+            # 正确选项都是原选项0，错误时 70% 选中该题的“迷惑项”
+            p = 1 / (1 + math.exp(difficulty[qid] - ability[user] - 0.002 * s * SESSION_SIZE / users))
+            if rng.random() < p:
+                choice = 0
+            else:
+                choice = 1 + (lure[qid] if rng.random() < 0.7 else rng.randrange(3))
+            letter = shuffled_letter(option_permutation(seed, qid), choice)
+            rows.append((len(sessions), f'user{user}', qid, letter, int(choice == 0), position, ts,
+                         rng.uniform(5, 40)))
+            ts += 0.1
+    with storage._transaction() as conn:
+        first = conn.execute('SELECT COALESCE(MAX(id), 0) FROM sessions').fetchone()[0]
+        conn.executemany('INSERT INTO sessions (user, seed, total, created, updated) VALUES (?, ?, ?, ?, ?)',
+                         sessions)
+        conn.executemany('INSERT INTO answers (session_id, user, qid, answer, correct, position, ts, elapsed)'
+                         ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                         [(first + r[0],) + r[1:] for r in rows])
+    return ts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='作答分析性能测试')
+    parser.add_argument('--answers', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--questions', type=int, default=2000)
+    parser.add_argument('--increment', type=int, default=10000, help='增量刷新时新增的作答数')
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    items = [question_id(c, n) for c in range(1, 11) for n in range(1, args.questions // 10 + 1)]
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = open_storage(os.path.join(tmp, 'quiz.db'))
+        t = time.perf_counter()
+        ts = fill(storage, rng, args.users, items, args.answers, time.time() - 120 * 86400)
+        print(f"写入 {args.answers} 条作答 {time.perf_counter() - t:.1f}s")
+
+        analytics = AnswerAnalytics(storage)
+        t = time.perf_counter()
+        analytics.refresh()
+        print(f"首次载入 {time.perf_counter() - t:.2f}s")
+
+        t = time.perf_counter()
+        report = analytics.report()
+        print(f"生成报告 {time.perf_counter() - t:.2f}s")
+
+        fill(storage, rng, args.users, items, args.increment, ts)
+        t = time.perf_counter()
+        added = analytics.refresh()
+        print(f"增量刷新 {added} 条 {(time.perf_counter() - t) * 1000:.0f}ms")
+        t = time.perf_counter()
+        report = analytics.report()
+        print(f"再次生成报告 {time.perf_counter() - t:.2f}s，共 {report['answers']} 条")
+
+        # 抽查选项还原
+        c = analytics.columns
+        rows = storage._connection().execute(
+            'SELECT a.qid, a.answer, s.seed FROM answers a JOIN sessions s ON s.id = a.session_id'
+            ' ORDER BY a.id LIMIT 1000').fetchall()
+        expected = [original_index(option_permutation(seed, qid), letter) for qid, letter, seed in rows]
+        print(f"选项还原抽查：{'一致' if list(c.choice[:len(rows)]) == expected else '不一致'}")
+
+        top = report['distractors'][0]
+        print(f"迷惑性最强：{top['key']} 正确答案{top['correct_answer']} "
+              + ' '.join(f"{k}{r:.0%}" for k, r in top['rates'].items()))
+        curve = report['learning_curve']
+        print(f"学习曲线：第1段 {curve[0]['accuracy']:.1%} → 第{len(curve)}段 {curve[-1]['accuracy']:.1%}")
+        storage.close()
+
+
+if __name__ == '__main__':
+    main()
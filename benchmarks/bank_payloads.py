@@ -0,0 +1,78 @@
+"""预生成题库响应的性能测试
+
+在合成题库上对比三种取题方式每次请求的服务端耗时（p50 / p99）和传输字节数：
+    逐次序列化  原 /api/questions 的做法：按种子洗牌后用标准库 json 序列化整个题库
+    预生成内容  从 BankPayloads 取出已压缩的正文（首次请求）
+    重新验证    带 If-None-Match 的重复请求，返回 304
+另外计时生成全部预生成内容的一次性开销，以及随机化部分（/api/shuffle 的响应）的大小。
+
+用法：
+    python benchmarks/bank_payloads.py
+    python benchmarks/bank_payloads.py --questions 100000 --requests 20
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import bank_payloads
+from bank_payloads import BankPayloads, dumps
+from benchmarks.common import percentile, synthetic_store, timed
+from shuffle_service import SessionShuffle
+
+
+def report(label, times, size):
+    print(f"{label}：p50 {percentile(times, 0.5) * 1000:.2f}ms  p99 {percentile(times, 0.99) * 1000:.2f}ms"
+          f"  {size / 1024:.0f}KB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='预生成题库响应性能测试')
+    parser.add_argument('--questions', type=int, default=10000)
+    parser.add_argument('--chapters', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    store = synthetic_store(rng, args.questions, args.chapters)
+    print(f"{len(store)}题，{args.chapters}章，JSON 编码器："
+          f"{'orjson' if bank_payloads.orjson is not None else '标准库 json'}，"
+          f"压缩方式：{'/'.join(bank_payloads.ENCODINGS)}")
+
+    t = time.perf_counter()
+    payloads = BankPayloads(store)
+    raw, compressed = payloads.size()
+    print(f"生成全部预生成内容 {time.perf_counter() - t:.2f}s，原始 {raw / 1e6:.1f}MB，"
+          + '，'.join(f"{k} {v / 1e6:.1f}MB" for k, v in compressed.items()))
+
+    def legacy():
+        session = SessionShuffle(rng.getrandbits(32), store.ids())
+        return json.dumps({'questions': session.page(store, 0, len(session))}).encode('utf-8')
+
+    times, body = timed(legacy, args.requests)
+    report('逐次序列化（整个题库）', times, len(body))
+
+    accept = 'gzip, deflate, br'
+    times, (_, body, headers) = timed(lambda: payloads.all.serve(None, accept), args.requests)
+    report('预生成内容（整个题库）', times, len(body))
+    etag = headers['ETag']
+    times, (status, body, _) = timed(lambda: payloads.all.serve(etag, accept), args.requests)
+    report(f'重新验证（{status}）', times, len(body))
+
+    chapter = store.chapters()[0]
+    times, (_, body, _) = timed(lambda: payloads.get(chapter).serve(None, accept), args.requests)
+    report('预生成内容（一章）', times, len(body))
+
+    def shuffle_layer():
+        session = SessionShuffle(rng.getrandbits(32), store.ids())
+        return dumps({'order': session.order.tolist(), 'layouts': session.layouts()})
+
+    times, body = timed(shuffle_layer, args.requests)
+    report('随机化部分（整个题库）', times, len(body))
+
+
+if __name__ == '__main__':
+    main()
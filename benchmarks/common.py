@@ -0,0 +1,108 @@
+"""性能测试共用的合成数据和工具
+
+合成题库的汉字按 Zipf 分布随机抽取，题干、选项长度与 quiz.md 接近；
+可以直接生成题目对象（QuestionStore），也可以写成 quiz.md 格式的文件，用来测试解析。
+"""
+import asyncio
+import json
+import random
+import time
+from urllib.parse import urlencode
+
+from question_store import OPTION_KEYS, Question, QuestionStore
+
+CHARSET = [chr(0x4e00 + i) for i in range(3000)]
+ZIPF = [1 / (i + 1) for i in range(len(CHARSET))]
+
+# 标准规模的合成题库
+SIZES = {'1k': 1000, '10k': 10000, '100k': 100000}
+
+
+def text(rng, low, high):
+    return ''.join(rng.choices(CHARSET, ZIPF, k=rng.randint(low, high)))
+
+
+def synthetic_questions(rng, n, chapters):
+    """n 道题平均分到各章，返回 Question 列表（按id排序）"""
+    per_chapter = -(-n // chapters)
+    return [Question(c, k, text(rng, 15, 40), [text(rng, 2, 10) for _ in OPTION_KEYS], rng.randrange(4))
+            for c in range(1, chapters + 1) for k in range(1, per_chapter + 1)][:n]
+
+
+def synthetic_store(rng, n, chapters):
+    return QuestionStore(synthetic_questions(rng, n, chapters))
+
+
+def to_markdown(questions, titles=None):
+    """按 quiz.md 的格式输出题目"""
+    lines = []
+    chapter = None
+    for q in questions:
+        if q.chapter != chapter:
+            chapter = q.chapter
+            title = (titles or {}).get(chapter) or f'合成章节{chapter}'
+            lines.append(f'**第{chapter}章 {title}**\n')
+        lines.append(f'{q.number}. 题目：{q.text}')
+        lines.extend(f'    * {key}、{option}' for key, option in zip(OPTION_KEYS, q.options))
+        lines.append(f'    答案：{q.correct_answer}\n')
+    return '\n'.join(lines) + '\n'
+
+
+def write_bank(path, n, chapters=20, seed=0):
+    """写一个 n 道题的 quiz.md 格式题库，返回对应的 QuestionStore"""
+    store = synthetic_store(random.Random(seed), n, chapters)
+    path.write_text(to_markdown(store), encoding='utf-8')
+    return store
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def asgi_request(app, method, path, params=None, body=None, headers=()):
+    """在进程内直接调用 ASGI 应用，返回 (状态码, 响应正文)"""
+    payload = b'' if body is None else json.dumps(body).encode('utf-8')
+    raw_headers = [(b'host', b'testserver'), *((k.encode(), v.encode()) for k, v in headers)]
+    if body is not None:
+        raw_headers += [(b'content-type', b'application/json'),
+                        (b'content-length', str(len(payload)).encode())]
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+        'method': method, 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+        'root_path': '', 'query_string': urlencode(params or {}).encode(),
+        'headers': raw_headers, 'client': ('127.0.0.1', 1), 'server': ('testserver', 80),
+    }
+    sent = False
+    status = None
+    chunks = []
+
+    async def receive():
+        nonlocal sent
+        if sent:
+            # 请求体已经读完，之后只会在断开时返回
+            await asyncio.sleep(3600)
+            return {'type': 'http.disconnect'}
+        sent = True
+        return {'type': 'http.request', 'body': payload, 'more_body': False}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body':
+            chunks.append(message.get('body', b''))
+
+    await app(scope, receive, send)
+    return status, b''.join(chunks)
+
+
+def timed(fn, repeat):
+    """重复调用 fn，返回 (每次耗时列表, 最后一次的结果)"""
+    times = []
+    result = None
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t)
+    return times, result
@@ -0,0 +1,129 @@
+"""事件循环延迟测试
+
+在合成题库上启动 API（执行启动事件，包括预热），同时运行：
+    监测任务  每 --interval 毫秒醒来一次，记录实际醒来时间比预期晚了多少（事件循环延迟）
+    并发请求  --concurrency 个客户端在 --duration 秒内轮流请求各个接口
+
+事件循环被同步的文件读写或解析阻塞时，所有正在处理的请求都要等待，延迟会明显升高。
+延迟的 p99 超过 --threshold 毫秒时退出码为 1。
+
+用法：
+    python benchmarks/loop_lag.py
+    python benchmarks/loop_lag.py --questions 100000 --concurrency 100 --threshold 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+import quiz_app
+from benchmarks.common import asgi_request, percentile, write_bank
+from session_token import sign_user
+from structured_log import configure
+
+
+# 所有客户端都以同一个用户的身份请求
+IDENTITY = (('cookie', f'{quiz_app.USER_COOKIE}={sign_user("lag")}'),)
+
+
+def routes(store):
+    q = store[0]
+    chapter = q.chapter
+    return [
+        ('GET', '/api/chapters', None, None),
+        ('GET', f'/api/questions/{chapter}', None, None),
+        ('GET', '/api/session/start', {'chapter': chapter}, None),
+        ('GET', '/api/session/page', {'cursor': f'{12345:x}-0-20'}, None),
+        ('GET', '/api/bank', None, None),
+        ('GET', '/api/shuffle', {'chapter': chapter}, None),
+        ('GET', '/api/search', {'q': q.text[:4]}, None),
+        ('GET', '/api/adaptive/next', None, None),
+        ('POST', '/api/grade', None,
+         {'seed': 12345, 'answers': [{'id': p.id, 'answer': 'A'} for p in store[:20]]}),
+        ('POST', '/api/wrong-questions', None, {str(q.id): q.to_dict()}),
+        ('GET', '/api/wrong-questions', None, None),
+        ('GET', '/api/review/due', None, None),
+    ]
+
+
+async def monitor(interval, lags, stop):
+    while not stop.is_set():
+        t = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - t - interval)
+
+
+async def client(app, plan, offset, deadline, latencies, errors):
+    i = offset
+    while time.perf_counter() < deadline:
+        method, path, params, body = plan[i % len(plan)]
+        i += 1
+        t = time.perf_counter()
+        status, _ = await asgi_request(app, method, path, params, body, IDENTITY)
+        latencies.append(time.perf_counter() - t)
+        errors.append(status != 200)
+
+
+async def run(app, args, store):
+    lags = []
+    stop = asyncio.Event()
+    watcher = asyncio.create_task(monitor(args.interval / 1000, lags, stop))
+
+    # 启动事件（预热）期间同样监测
+    t = time.perf_counter()
+    await app.router.startup()
+    startup = time.perf_counter() - t
+    startup_lag = max(lags, default=0.0)
+
+    plan = routes(store)
+    for method, route, params, body in plan:
+        await asgi_request(app, method, route, params, body, IDENTITY)
+    lags.clear()
+
+    latencies = []
+    errors = []
+    deadline = time.perf_counter() + args.duration
+    await asyncio.gather(*(client(app, plan, i, deadline, latencies, errors)
+                           for i in range(args.concurrency)))
+    stop.set()
+    await watcher
+    await app.router.shutdown()
+    return startup, startup_lag, lags, latencies, sum(errors)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='事件循环延迟测试')
+    parser.add_argument('--questions', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--interval', type=float, default=10.0, help='监测间隔（毫秒）')
+    parser.add_argument('--threshold', type=float, default=100.0, help='允许的延迟 p99（毫秒）')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'quiz.md'
+        store = write_bank(path, args.questions)
+        app = quiz_app.create_app(bank_path=path, db_path=Path(tmp) / 'quiz.db')
+        configure('WARNING', 0.0, open(os.devnull, 'w'))
+        startup, startup_lag, lags, latencies, errors = asyncio.run(run(app, args, store))
+
+    p99 = percentile(lags, 0.99) * 1000
+    print(f"{len(store)}题，启动 {startup:.2f}s（期间最大延迟 {startup_lag * 1000:.0f}ms）："
+          + '，'.join(f"{step} {ms:.0f}ms" for step, ms in quiz_app.warmup_timings.items()))
+    print(f"{args.concurrency}个并发客户端 {args.duration:.0f}s：{len(latencies)}个请求"
+          f"（{len(latencies) / args.duration:.0f}/s），失败 {errors}，"
+          f"请求延迟 p50 {percentile(latencies, 0.5) * 1000:.1f}ms p99 {percentile(latencies, 0.99) * 1000:.1f}ms")
+    print(f"事件循环延迟：p50 {percentile(lags, 0.5) * 1000:.1f}ms  p99 {p99:.1f}ms  "
+          f"最大 {max(lags) * 1000:.1f}ms")
+    if p99 > args.threshold:
+        print(f"事件循环延迟 p99 超过 {args.threshold:.0f}ms")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,102 @@
+"""题库查重的性能和召回测试
+
+生成合成题库，其中一部分题目被复制后加入扰动：改标点和空白、加着重号、打乱选项顺序，
+其中一半复制品的答案改成另一个选项（答案矛盾）。计时 bank_lint 的查重，
+统计找回的复制品比例、答案矛盾的识别情况和误报的组数，
+并在小规模样本上计时两两比较，按平方关系估算全量耗时作对比。
+
+用法：
+    python benchmarks/near_duplicates.py
+    python benchmarks/near_duplicates.py --questions 100000 --copies 0.05
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from bank_lint import comparison_text, find_clusters, jaccard, lint, shingles
+from benchmarks.common import text
+from question_store import OPTION_KEYS
+
+def perturb(rng, q, conflict):
+    """同一道题的另一种写法：标点、空白、着重号和选项顺序不同"""
+    stem = q['question']
+    i = rng.randrange(len(stem))
+    stem = stem[:i] + '．'.join(stem[i:i + 3]) + '．' + stem[i + 3:]
+    stem = stem.replace('（ ）', '()') + rng.choice(['', '。', ' ？'])
+    order = list(OPTION_KEYS)
+    rng.shuffle(order)
+    options = {new: q['options'][old] for new, old in zip(OPTION_KEYS, order)}
+    answer = OPTION_KEYS[order.index(q['correct_answer'])]
+    if conflict:
+        answer = rng.choice([k for k in OPTION_KEYS if k != answer])
+    return dict(q, question=stem, options=options, correct_answer=answer, origin=q['id'])
+
+
+def synthetic_bank(rng, n, copy_rate):
+    questions = []
+    for i in range(n):
+        questions.append({
+            'id': i, 'source': 'synthetic.md', 'line': i, 'chapter': 1 + i % 20, 'number': str(i),
+            'question': text(rng, 15, 40) + '（ ）',
+            'options': {k: text(rng, 2, 10) for k in OPTION_KEYS},
+            'correct_answer': rng.choice(OPTION_KEYS),
+        })
+    copies = [perturb(rng, questions[i], conflict=rng.random() < 0.5)
+              for i in rng.sample(range(n), int(n * copy_rate))]
+    return questions + copies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='题库查重测试')
+    parser.add_argument('--questions', type=int, default=50000)
+    parser.add_argument('--copies', type=float, default=0.02, help='被复制并扰动的题目比例')
+    parser.add_argument('--sample', type=int, default=2000, help='两两比较的样本题数')
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    bank = synthetic_bank(rng, args.questions, args.copies)
+    copies = [q for q in bank if 'origin' in q]
+
+    start = time.perf_counter()
+    report = lint(bank)
+    elapsed = time.perf_counter() - start
+
+    found = 0
+    conflicts_found = 0
+    false_clusters = 0
+    for cluster, (indices, _) in zip(report['clusters'], find_clusters(bank)):
+        origins = {bank[i].get('origin', bank[i]['id']) for i in indices}
+        if len(origins) == 1:
+            found += len(indices) - 1
+            conflicts_found += cluster['kind'] == 'conflict'
+        else:
+            false_clusters += 1
+    expected_conflicts = sum(bank[q['origin']]['correct_answer'] != perturbed_answer(bank, q) for q in copies)
+
+    print(f"{len(bank)}道题（其中{len(copies)}道是扰动后的复制品），查重 {elapsed:.2f}s")
+    print(f"找回复制品 {found}/{len(copies)}，答案矛盾 {conflicts_found}/{expected_conflicts}，"
+          f"误报 {false_clusters} 组")
+
+    sample = bank[:args.sample]
+    sets = [shingles(comparison_text(q)[0]) for q in sample]
+    start = time.perf_counter()
+    for a in range(len(sets)):
+        for b in range(a + 1, len(sets)):
+            jaccard(sets[a], sets[b])
+    pairwise = time.perf_counter() - start
+    print(f"两两比较 {len(sample)}道题 {pairwise:.2f}s，"
+          f"按平方估算 {len(bank)}道题约 {pairwise * (len(bank) / len(sample)) ** 2:.0f}s")
+
+
+def perturbed_answer(bank, copy):
+    """复制品的正确选项文本对应原题中的字母"""
+    original = bank[copy['origin']]
+    text = copy['options'][copy['correct_answer']]
+    return next(k for k, v in original['options'].items() if v == text)
+
+
+if __name__ == '__main__':
+    main()
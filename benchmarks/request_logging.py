@@ -0,0 +1,112 @@
+"""结构化日志的开销测试
+
+日志输出到 /dev/null，计时：
+    单条日志    未被采样、低于级别、实际输出三种情况下一次 log.info / log.debug 的耗时
+    请求        在进程内直接调用 ASGI 应用，对比不加中间件和加 RequestLogMiddleware
+                （采样比例 0、0.1、1）时一个简单接口的 p50 / p99
+    载入题库    合成题库用 api 的 load_questions 解析，对比默认级别和调试模式（逐题输出）
+
+用法：
+    python benchmarks/request_logging.py
+    python benchmarks/request_logging.py --requests 20000 --questions 20000
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from fastapi import FastAPI
+
+import quiz_app
+import structured_log
+from benchmarks.common import percentile, write_bank
+from structured_log import RequestLogMiddleware, begin_request, configure, end_request, get_logger
+
+
+def per_call(fn, n):
+    t = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t) / n * 1e6
+
+
+def run_requests(app, n):
+    scope = {'type': 'http', 'http_version': '1.1', 'method': 'GET', 'path': '/ping', 'raw_path': b'/ping',
+             'root_path': '', 'scheme': 'http', 'query_string': b'', 'headers': [],
+             'client': ('127.0.0.1', 1), 'server': ('testserver', 80)}
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        pass
+
+    async def main():
+        times = []
+        for _ in range(n):
+            t = time.perf_counter()
+            await app(dict(scope), receive, send)
+            times.append(time.perf_counter() - t)
+        return times
+
+    return asyncio.run(main())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='结构化日志开销测试')
+    parser.add_argument('--calls', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=10000)
+    parser.add_argument('--rounds', type=int, default=10)
+    parser.add_argument('--questions', type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    devnull = open(os.devnull, 'w')
+    log = get_logger('benchmark')
+
+    configure('INFO', 0.0, devnull)
+    _, tokens = begin_request()
+    skipped = per_call(lambda: log.info('event', path='/api/bank', status=200), args.calls)
+    end_request(tokens)
+    below = per_call(lambda: log.debug('event', path='/api/bank', status=200), args.calls)
+    emitted = per_call(lambda: log.info('event', path='/api/bank', status=200), args.calls)
+    print(f"单条日志：未被采样 {skipped:.2f}µs  低于级别 {below:.2f}µs  实际输出 {emitted:.2f}µs")
+
+    app = FastAPI()
+
+    @app.get('/ping')
+    async def ping():
+        return {'status': 'ok'}
+
+    cases = [('不加中间件', app, None)] + [
+        (f'采样 {rate:g}', RequestLogMiddleware(app), rate) for rate in (0.0, 0.1, 1.0)]
+    run_requests(app, 200)
+    # 各种情况轮流运行多轮，减少机器负载波动的影响
+    times = {label: [] for label, _, _ in cases}
+    for _ in range(args.rounds):
+        for label, asgi, rate in cases:
+            configure('INFO', rate if rate is not None else 0.0, devnull)
+            times[label] += run_requests(asgi, args.requests // args.rounds)
+    for label, _, _ in cases:
+        print(f"请求（{label}）：p50 {percentile(times[label], 0.5) * 1e6:.0f}µs  "
+              f"p99 {percentile(times[label], 0.99) * 1e6:.0f}µs")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / 'quiz.md'
+        write_bank(path, args.questions)
+        for label, level in (('默认级别', 'INFO'), ('调试模式', 'DEBUG')):
+            configure(level, 1.0, devnull)
+            cache = quiz_app.QuestionBankCache(loader=quiz_app.load_questions, locator=lambda: path)
+            t = time.perf_counter()
+            questions = cache.get()
+            print(f"载入{len(questions)}题（{label}）：{time.perf_counter() - t:.2f}s")
+    logging.getLogger(structured_log.ROOT).handlers.clear()
+    devnull.close()
+
+
+if __name__ == '__main__':
+    main()
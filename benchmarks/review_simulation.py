@@ -0,0 +1,119 @@
+"""间隔复习调度的模拟测试
+
+模拟大量用户一年的错题复习：每个用户每天有一定概率打开错题练习，
+先加入几道新错题，再向复习堆要最早到期的 N 道题逐一作答。
+答对的概率随复习次数增加而提高，复习间隔达到 GRADUATE_DAYS 天的题目移出错题本。
+
+同时在每个用户的错题本上计时原来的做法（读出全部错题再洗牌），作为对比。
+
+用法：
+    python benchmarks/review_simulation.py
+    python benchmarks/review_simulation.py --users 1000 --days 90
+"""
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from question_store import question_id
+from review_scheduler import (DAY, GRADUATE_DAYS, QUALITY_CORRECT, QUALITY_WRONG,
+                              ReviewQueue, ReviewState, sm2)
+
+
+def simulate(users, days, batch, study_rate, new_per_day, seed=0):
+    rng = random.Random(seed)
+    queues = [ReviewQueue() for _ in range(users)]
+    stats = {'sessions': 0, 'reviews': 0, 'graduated': 0, 'added': 0,
+             'next_due_time': 0.0, 'shuffle_time': 0.0, 'max_book': 0}
+
+    start = time.perf_counter()
+    for day in range(days):
+        for queue in queues:
+            if rng.random() >= study_rate:
+                continue
+            # 白天的某个时刻开始练习
+            now = day * DAY + rng.uniform(8, 22) * 3600
+            stats['sessions'] += 1
+
+            for _ in range(rng.randint(0, new_per_day)):
+                qid = question_id(rng.randint(1, 12), rng.randint(1, 2000))
+                if qid not in queue:
+                    queue.push(ReviewState(qid, due=now))
+                    stats['added'] += 1
+
+            # 原来的做法：读出整本错题再洗牌
+            t = time.perf_counter()
+            book = list(queue.states)
+            rng.shuffle(book)
+            stats['shuffle_time'] += time.perf_counter() - t
+
+            t = time.perf_counter()
+            due = queue.next_due(batch, now)
+            stats['next_due_time'] += time.perf_counter() - t
+
+            for qid in due:
+                state = queue.states[qid]
+                correct = rng.random() < 0.55 + 0.1 * min(state.repetitions, 4)
+                new_state = ReviewState(*state.astuple())
+                sm2(new_state, QUALITY_CORRECT if correct else QUALITY_WRONG, now)
+                stats['reviews'] += 1
+                if correct and new_state.interval >= GRADUATE_DAYS:
+                    queue.remove(qid)
+                    stats['graduated'] += 1
+                else:
+                    queue.push(new_state)
+            stats['max_book'] = max(stats['max_book'], len(queue))
+
+    stats['elapsed'] = time.perf_counter() - start
+    stats['remaining'] = sum(len(q) for q in queues)
+    return stats
+
+
+def compare_large_book(size, batch, rounds=200, seed=0):
+    """错题本很大时，取到期题目与整本洗牌的单次耗时（微秒）"""
+    rng = random.Random(seed)
+    queue = ReviewQueue(ReviewState(qid, due=rng.uniform(0, 30 * DAY)) for qid in range(size))
+    now = 15 * DAY
+
+    t = time.perf_counter()
+    for _ in range(rounds):
+        queue.next_due(batch, now)
+    heap_time = (time.perf_counter() - t) / rounds
+
+    t = time.perf_counter()
+    for _ in range(rounds):
+        book = list(queue.states)
+        rng.shuffle(book)
+    shuffle_time = (time.perf_counter() - t) / rounds
+    return heap_time * 1e6, shuffle_time * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='间隔复习调度模拟')
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--batch', type=int, default=20, help='每次练习的题数')
+    parser.add_argument('--study-rate', type=float, default=0.3, help='每天练习的概率')
+    parser.add_argument('--new-per-day', type=int, default=4, help='每次练习最多新增的错题数')
+    args = parser.parse_args(argv)
+
+    s = simulate(args.users, args.days, args.batch, args.study_rate, args.new_per_day)
+    sessions = max(s['sessions'], 1)
+    print(f"{args.users}个用户，{args.days}天")
+    print(f"练习 {s['sessions']} 次，复习 {s['reviews']} 题，新增错题 {s['added']}，"
+          f"移出错题本 {s['graduated']}，剩余 {s['remaining']}")
+    print(f"单个用户错题本最多 {s['max_book']} 题")
+    print(f"总耗时 {s['elapsed']:.1f}s，{s['reviews'] / s['elapsed']:.0f} 题/秒")
+    print(f"取到期题目 平均 {s['next_due_time'] / sessions * 1e6:.1f}µs/次")
+    print(f"整本洗牌   平均 {s['shuffle_time'] / sessions * 1e6:.1f}µs/次")
+
+    print("\n错题本规模对比（取到期题目 / 整本洗牌）：")
+    for size in (100, 1000, 10000, 100000):
+        heap_us, shuffle_us = compare_large_book(size, args.batch)
+        print(f"    {size:>6}题  {heap_us:8.1f}µs / {shuffle_us:10.1f}µs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""题目搜索的性能测试
+
+在合成的大题库上（汉字按 Zipf 分布随机组成题干和选项）计时：
+建立索引、保存、读入，以及随机取题干片段作为查询的耗时（p50 / p99），
+分别测试搜索全部章节和只搜题目所在的章节。
+
+用法：
+    python benchmarks/search_queries.py
+    python benchmarks/search_queries.py --questions 20000 --queries 1000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from benchmarks.common import percentile, synthetic_store
+from search_index import SearchIndex
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='题目搜索性能测试')
+    parser.add_argument('--questions', type=int, default=50000)
+    parser.add_argument('--chapters', type=int, default=50)
+    parser.add_argument('--queries', type=int, default=500)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(0)
+    store = synthetic_store(rng, args.questions, args.chapters)
+
+    t = time.perf_counter()
+    index = SearchIndex.build(store)
+    print(f"{len(store)}题，建立索引 {time.perf_counter() - t:.1f}s，"
+          f"{len(index.terms)}个词条，{len(index.docs)}个倒排项")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / 'quiz.md'
+        source.write_text('合成题库', encoding='utf-8')
+        path = Path(tmp) / 'quiz.search'
+        t = time.perf_counter()
+        index.save(path, source)
+        print(f"保存 {time.perf_counter() - t:.2f}s，{os.path.getsize(path) / 1e6:.1f}MB")
+        t = time.perf_counter()
+        index = SearchIndex.load(path)
+        print(f"读入 {time.perf_counter() - t:.2f}s")
+
+    for label, by_chapter in (('全部章节', False), ('限定所在章节', True)):
+        times = []
+        hits = 0
+        for _ in range(args.queries):
+            q = store[rng.randrange(len(store))]
+            start = rng.randrange(len(q.text) - 6)
+            query = q.text[start:start + rng.randint(2, 6)]
+            t = time.perf_counter()
+            results = index.search(query, q.chapter if by_chapter else None)
+            times.append(time.perf_counter() - t)
+            hits += any(store[doc] is q for doc, _ in results)
+        print(f"{label}：p50 {percentile(times, 0.5) * 1000:.2f}ms  p99 {percentile(times, 0.99) * 1000:.2f}ms"
+              f"  来源题目出现在前20名 {hits / args.queries:.0%}")
+
+
+if __name__ == '__main__':
+    main()
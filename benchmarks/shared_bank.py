@@ -0,0 +1,120 @@
+"""多进程共享题库的内存测试
+
+启动 --workers 个独立进程（spawn，不继承父进程的内存），每个进程像 API worker 一样载入题库、
+读入搜索索引并把全部题目访问一遍（相当于生成预序列化内容），然后所有进程同时统计自己的 PSS
+（共享页面按映射它的进程数平摊，各进程 PSS 之和就是实际占用的物理内存）。对比两种方式：
+    各自解析    每个进程解析 quiz.md，常驻自己的题目对象
+    共享题库    发布一次到共享目录（shared_bank.py），各进程只读映射同一个产物
+
+之后每个进程再像 API worker 预热那样建立自己的缓存（预序列化和压缩好的响应 BankPayloads、
+题目id索引和智能选题的统计），单独统计这部分 PSS。
+
+共享的只有题目记录和搜索索引；BankPayloads（整个题库和每章的 JSON 及其 gzip 字节）、
+id→位置的字典和选题统计数组仍在每个 worker 中各建一份，随题库大小增长，不随共享模式减少。
+参考结果（20000题，8个进程）：
+    各自解析    题库 PSS 合计约 740MB，各进程缓存合计约 110MB
+    共享题库    题库 PSS 合计约 45MB，各进程缓存合计约 140MB
+即共享模式省下的是题目对象本身；每个 worker 约 15-18MB 的缓存仍随题库线性增长
+（共享模式下略多，因为题目对象是生成缓存时临时构建的），worker 数多、题库大时应相应预留内存，或减少 worker 数。
+
+只在 Linux 上可用（读取 /proc/self/smaps_rollup）。
+
+用法：
+    python benchmarks/shared_bank.py
+    python benchmarks/shared_bank.py --questions 100000 --workers 8
+"""
+import argparse
+import multiprocessing
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from benchmarks.common import write_bank
+
+
+def pss_mb():
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            if line.startswith('Pss:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def worker(mode, source, directory, barrier, results):
+    sys.path.insert(0, str(Path(__file__).parent.parent))
+    import quiz_app
+    from adaptive_selector import AdaptiveSelector
+    from bank_payloads import BankPayloads
+    from search_index import load_index
+
+    baseline = pss_mb()
+    t = time.perf_counter()
+    if mode == 'shared':
+        cache = quiz_app.SharedBankCache(directory, locator=lambda: Path(source))
+    else:
+        cache = quiz_app.QuestionBankCache(loader=quiz_app.load_questions, locator=lambda: Path(source))
+    questions = cache.get()
+    index = load_index(cache.source_of(questions), questions, mapped=mode == 'shared')
+    index.search(questions[0].text[:4])
+    for q in questions:
+        q.to_dict()
+    elapsed = time.perf_counter() - t
+    # 所有进程都载入完毕后再统计，共享页面才会在全部进程间平摊
+    barrier.wait()
+    loaded = pss_mb()
+    barrier.wait()
+    # 每个 worker 各自建立的缓存
+    caches = (BankPayloads(questions), questions.ids(), questions.get(questions[0].id), AdaptiveSelector(questions))
+    barrier.wait()
+    results.put((baseline, loaded, pss_mb(), elapsed))
+    barrier.wait()
+    del caches
+
+
+def run(mode, workers, source, directory):
+    ctx = multiprocessing.get_context('spawn')
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(mode, str(source), str(directory), barrier, results))
+                 for _ in range(workers)]
+    for p in processes:
+        p.start()
+    measured = [results.get() for _ in processes]
+    for p in processes:
+        p.join()
+    return measured
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='多进程共享题库内存测试')
+    parser.add_argument('--questions', type=int, default=20000)
+    parser.add_argument('--workers', type=int, default=8)
+    args = parser.parse_args(argv)
+
+    import quiz_app
+    from shared_bank import publish
+    from structured_log import configure
+
+    configure('WARNING', 0.0)
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / 'quiz.md'
+        write_bank(source, args.questions)
+        directory = Path(tmp) / 'shared'
+        t = time.perf_counter()
+        publish(source, directory, quiz_app.load_questions)
+        print(f"{args.questions}题，{args.workers}个进程；发布 {time.perf_counter() - t:.2f}s，"
+              f"产物 {(directory / 'bank-1.bank').stat().st_size / 1e6:.1f}MB")
+        for label, mode in (('各自解析', 'parse'), ('共享题库', 'shared')):
+            measured = run(mode, args.workers, source, directory)
+            baseline = sum(m[0] for m in measured)
+            loaded = sum(m[1] for m in measured)
+            total = sum(m[2] for m in measured)
+            slowest = max(m[3] for m in measured)
+            print(f"{label}：PSS 合计 {total:.0f}MB（进程本身 {baseline:.0f}MB，题库 {loaded - baseline:.0f}MB，"
+                  f"各进程缓存 {total - loaded:.0f}MB），每个进程载入 {slowest:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+"""综合性能测试
+
+在 1k / 10k / 100k 道题的合成题库（quiz.md 格式）上测量：
+    parse     解析 Markdown（quiz.py 和 API 共用的 QuestionParser）、读入预编译产物的耗时和峰值内存
+    chapter   按章节取题（in_chapter / chapter_ids）
+    shuffle   生成整个题库的会话洗牌、取一页展示用题目
+    api       在进程内直接调用 ASGI 应用，测量每个接口的每秒请求数和 p50 / p99 延迟
+
+结果写成 JSON（指标名 -> 数值、单位、越小还是越大越好）。--compare 与保存的基准结果对比，
+变差超过 --threshold 的指标标记为回退，存在回退时退出码为 1，可以放在提交前的检查中。
+
+用法：
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --sizes 1k,10k --skip api
+    python benchmarks/suite.py --compare baseline.json                # 运行后与基准对比
+    python benchmarks/suite.py --compare baseline.json --input results.json   # 只对比已有结果
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+from bank_artifact import compile_bank, load_bank
+from benchmarks.common import SIZES, asgi_request, percentile, timed, write_bank
+from quiz_parser import parse_file
+from session_token import SessionToken, sign_user
+from shuffle_service import SessionShuffle, new_seed, shuffle_questions
+
+PHASES = ('parse', 'chapter', 'shuffle', 'api')
+DEFAULT_THRESHOLD = 0.2
+PAGE = 20
+
+
+class Results:
+    """指标名 -> {"value", "unit", "better"}"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, name, value, unit, better='lower'):
+        self.metrics[name] = {'value': round(value, 6), 'unit': unit, 'better': better}
+
+    def add_times(self, name, times, unit='ms'):
+        scale = 1000 if unit == 'ms' else 1e6
+        self.add(f'{name}/p50', percentile(times, 0.5) * scale, unit)
+        self.add(f'{name}/p99', percentile(times, 0.99) * scale, unit)
+
+
+def peak_memory(fn):
+    """fn 执行期间 Python 分配的峰值内存（MB）"""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1] / 1e6
+    finally:
+        tracemalloc.stop()
+
+
+def repeats(n):
+    return 5 if n <= 10000 else 2
+
+
+def bench_parse(results, label, path):
+    n = SIZES[label]
+    times, (store, _) = timed(lambda: parse_file(path), repeats(n))
+    results.add(f'{label}/parse/markdown/seconds', min(times), 's')
+    results.add(f'{label}/parse/markdown/peak_mb', peak_memory(lambda: parse_file(path)), 'MB')
+
+    compile_bank(path, store)
+
+    def load_artifact():
+        bank = load_bank(path, None)
+        bank.ids()
+        return bank
+
+    times, _ = timed(load_artifact, repeats(n))
+    results.add(f'{label}/parse/artifact/seconds', min(times), 's')
+    results.add(f'{label}/parse/artifact/peak_mb', peak_memory(load_artifact), 'MB')
+    return store
+
+
+def bench_chapter(results, label, store):
+    chapters = store.chapters()
+
+    def in_chapter():
+        for c in chapters:
+            store.in_chapter(c)
+
+    def chapter_ids():
+        for c in chapters:
+            store.chapter_ids(c)
+
+    for name, fn in (('in_chapter', in_chapter), ('chapter_ids', chapter_ids)):
+        times, _ = timed(fn, 20)
+        results.add(f'{label}/chapter/{name}/us', min(times) / len(chapters) * 1e6, 'us')
+
+
+def bench_shuffle(results, label, store):
+    ids = store.ids()
+    times, session = timed(lambda: SessionShuffle(new_seed(), ids), repeats(len(store)) * 2)
+    results.add_times(f'{label}/shuffle/session', times)
+    times, _ = timed(lambda: session.page(store, 0, PAGE), 200)
+    results.add_times(f'{label}/shuffle/page', times, 'us')
+    questions = list(store)
+    times, _ = timed(lambda: shuffle_questions(new_seed(), questions), repeats(len(store)) * 2)
+    results.add_times(f'{label}/shuffle/list', times)
+
+
+def routes(store):
+    """(名称, 方法, 路径, 参数, 请求体, 请求头)"""
+    q = store[0]
+    chapter = q.chapter
+    entry = {str(q.id): dict(q.to_dict(), your_answer='A')}
+    graded = {'seed': 12345, 'answers': [{'id': p.id, 'answer': 'A', 'seconds': 5} for p in store[:PAGE]]}
+    token = SessionToken.start(12345, store.chapter_ids(chapter), chapter).encode()
+    tokened = {'token': token, 'answers': [{'id': qid, 'answer': 'A', 'seconds': 5}
+                                           for qid in SessionShuffle(12345, store.chapter_ids(chapter)).order[:PAGE]]}
+    gzip = (('accept-encoding', 'gzip'),)
+    return [
+        ('chapters', 'GET', '/api/chapters', None, None, ()),
+        ('questions', 'GET', '/api/questions', None, None, ()),
+        ('questions_chapter', 'GET', f'/api/questions/{chapter}', None, None, ()),
+        ('session_start', 'GET', '/api/session/start', None, None, ()),
+        ('session_page', 'GET', '/api/session/page', {'cursor': f'{12345:x}-0-{PAGE}'}, None, ()),
+        ('session_resume', 'GET', '/api/session/resume', {'token': token}, None, ()),
+        ('bank_manifest', 'GET', '/api/bank', None, None, gzip),
+        ('bank_all', 'GET', '/api/bank/all', None, None, gzip),
+        ('bank_chapter', 'GET', f'/api/bank/{chapter}', None, None, gzip),
+        ('shuffle', 'GET', '/api/shuffle', {'chapter': chapter}, None, ()),
+        ('search', 'GET', '/api/search', {'q': q.text[:4]}, None, ()),
+        ('adaptive_next', 'GET', '/api/adaptive/next', None, None, ()),
+        ('adaptive_answer', 'POST', '/api/adaptive/answer', None, {'id': q.id, 'correct': True}, ()),
+        ('grade', 'POST', '/api/grade', None, graded, ()),
+        ('grade_token', 'POST', '/api/grade', None, tokened, ()),
+        ('wrong_questions_save', 'POST', '/api/wrong-questions', None, entry, ()),
+        ('wrong_questions', 'GET', '/api/wrong-questions', None, None, ()),
+        ('review_due', 'GET', '/api/review/due', None, None, ()),
+        ('analytics', 'GET', '/api/analytics', None, None, ()),
+    ]
+
+
+async def bench_api(results, banks, duration, max_requests):
+    import quiz_app
+    from structured_log import configure
+
+    db_path = banks[0][1].parent.parent / 'quiz.db'
+    writer = None
+    try:
+        for label, path, store in banks:
+            # 不执行启动事件：每个接口第一次请求时建立缓存，下面的预热请求不计入结果
+            app = quiz_app.create_app(bank_path=path, db_path=db_path, warmup=False)
+            configure('WARNING', 0.0, open(os.devnull, 'w'))
+            if writer is None:
+                writer = quiz_app.get_wrong_writer()
+                writer.start()
+            for name, method, route, params, body, headers in routes(store):
+                # 用同一个用户的身份请求，不为每个请求分配新用户
+                headers = (*headers, ('cookie', f'{quiz_app.USER_COOKIE}={sign_user("benchmark")}'))
+                # 第一次请求建立该接口用到的缓存和索引，不计入结果
+                status, content = await asgi_request(app, method, route, params, body, headers)
+                if status != 200 or content.startswith(b'{"error"'):
+                    print(f"  {label} {name}：跳过（{status} {content[:60].decode('utf-8', 'replace')}）")
+                    continue
+                times = []
+                start = time.perf_counter()
+                while len(times) < max_requests and (len(times) < 3 or time.perf_counter() - start < duration):
+                    t = time.perf_counter()
+                    await asgi_request(app, method, route, params, body, headers)
+                    times.append(time.perf_counter() - t)
+                results.add(f'{label}/api/{name}/rps', len(times) / sum(times), 'req/s', 'higher')
+                results.add_times(f'{label}/api/{name}', times)
+    finally:
+        if writer is not None:
+            await writer.close()
+        quiz_app._wrong_writer = None
+
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {
+        'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+    }
+
+
+def run(sizes, skip, duration, max_requests):
+    results = Results()
+    with tempfile.TemporaryDirectory() as tmp:
+        banks = []
+        for label in sizes:
+            path = Path(tmp) / label / 'quiz.md'
+            path.parent.mkdir()
+            write_bank(path, SIZES[label], seed=0)
+            print(f"{label}：{path.stat().st_size / 1e6:.1f}MB")
+            store, _ = parse_file(path)
+            if 'parse' not in skip:
+                store = bench_parse(results, label, path)
+            if 'chapter' not in skip:
+                bench_chapter(results, label, store)
+            if 'shuffle' not in skip:
+                bench_shuffle(results, label, store)
+            banks.append((label, path, store))
+        if 'api' not in skip:
+            asyncio.run(bench_api(results, banks, duration, max_requests))
+    return {'meta': metadata(), 'metrics': results.metrics}
+
+
+def print_metrics(metrics):
+    for name, m in metrics.items():
+        print(f"{name:48s} {m['value']:>14.3f} {m['unit']}")
+
+
+def compare(baseline, current, threshold):
+    """逐项对比，返回回退的指标名列表"""
+    regressions = []
+    print(f"{'指标':46s} {'基准':>12s} {'当前':>12s}  变化")
+    for name, m in current['metrics'].items():
+        base = baseline['metrics'].get(name)
+        if base is None or not base['value']:
+            continue
+        change = m['value'] / base['value'] - 1
+        worse = change > threshold if m['better'] == 'lower' else change < -threshold
+        better = change < -threshold if m['better'] == 'lower' else change > threshold
+        flag = '回退' if worse else '改善' if better else ''
+        if worse:
+            regressions.append(name)
+        print(f"{name:48s} {base['value']:>12.3f} {m['value']:>12.3f}  {change:+.0%} {flag}")
+    missing = sorted(set(baseline['metrics']) - set(current['metrics']))
+    if missing:
+        print(f"\n基准中有 {len(missing)} 项指标本次没有测量")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='综合性能测试')
+    parser.add_argument('--sizes', default=','.join(SIZES), help='题库规模，逗号分隔：' + '/'.join(SIZES))
+    parser.add_argument('--skip', default='', help='跳过的部分，逗号分隔：' + '/'.join(PHASES))
+    parser.add_argument('--duration', type=float, default=1.0, help='每个接口最多测量的秒数')
+    parser.add_argument('--requests', type=int, default=500, help='每个接口最多请求的次数')
+    parser.add_argument('--output', metavar='FILE', help='把结果写入 JSON 文件')
+    parser.add_argument('--input', metavar='FILE', help='不运行测试，读取已有结果（与 --compare 一起使用）')
+    parser.add_argument('--compare', metavar='BASELINE', help='与基准结果对比')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='变差超过该比例视为回退')
+    args = parser.parse_args(argv)
+
+    if args.input:
+        with open(args.input, encoding='utf-8') as f:
+            current = json.load(f)
+    else:
+        sizes = [s for s in args.sizes.split(',') if s]
+        unknown = [s for s in sizes if s not in SIZES]
+        if unknown:
+            parser.error(f"未知的题库规模：{','.join(unknown)}")
+        skip = {s for s in args.skip.split(',') if s}
+        random.seed(0)
+        current = run(sizes, skip, args.duration, args.requests)
+        print_metrics(current['metrics'])
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        print(f"\n与基准对比（{baseline['meta'].get('commit')} {baseline['meta'].get('time')}），阈值 {args.threshold:.0%}")
+        regressions = compare(baseline, current, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} 项指标回退")
+            return 1
+        print("\n没有回退")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
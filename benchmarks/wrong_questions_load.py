@@ -0,0 +1,115 @@
+"""错题写入队列的压力测试
+
+模拟几千个用户在测验结束时同时提交错题，比较两种写法：
+    direct   每个请求单独一个事务（线程池中执行）
+    queue    经过 WrongQuestionWriter 合并成批写入
+
+用法：
+    python benchmarks/wrong_questions_load.py
+    python benchmarks/wrong_questions_load.py --users 5000 --wrong 15 --depth 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from benchmarks.common import percentile
+from question_store import question_id
+from storage import open_storage
+from write_behind import QueueFull, WrongQuestionWriter
+
+
+def make_requests(users, wrong, spread, seed=0):
+    """每个用户一次提交，包含 wrong 道随机错题，在 spread 秒内随机到达"""
+    rng = random.Random(seed)
+    requests = []
+    for u in range(users):
+        delay = rng.uniform(0, spread)
+        entries = {}
+        for _ in range(wrong):
+            chapter, number = rng.randint(1, 12), rng.randint(1, 30)
+            entries[question_id(chapter, number)] = {
+                'chapter': chapter, 'number': number,
+                'question': f'第{chapter}章第{number}题', 'your_answer': rng.choice('ABCD')
+            }
+        requests.append((delay, f'user{u}', entries))
+    return requests
+
+
+async def run_direct(storage, requests, concurrency):
+    loop = asyncio.get_running_loop()
+    latencies = []
+    limit = asyncio.Semaphore(concurrency)
+
+    async def one(delay, user, entries):
+        await asyncio.sleep(delay)
+        start = time.perf_counter()
+        async with limit:
+            await loop.run_in_executor(None, storage.set_wrong_many, user, entries)
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(*r) for r in requests))
+    return latencies, 0
+
+
+async def run_queue(storage, requests, depth):
+    writer = WrongQuestionWriter(storage, max_depth=depth)
+    latencies = []
+    rejected = 0
+
+    async def one(delay, user, entries):
+        nonlocal rejected
+        await asyncio.sleep(delay)
+        start = time.perf_counter()
+        try:
+            await writer.submit(user, entries)
+        except QueueFull:
+            rejected += 1
+        latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(one(*r) for r in requests))
+    await writer.close()
+    return latencies, rejected, writer.stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='错题写入队列压力测试')
+    parser.add_argument('--users', type=int, default=3000)
+    parser.add_argument('--wrong', type=int, default=10, help='每个用户提交的错题数')
+    parser.add_argument('--spread', type=float, default=1.0, help='所有提交在几秒内到达，0为同时到达')
+    parser.add_argument('--depth', type=int, default=1000, help='队列最大深度')
+    parser.add_argument('--concurrency', type=int, default=32, help='direct 模式的并发请求数')
+    args = parser.parse_args(argv)
+
+    requests = make_requests(args.users, args.wrong, args.spread)
+    rows = args.users * args.wrong
+    print(f"{args.users}个用户，每人{args.wrong}道错题，共{rows}条")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ('direct', 'queue'):
+            storage = open_storage(os.path.join(tmp, f'{mode}.db'))
+            start = time.perf_counter()
+            if mode == 'direct':
+                latencies, rejected = asyncio.run(run_direct(storage, requests, args.concurrency))
+                stats = None
+            else:
+                latencies, rejected, stats = asyncio.run(run_queue(storage, requests, args.depth))
+            elapsed = time.perf_counter() - start
+            written = sum(len(storage.wrong_questions(user)) for _, user, _ in requests)
+            storage.close()
+
+            print(f"\n[{mode}] 总耗时 {elapsed:.2f}s")
+            print(f"    请求延迟 p50 {percentile(latencies, 0.5) * 1000:.2f}ms"
+                  f"  p99 {percentile(latencies, 0.99) * 1000:.2f}ms  拒绝 {rejected}")
+            if stats:
+                print(f"    事务 {stats['batches']} 次，队列最大深度 {stats['max_depth']}")
+            print(f"    已落盘 {written} 条错题")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,265 @@
+"""从章节 PDF 批量生成题库
+
+用进程池并行提取各个 PDF 的文字，把其中的单选题整理成 quiz.md 的格式，
+再按章节顺序合并成一个题库。每个章节前用注释标明来源文件，方便追溯。
+
+增量处理：每个 PDF 的内容哈希和整理结果记录在清单文件中，
+再次运行时只重新处理内容发生变化的 PDF。
+
+需要安装 pypdf：pip install pypdf
+
+用法：
+    python pdf_ingest.py                        # 处理当前目录下所有 PDF
+    python pdf_ingest.py a.pdf b.pdf -o out.md  # 处理指定文件
+    python pdf_ingest.py --force                # 忽略清单，全部重新处理
+"""
+import argparse
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from bank_artifact import file_digest
+
+DEFAULT_OUTPUT = 'quiz_pdf.md'
+MANIFEST_NAME = '.ingest_manifest.json'
+
+# 整理规则变化时递增，旧的清单记录会被视为过期
+NORMALIZER_VERSION = 1
+
+CHINESE_DIGITS = {'一': 1, '二': 2, '三': 3, '四': 4, '五': 5, '六': 6, '七': 7, '八': 8, '九': 9}
+
+CHAPTER_RE = re.compile(r'第([一二三四五六七八九十\d]+)章\s*(.*)')
+SECTION_RE = re.compile(r'（([一二三四五六七八九十]+)）\s*(\S+)')
+QUESTION_RE = re.compile(r'(\d+)\s*[、.．]?\s*(.*)')
+PAGE_NUMBER_RE = re.compile(r'\d+')
+SUBSECTION_RE = re.compile(r'教材第.*章$')
+OPTION_MARK_RE = re.compile(r'([A-D])\s*[、.．]')
+ANSWER_RE = re.compile(r'[（(]\s*([A-D])\s*[）)]')
+# 中文字符两侧的空白是 PDF 排版产生的，直接去掉
+CJK_SPACE_RE = re.compile(r'\s+(?=[^\x00-\x7f])|(?<=[^\x00-\x7f])\s+')
+
+
+def chinese_number(text):
+    """把“七”“十二”这样的中文数字（或阿拉伯数字）转换成整数"""
+    if text.isdigit():
+        return int(text)
+    if '十' in text:
+        tens, _, ones = text.partition('十')
+        return CHINESE_DIGITS.get(tens, 1) * 10 + CHINESE_DIGITS.get(ones, 0)
+    return CHINESE_DIGITS[text]
+
+
+def clean(text):
+    return CJK_SPACE_RE.sub('', ' '.join(text.split()))
+
+
+def split_question(text):
+    """把一道题的全部文字拆成(题干, 选项列表, 答案)，无法识别时返回None"""
+    first = OPTION_MARK_RE.search(text)
+    if not first or first.group(1) != 'A':
+        return None
+    # 个别题目的选项顺序是乱的（如 A B D C），按各字母第一次出现的位置切分
+    marks = {}
+    for m in OPTION_MARK_RE.finditer(text, first.start()):
+        marks.setdefault(m.group(1), m)
+    if len(marks) != 4:
+        return None
+    ordered = sorted(marks.values(), key=lambda m: m.start())
+
+    stem = text[:first.start()]
+    answers = list(ANSWER_RE.finditer(stem))
+    if not answers:
+        return None
+    answer = answers[-1]
+    stem = stem[:answer.start()] + '（ ）' + stem[answer.end():]
+
+    options = {}
+    for i, m in enumerate(ordered):
+        end = ordered[i + 1].start() if i < 3 else len(text)
+        options[m.group(1)] = clean(text[m.end():end])
+    return clean(stem), [options[k] for k in 'ABCD'], answer.group(1)
+
+
+def normalize_text(pages):
+    """把 PDF 提取出的文字整理成 {章节号: {'title', 'questions'}}，并返回无法识别的题号"""
+    chapters = {}
+    skipped = []
+    chapter = None
+    in_choice = False
+    current = None      # [原题号, 文字]
+    last_number = 0     # 小节内最后一个题号
+
+    def flush():
+        if current is None or chapter is None:
+            return
+        questions = chapters[chapter]['questions']
+        parsed = split_question(current[1])
+        if parsed is None:
+            skipped.append(f"第{chapter}章原第{current[0]}题")
+        else:
+            # 各小节的题号会从1重新开始，合并后按章节内顺序重新编号
+            questions.append((len(questions) + 1,) + parsed)
+
+    for line in '\n'.join(pages).splitlines():
+        line = line.strip()
+        if not line or PAGE_NUMBER_RE.fullmatch(line):
+            continue
+
+        m = CHAPTER_RE.match(line)
+        if m:
+            flush()
+            current, last_number = None, 0
+            chapter = chinese_number(m.group(1))
+            title = re.sub(r'[（(]教材.*$', '', m.group(2))
+            chapters.setdefault(chapter, {'title': clean(title), 'questions': []})
+            in_choice = False
+            continue
+
+        m = SECTION_RE.match(line)
+        if m:
+            flush()
+            current, last_number = None, 0
+            in_choice = '单选' in m.group(2)
+            continue
+
+        if not in_choice or chapter is None:
+            continue
+
+        if SUBSECTION_RE.match(line):
+            flush()
+            current, last_number = None, 0
+            continue
+
+        m = QUESTION_RE.match(line)
+        # 题号必须连续，避免把以数字开头的续行当成新题
+        if m and int(m.group(1)) == last_number + 1:
+            flush()
+            last_number += 1
+            current = [last_number, m.group(2)]
+        elif current is not None:
+            current[1] += ' ' + line
+
+    flush()
+    return chapters, skipped
+
+
+def extract_source(path):
+    """进程池任务：提取并整理一个 PDF"""
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    pages = [page.extract_text() or '' for page in reader.pages]
+    chapters, skipped = normalize_text(pages)
+    return {
+        'chapters': {str(k): v for k, v in chapters.items()},
+        'skipped': skipped,
+        'pages': len(pages)
+    }
+
+
+def render_markdown(sources):
+    """按章节号合并所有来源，生成 quiz.md 格式的文本"""
+    blocks = []
+    for name, entry in sources.items():
+        for chapter, data in entry['chapters'].items():
+            blocks.append((int(chapter), name, data))
+    blocks.sort(key=lambda b: (b[0], b[1]))
+
+    lines = []
+    for chapter, name, data in blocks:
+        lines.append(f"<!-- source: {name} sha256:{sources[name]['sha256'][:12]} -->")
+        lines.append(f"**第{chapter}章 {data['title']}**")
+        lines.append('')
+        for number, stem, options, answer in data['questions']:
+            lines.append(f"{number}.  题目：{stem}")
+            for key, option in zip('ABCD', options):
+                lines.append(f"    *   {key}、{option}")
+            lines.append(f"    答案：{answer}")
+        lines.append('')
+    return '\n'.join(lines)
+
+
+def load_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if manifest.get('version') != NORMALIZER_VERSION:
+        return {}
+    return manifest.get('sources', {})
+
+
+def ingest(pdfs, output, manifest_path, workers=None, force=False):
+    """处理 PDF 并写出合并后的题库，返回(本次重新处理的文件, 各来源的整理结果)"""
+    previous = {} if force else load_manifest(manifest_path)
+    sources = {}
+    pending = {}
+    for pdf in pdfs:
+        name = Path(pdf).name
+        digest = file_digest(pdf).hex()
+        entry = previous.get(name)
+        if entry and entry['sha256'] == digest:
+            sources[name] = entry
+        else:
+            pending[name] = (pdf, digest)
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {name: pool.submit(extract_source, str(pdf))
+                       for name, (pdf, _) in pending.items()}
+            for name, future in futures.items():
+                entry = future.result()
+                entry['sha256'] = pending[name][1]
+                sources[name] = entry
+
+    # 保持命令行给出的文件顺序
+    sources = {Path(pdf).name: sources[Path(pdf).name] for pdf in pdfs}
+
+    tmp = Path(str(output) + '.tmp')
+    tmp.write_text(render_markdown(sources), encoding='utf-8')
+    os.replace(tmp, output)
+
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': NORMALIZER_VERSION, 'sources': sources}, f, ensure_ascii=False, indent=2)
+
+    return list(pending), sources
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='从章节 PDF 生成 quiz.md 格式的题库')
+    parser.add_argument('pdfs', nargs='*', help='PDF 文件，默认为当前目录下所有 PDF')
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT, help='输出文件')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='并行进程数')
+    parser.add_argument('--force', action='store_true', help='忽略清单，全部重新处理')
+    args = parser.parse_args(argv)
+
+    try:
+        import pypdf  # noqa: F401
+    except ImportError:
+        print("需要安装 pypdf：pip install pypdf")
+        return 1
+
+    pdfs = args.pdfs or sorted(str(p) for p in Path.cwd().glob('*.pdf'))
+    if not pdfs:
+        print("没有找到 PDF 文件")
+        return 1
+
+    manifest_path = Path(args.output).parent / MANIFEST_NAME
+    processed, sources = ingest(pdfs, args.output, manifest_path, args.workers, args.force)
+
+    for name, entry in sources.items():
+        count = sum(len(c['questions']) for c in entry['chapters'].values())
+        status = '已处理' if name in processed else '未变化'
+        print(f"{status} {name}：{len(entry['chapters'])}章，{count}题")
+        for item in entry['skipped']:
+            print(f"    无法识别：{item}")
+    print(f"\n已写入 {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,4 +1,4 @@
-const CACHE_NAME = 'quiz-app-v1';
+const CACHE_NAME = 'quiz-app-v2';
 const urlsToCache = [
   '/',
   '/index.html',
@@ -14,26 +14,52 @@ self.addEventListener('install', event => {
   );
 });
 
+// 题库内容：带版本号的地址内容不会变，缓存优先；其余先请求网络（浏览器会带 ETag 重新验证），离线时用缓存
+function fetchAndCache(request, immutableOnly) {
+  return fetch(request)
+    .then(response => {
+      if (!response || response.status !== 200 || response.type !== 'basic') {
+        return response;
+      }
+      // 版本号已过期时服务端返回的是新内容，不能缓存在旧地址下
+      if (immutableOnly && !(response.headers.get('Cache-Control') || '').includes('immutable')) {
+        return response;
+      }
+      const responseToCache = response.clone();
+      caches.open(CACHE_NAME)
+        .then(cache => {
+          cache.put(request, responseToCache);
+        });
+      return response;
+    });
+}
+
 self.addEventListener('fetch', event => {
+  const url = new URL(event.request.url);
+
+  if (url.pathname.startsWith('/api/bank')) {
+    if (url.searchParams.has('v')) {
+      event.respondWith(
+        caches.match(event.request)
+          .then(response => response || fetchAndCache(event.request, true))
+      );
+    } else {
+      event.respondWith(
+        fetchAndCache(event.request)
+          .catch(() => caches.match(event.request))
+      );
+    }
+    return;
+  }
+
+  // 其他接口（洗牌、会话、错题）每次都不同，不经过缓存
+  if (url.pathname.startsWith('/api/')) {
+    return;
+  }
+
   event.respondWith(
     caches.match(event.request)
-      .then(response => {
-        if (response) {
-          return response;
-        }
-        return fetch(event.request)
-          .then(response => {
-            if (!response || response.status !== 200 || response.type !== 'basic') {
-              return response;
-            }
-            const responseToCache = response.clone();
-            caches.open(CACHE_NAME)
-              .then(cache => {
-                cache.put(event.request, responseToCache);
-              });
-            return response;
-          });
-      })
+      .then(response => response || fetchAndCache(event.request))
   );
 });
 
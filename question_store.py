@@ -0,0 +1,186 @@
+"""题目模型与题库存储
+
+CLI、GUI 和 API 共用的题目类型。Question 使用 __slots__，选项文本经过 intern，
+在多章节合并的大题库中重复出现的选项（如“以上都是”）只保存一份。
+"""
+import sys
+from array import array
+from collections.abc import Sequence
+from operator import attrgetter
+
+OPTION_KEYS = ('A', 'B', 'C', 'D')
+
+# 题目id = 章节号左移20位再加题号，同一题在题库重建后id不变，且按id排序即按章节、题号排序
+NUMBER_BITS = 20
+
+
+def question_id(chapter, number):
+    return (chapter << NUMBER_BITS) | number
+
+
+def question_key(chapter, number):
+    """题目在存档文件中使用的键，如 "3-12"（第3章第12题）"""
+    return f"{chapter}-{number}"
+
+
+def id_key(qid):
+    """题目id对应的键"""
+    return question_key(qid >> NUMBER_BITS, qid & ((1 << NUMBER_BITS) - 1))
+
+
+def parse_question_key(key):
+    """把 "3-12" 这样的键转换成题目id，格式错误时抛出 ValueError"""
+    chapter, number = key.split('-')
+    return question_id(int(chapter), int(number))
+
+
+class Question:
+    __slots__ = ('id', 'chapter', 'number', 'text', 'options', 'answer')
+
+    def __init__(self, chapter, number, text, options, answer):
+        self.id = question_id(chapter, number)
+        self.chapter = chapter
+        self.number = number
+        self.text = text
+        self.options = tuple(sys.intern(o) for o in options)
+        self.answer = answer    # 正确选项的下标，0-3
+
+    @property
+    def key(self):
+        return question_key(self.chapter, self.number)
+
+    @property
+    def correct_answer(self):
+        return OPTION_KEYS[self.answer]
+
+    @property
+    def option_dict(self):
+        return dict(zip(OPTION_KEYS, self.options))
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d['chapter'], int(d['number']), d['question'],
+                   [d['options'][k] for k in OPTION_KEYS],
+                   OPTION_KEYS.index(d['correct_answer']))
+
+    def to_dict(self, reveal=True):
+        """转换成原有的题目字典格式（用于JSON和存档）；reveal 为 False 时不含正确答案"""
+        d = {
+            'id': self.id,
+            'chapter': self.chapter,
+            'number': self.number,
+            'question': self.text,
+            'options': self.option_dict,
+        }
+        if reveal:
+            d['correct_answer'] = self.correct_answer
+        return d
+
+    def __repr__(self):
+        return f"Question(chapter={self.chapter}, number={self.number}, text={self.text[:20]!r})"
+
+
+class QuestionStore(Sequence):
+    """按id排序的题目集合，支持按id查找和按章节取题
+
+    questions 可以是普通列表，也可以是按需构建题目的预编译题库；
+    后者提供 ids() 时，建立索引不需要构建任何题目对象。
+    题目按id排序，同一章的题目是连续的一段，章节索引只需记录每章的起止位置。
+    索引在第一次使用时建立一次，题库更新时会创建新的 QuestionStore。
+    """
+
+    def __init__(self, questions, chapter_titles=None):
+        self._questions = questions
+        self.chapter_titles = dict(chapter_titles or {})
+        self._ids = None
+        self._positions = None
+        self._chapters = None
+
+    @classmethod
+    def from_dicts(cls, dicts, chapter_titles=None):
+        questions = [Question.from_dict(d) for d in dicts]
+        questions.sort(key=attrgetter('id'))
+        return cls(questions, chapter_titles)
+
+    def __len__(self):
+        return len(self._questions)
+
+    def __getitem__(self, i):
+        return self._questions[i]
+
+    def _build_index(self):
+        ids = getattr(self._questions, 'ids', None)
+        ids = ids() if ids else (q.id for q in self._questions)
+        id_array = array('q')
+        positions = {}
+        chapters = {}
+        for i, qid in enumerate(ids):
+            id_array.append(qid)
+            positions[qid] = i
+            chapter = qid >> NUMBER_BITS
+            start, _ = chapters.get(chapter, (i, i))
+            chapters[chapter] = (start, i + 1)
+        self._ids = id_array
+        self._chapters = chapters
+        self._positions = positions
+
+    def get(self, qid, default=None):
+        """按id查找题目"""
+        if self._positions is None:
+            self._build_index()
+        i = self._positions.get(qid)
+        return default if i is None else self._questions[i]
+
+    def chapters(self):
+        """所有章节号（升序）"""
+        if self._chapters is None:
+            self._build_index()
+        return list(self._chapters)
+
+    def chapter_count(self, chapter):
+        if self._chapters is None:
+            self._build_index()
+        start, end = self._chapters.get(chapter, (0, 0))
+        return end - start
+
+    def chapter_counts(self):
+        """{章节号: 题目数}"""
+        return {chapter: self.chapter_count(chapter) for chapter in self.chapters()}
+
+    def chapter_range(self, chapter):
+        """指定章节在题库中的位置范围 (start, end)"""
+        if self._chapters is None:
+            self._build_index()
+        return self._chapters.get(chapter, (0, 0))
+
+    def position(self, qid):
+        """题目id在题库中的位置，不存在时返回None"""
+        if self._positions is None:
+            self._build_index()
+        return self._positions.get(qid)
+
+    def chapter_title(self, chapter):
+        return self.chapter_titles.get(chapter, '')
+
+    def ids(self):
+        """全部题目id数组（升序）"""
+        if self._ids is None:
+            self._build_index()
+        return self._ids
+
+    def chapter_ids(self, chapter):
+        """指定章节的题目id数组"""
+        if self._chapters is None:
+            self._build_index()
+        start, end = self._chapters.get(chapter, (0, 0))
+        return self._ids[start:end]
+
+    def in_chapter(self, chapter):
+        """指定章节的题目列表，不存在时返回空列表"""
+        if self._chapters is None:
+            self._build_index()
+        start, end = self._chapters.get(chapter, (0, 0))
+        return self._questions[start:end]
+
+    def copy(self):
+        return list(self._questions)
@@ -1,175 +1,185 @@
-import re
-import json
-import os
-from datetime import datetime
+import atexit
 import random
+import time
+from datetime import datetime
+from adaptive_selector import AdaptiveSelector
+from analytics import AnswerAnalytics, print_report
+from question_store import parse_question_key
+from review_scheduler import GRADUATE_DAYS, ReviewScheduler
+from quiz_parser import parse_file
+from search_index import load_index
+from session_token import InvalidToken, SessionToken
+from shuffle_service import new_seed, option_permutation, present, shuffle_questions
+from storage import DEFAULT_USER, import_legacy_files, open_storage
 
 def load_questions(filename):
-    with open(filename, 'r', encoding='utf-8') as f:
-        content = f.read()
-    
-    # 按章节分割内容
-    chapters = re.split(r'\*\*第.*?章.*?\*\*', content)[1:]
-    
-    # 用于存储所有题目
-    all_questions = []
-    question_map = {}
-    
-    for chapter_idx, chapter_content in enumerate(chapters, 1):
-        # 提取题目
-        pattern = r'(\d+)\.\s+题目：(.*?)\n\s+\*\s+A、(.*?)\n\s+\*\s+B、(.*?)\n\s+\*\s+C、(.*?)\n\s+\*\s+D、(.*?)\n\s+答案：([A-D])'
-        questions = re.findall(pattern, chapter_content, re.DOTALL)
-        
-        for q in questions:
-            num, question, a, b, c, d, answer = q
-            
-            # 清理题目文本
-            clean_question = ' '.join(question.strip().split())
-            
-            # 清理选项文本
-            clean_options = {
-                'A': ' '.join(a.strip().split()),
-                'B': ' '.join(b.strip().split()),
-                'C': ' '.join(c.strip().split()),
-                'D': ' '.join(d.strip().split())
-            }
-            
-            # 检查重复和矛盾
-            if clean_question in question_map:
-                existing_q = question_map[clean_question]
-                if existing_q['correct_answer'] != answer:
-                    print(f"\n警告：发现答案矛盾的题目：")
-                    print(f"题号 {existing_q['number']} 和 {num}")
-                    print(f"题目：{clean_question}")
-                    print(f"答案分别为：{existing_q['correct_answer']} 和 {answer}")
-                    continue
-                else:
-                    print(f"\n警告：发现重复的题目：")
-                    print(f"题号 {existing_q['number']} 和 {num}")
-                    continue
-            
-            formatted_q = {
-                'chapter': chapter_idx,
-                'number': num,
-                'question': clean_question,
-                'options': clean_options,
-                'correct_answer': answer
-            }
-            
-            question_map[clean_question] = formatted_q
-            all_questions.append(formatted_q)
+    # 流式解析题库，重复和矛盾的题目由解析器剔除并记录
+    all_questions, parser = parse_file(filename)
     
-    # 按题号排序
-    all_questions.sort(key=lambda x: (x['chapter'], int(x['number'])))
+    for d in parser.diagnostics:
+        if d.kind == 'conflict':
+            print(f"\n警告：发现答案矛盾的题目（第{d.line}行）：")
+        elif d.kind == 'duplicate':
+            print(f"\n警告：发现重复的题目（第{d.line}行）：")
+        else:
+            print(f"\n警告：第{d.line}行格式错误：")
+        print(d.message)
+    if parser.diagnostic_count > len(parser.diagnostics):
+        print(f"\n另有{parser.diagnostic_count - len(parser.diagnostics)}条警告未显示")
     
     if not all_questions:
         print("警告：没有找到任何题目！")
         print("正在打印文件内容的一部分用于调试：")
-        print(content[:500])
+        with open(filename, 'r', encoding='utf-8') as f:
+            print(f.read(500))
     else:
         print(f"\n成功加载 {len(all_questions)} 道题目")
-        print(f"共 {len(set(q['chapter'] for q in all_questions))} 章")
+        print(f"共 {len(all_questions.chapters())} 章")
         
         # 显示每章题目数量
-        chapter_counts = {}
-        for q in all_questions:
-            chapter_counts[q['chapter']] = chapter_counts.get(q['chapter'], 0) + 1
-        
-        for chapter, count in sorted(chapter_counts.items()):
+        for chapter, count in all_questions.chapter_counts().items():
             print(f"第{chapter}章：{count}题")
     
     return all_questions
 
-def save_progress(progress):
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"quiz_progress_{timestamp}.json"
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(progress, f, ensure_ascii=False, indent=2)
-    return filename
+_storage = None
+
+def get_storage():
+    """打开答题数据库；第一次创建时导入旧版的进度文件、自动保存和错题本"""
+    global _storage
+    if _storage is None:
+        _storage = open_storage()
+        if _storage.is_new:
+            for warning in import_legacy_files(_storage, DEFAULT_USER):
+                print(f"警告：{warning}")
+        atexit.register(_storage.close)
+    return _storage
+
+_scheduler = None
+
+# 每次错题练习最多安排的题数
+REVIEW_BATCH = 20
+
+_selector = None
+
+# 每次智能练习的题数
+ADAPTIVE_COUNT = 20
+
+def get_selector(questions):
+    """智能选题器，第一次使用时从作答记录汇总统计，之后逐题增量更新"""
+    global _selector
+    if _selector is None or _selector.store.ids() != questions.ids():
+        _selector = AdaptiveSelector(questions, get_storage())
+    return _selector
+
+def record_stats(q, correct, elapsed):
+    # 选题器已载入时同步更新；未载入时下次载入会从作答记录中汇总
+    if _selector is not None:
+        _selector.record(DEFAULT_USER, q.id, correct, elapsed)
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ReviewScheduler(get_storage())
+    return _scheduler
 
-def load_progress(filename):
-    with open(filename, 'r', encoding='utf-8') as f:
-        return json.load(f)
+_search_index = None
+
+# 每次搜索最多显示的题数
+SEARCH_LIMIT = 10
+
+def get_search_index(questions, source='quiz.md'):
+    """题目搜索索引，保存在题库旁边，题库变化后重建"""
+    global _search_index
+    if _search_index is None or _search_index.qids != questions.ids():
+        _search_index = load_index(source, questions)
+    return _search_index
+
+def save_progress(session_id):
+    get_storage().set_session_status(session_id, 'saved')
+    return session_id
+
+def load_progress(session_id):
+    return get_storage().get_session(session_id)
 
 def list_saved_progress():
-    progress_files = [f for f in os.listdir() if f.startswith('quiz_progress_') and f.endswith('.json')]
-    return sorted(progress_files, reverse=True)  # 最新的在前面
+    # 最新的在前面
+    return get_storage().list_sessions(DEFAULT_USER)
 
 def save_wrong_questions(wrong_questions):
-    filename = "wrong_questions.json"
-    if os.path.exists(filename):
-        with open(filename, 'r', encoding='utf-8') as f:
-            existing_wrong = json.load(f)
-        # 合并现有错题和新错题，保留正确次数
-        for num, q in wrong_questions.items():
-            if num in existing_wrong:
-                q['correct_count'] = existing_wrong[num].get('correct_count', 0)
-            else:
-                q['correct_count'] = 0
-    else:
-        # 新增错题默认正确次数为0
-        for q in wrong_questions.values():
+    storage = get_storage()
+    existing_wrong = storage.wrong_questions(DEFAULT_USER)
+    # 合并现有错题和新错题，保留正确次数；只写入这些题目，不重写整个错题本
+    for num, q in wrong_questions.items():
+        if num in existing_wrong:
+            q['correct_count'] = existing_wrong[num].get('correct_count', 0)
+        else:
             q['correct_count'] = 0
-    
-    with open(filename, 'w', encoding='utf-8') as f:
-        json.dump(wrong_questions, f, ensure_ascii=False, indent=2)
-
-def load_wrong_questions():
-    filename = "wrong_questions.json"
-    if os.path.exists(filename):
-        with open(filename, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return {}
+    storage.set_wrong_many(DEFAULT_USER, {parse_question_key(num): q
+                                          for num, q in wrong_questions.items()})
 
-def shuffle_options(options, correct_answer):
-    """随机打乱选项并返回新的选项和正确答案"""
-    # 创建选项列表
-    options_list = [(key, value) for key, value in options.items()]
-    # 记住正确答案对应的选项内容
-    correct_content = options[correct_answer]
-    # 打乱选项
-    random.shuffle(options_list)
-    
-    # 创建新的选项字典
-    new_options = {chr(65+i): content for i, (_, content) in enumerate(options_list)}
-    # 找到正确答案的新选项字母
-    new_correct = next(key for key, value in new_options.items() if value == correct_content)
-    
-    return new_options, new_correct
+def load_wrong_questions(chapter=None):
+    # 按用户和章节走索引查询，可只取某一章
+    return get_storage().wrong_questions(DEFAULT_USER, chapter)
 
-def practice_questions(questions, wrong_questions=None, start_from=0):
+def practice_questions(questions, start_from=0, seed=None, chapter=0, session_id=None, token=None):
     score = 0
+    # 会话种子决定题目顺序和每道题的选项顺序，随进度一起保存，继续测验时顺序不变
+    if seed is None:
+        seed = new_seed()
     total = len(questions)
-    answers = {}
     new_wrong_questions = {}
+    storage = get_storage()
     
-    # 加载自动保存的进度
-    auto_save_file = "auto_save.json"
-    if os.path.exists(auto_save_file) and start_from == 0:
-        try:
-            with open(auto_save_file, 'r', encoding='utf-8') as f:
-                auto_save = json.load(f)
-                if input("\n发现上次的自动保存进度，是否继续？(y/n): ").lower() == 'y':
-                    score = auto_save['score']
-                    start_from = auto_save['current_question']
-                    answers = auto_save['answers']
-        except:
-            pass
+    if token is not None:
+        # 按进度口令继续：种子、位置和得分都取自口令
+        seed, start_from, score = token.seed, token.position, token.score
+    elif session_id is not None:
+        score = storage.get_session(session_id)['score']
+    elif start_from == 0:
+        # 有同一范围内未完成的测验时询问是否继续
+        auto_save = storage.active_session(DEFAULT_USER)
+        if auto_save and auto_save['chapter'] == chapter and auto_save['total'] == total:
+            if input("\n发现上次的自动保存进度，是否继续？(y/n): ").lower() == 'y':
+                session_id = auto_save['id']
+                score = auto_save['score']
+                start_from = auto_save['current_question']
+                seed = auto_save['seed']
+    
+    # 每道题只写入一条答题记录，不再整体重写自动保存文件
+    if session_id is None:
+        session_id = storage.start_session(DEFAULT_USER, seed, total, chapter, score, start_from)
+    
+    # 题目顺序与网页上同一种子的测验相同（shuffle_service.SessionShuffle），进度口令在两边通用
+    if token is None:
+        token = SessionToken.start(seed, [q.id for q in questions], chapter or None)
+        answered = storage.session_answers(session_id) if start_from else {}
+        questions = shuffle_questions(seed, questions)
+        for i, q in enumerate(questions[:start_from]):
+            shown = present(q, option_permutation(seed, q.id))
+            token.record(i, answered.get(q.id) == shown['correct_answer'])
+    else:
+        questions = shuffle_questions(seed, questions)
     
     print(f"\n共{total}道题目，从第{start_from+1}题开始")
     
     try:
         for i in range(start_from, total):
+            if token.is_answered(i):
+                # 在网页上已经答过的题
+                continue
             q = questions[i]
-            # 随机打乱选项
-            shuffled_options, shuffled_answer = shuffle_options(q['options'], q['correct_answer'])
+            # 按会话种子打乱选项
+            shown = present(q, option_permutation(seed, q.id))
+            shuffled_options, shuffled_answer = shown['options'], shown['correct_answer']
             
-            print(f"\n第{q['chapter']}章 第{q['number']}题: {q['question']}")
+            print(f"\n第{q.chapter}章 第{q.number}题: {q.text}")
             print(f"A. {shuffled_options['A']}")
             print(f"B. {shuffled_options['B']}")
             print(f"C. {shuffled_options['C']}")
             print(f"D. {shuffled_options['D']}")
             
+            started = time.monotonic()
             while True:
                 answer = input("\n请输入你的答案(A/B/C/D)，或输入S保存进度，Q退出: ").strip().upper()
                 if answer in ['A', 'B', 'C', 'D', 'S', 'Q']:
@@ -177,70 +187,51 @@ def practice_questions(questions, wrong_questions=None, start_from=0):
                 print("输入无效，请输入A、B、C、D或S保存进度，Q退出")
             
             if answer == 'S':
-                progress = {
-                    'score': score,
-                    'current_question': i,
-                    'answers': answers,
-                    'total': total
-                }
-                saved_file = save_progress(progress)
-                print(f"\n进度已保存到文件：{saved_file}")
+                save_progress(session_id)
+                print(f"\n进度已保存（编号{session_id}）")
+                print(f"进度口令（可在网页、图形界面或其他电脑上继续）：\n{token.encode()}")
                 break
                 
             if answer == 'Q':
                 print("\n已退出测验")
                 break
             
-            answers[q['number']] = answer
-            
             if answer == shuffled_answer:  # 使用打乱后的正确答案
                 print("✓ 回答正确！")
                 score += 1
-                if wrong_questions and q['number'] in wrong_questions:
-                    del wrong_questions[q['number']]
             else:
                 print(f"✗ 回答错误。正确答案是：{shuffled_answer}")  # 显示打乱后的正确答案
-                new_wrong_questions[q['number']] = {
-                    'chapter': q['chapter'],
-                    'question': q['question'],
+                new_wrong_questions[q.key] = {
+                    'chapter': q.chapter,
+                    'number': q.number,
+                    'question': q.text,
                     'options': shuffled_options,  # 保存打乱后的选项顺序
                     'correct_answer': shuffled_answer,  # 保存打乱后的正确答案
                     'your_answer': answer
                 }
+                # 错题立即记入错题本，中途退出也不会丢失
+                storage.set_wrong(DEFAULT_USER, q.id, dict(new_wrong_questions[q.key], correct_count=0))
+                get_scheduler().record(DEFAULT_USER, q.id, False)
             
             print(f"当前得分：{score}/{total}")
             
             # 自动保存进度
-            auto_save = {
-                'score': score,
-                'current_question': i + 1,  # 保存下一题的位置
-                'answers': answers,
-                'total': total,
-                'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-            with open(auto_save_file, 'w', encoding='utf-8') as f:
-                json.dump(auto_save, f, ensure_ascii=False, indent=2)
+            elapsed = time.monotonic() - started
+            storage.record_answer(session_id, q.id, answer, answer == shuffled_answer, i, elapsed)
+            record_stats(q, answer == shuffled_answer, elapsed)
+            token.record(i, answer == shuffled_answer)
     
     except KeyboardInterrupt:
+        # 每道题作答后都已提交，中断时不需要另外保存
         print("\n\n测验被中断")
-        # 中断时也保存进度
-        auto_save = {
-            'score': score,
-            'current_question': i,
-            'answers': answers,
-            'total': total,
-            'timestamp': datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        with open(auto_save_file, 'w', encoding='utf-8') as f:
-            json.dump(auto_save, f, ensure_ascii=False, indent=2)
         
-    if i == total - 1:
+    if token.finished:
         print(f"\n测验完成！最终得分：{score}/{total}")
         # 输出错题汇总
         if new_wrong_questions:
             print("\n错题汇总：")
-            for num, wrong_q in new_wrong_questions.items():
-                print(f"\n第{wrong_q['chapter']}章 第{num}题: {wrong_q['question']}")
+            for wrong_q in new_wrong_questions.values():
+                print(f"\n第{wrong_q['chapter']}章 第{wrong_q['number']}题: {wrong_q['question']}")
                 print(f"A. {wrong_q['options']['A']}")
                 print(f"B. {wrong_q['options']['B']}")
                 print(f"C. {wrong_q['options']['C']}")
@@ -248,33 +239,62 @@ def practice_questions(questions, wrong_questions=None, start_from=0):
                 print(f"正确答案：{wrong_q['correct_answer']}")
                 print(f"你的答案：{wrong_q['your_answer']}")
             print(f"\n共{len(new_wrong_questions)}道错题，已加入错题本")
-        # 删除自动保存文件
-        if os.path.exists(auto_save_file):
-            os.remove(auto_save_file)
+        # 清除自动保存的进度
+        storage.set_session_status(session_id, 'finished')
     
     return score, total
 
-def practice_wrong_questions(questions, wrong_questions):
+def practice_from_token(questions, value):
+    """按进度口令继续测验（口令可以来自网页、图形界面或命令行）；口令无效或已失效时返回False"""
+    try:
+        token = SessionToken.decode(value)
+    except InvalidToken as e:
+        print(e)
+        return False
+    selected = questions.in_chapter(token.chapter) if token.chapter else questions
+    if not token.matches([q.id for q in selected]):
+        print("题库已更新，这个进度口令已失效")
+        return False
+    practice_questions(selected, chapter=token.chapter or 0, token=token)
+    return True
+
+def practice_wrong_questions(questions, chapter=None, limit=REVIEW_BATCH):
     score = 0
-    # 使用伪随机抽取错题
-    wrong_questions_list = list(wrong_questions.items())
-    random.seed(datetime.now().timestamp())  # 使用当前时间作为随机种子
-    random.shuffle(wrong_questions_list)
+    scheduler = get_scheduler()
+    # 只取已经到期的错题，按到期先后从复习堆中取出，不需要读入整个错题本
+    due = scheduler.next_due(DEFAULT_USER, limit, chapter)
+    if not due:
+        next_time = scheduler.next_review_time(DEFAULT_USER)
+        print("\n暂时没有需要复习的错题")
+        if next_time:
+            print(f"下次复习时间：{datetime.fromtimestamp(next_time).strftime('%Y-%m-%d %H:%M')}")
+        return 0, 0
+    
+    wrong_questions = load_wrong_questions(chapter)
+    # 按会话种子打乱本次的题目顺序，不改动全局随机数状态
+    seed = new_seed()
+    wrong_questions_list = shuffle_questions(seed, due)
     
     total = len(wrong_questions_list)
-    print(f"\n共{total}道错题")
+    storage = get_storage()
+    print(f"\n本次复习{total}道错题")
     
     try:
         wrong_in_practice = {}  # 记录本次练习做错的题目
-        for num, wrong_q in wrong_questions_list:
-            q = next((q for q in questions if q['number'] == num), None)
+        for qid in wrong_questions_list:
+            # 按题目id在题库索引中查找，O(1)
+            q = questions.get(qid)
             if not q:
                 continue
+            num = q.key
+            wrong_q = wrong_questions.get(num, {'chapter': q.chapter, 'number': q.number,
+                                                'question': q.text})
             
-            # 随机打乱选项
-            shuffled_options, shuffled_answer = shuffle_options(q['options'], q['correct_answer'])
+            # 按会话种子打乱选项
+            shown = present(q, option_permutation(seed, q.id))
+            shuffled_options, shuffled_answer = shown['options'], shown['correct_answer']
             
-            print(f"\n第{q['chapter']}章 第{q['number']}题: {q['question']}")
+            print(f"\n第{q.chapter}章 第{q.number}题: {q.text}")
             print(f"A. {shuffled_options['A']}")
             print(f"B. {shuffled_options['B']}")
             print(f"C. {shuffled_options['C']}")
@@ -290,47 +310,46 @@ def practice_wrong_questions(questions, wrong_questions):
                 print("\n已退出练习")
                 break
             
+            state = scheduler.record(DEFAULT_USER, q.id, answer == shuffled_answer)
+            wrong_q['your_answer'] = answer
             if answer == shuffled_answer:  # 使用打乱后的正确答案
                 print("✓ 回答正确！")
                 score += 1
                 wrong_q['correct_count'] = wrong_q.get('correct_count', 0) + 1
-                if wrong_q['correct_count'] >= 3:
-                    print(f"恭喜！此题已连续答对3次，将从错题本中移除")
-                    del wrong_questions[num]
+                if scheduler.graduated(state):
+                    print(f"恭喜！此题的复习间隔已达到{GRADUATE_DAYS}天，将从错题本中移除")
+                    storage.remove_wrong(DEFAULT_USER, q.id)
+                    scheduler.forget(DEFAULT_USER, q.id)
                 else:
-                    wrong_q['your_answer'] = answer
-                    wrong_questions[num] = wrong_q
+                    print(f"{state.interval:g}天后再复习")
+                    storage.set_wrong(DEFAULT_USER, q.id, wrong_q)
             else:
                 print(f"✗ 回答错误。正确答案是：{shuffled_answer}")  # 显示打乱后的正确答案
                 wrong_q['correct_count'] = 0
-                wrong_q['your_answer'] = answer
-                wrong_questions[num] = wrong_q
+                storage.set_wrong(DEFAULT_USER, q.id, wrong_q)
             
             print(f"当前得分：{score}/{total}")
             
-            # 保存最新状态
-            save_wrong_questions(wrong_questions)
-            
             if answer != shuffled_answer:
                 wrong_in_practice[num] = {
-                    'chapter': q['chapter'],
-                    'question': q['question'],
-                    'options': q['options'],
-                    'correct_answer': q['correct_answer'],
+                    'chapter': q.chapter,
+                    'number': q.number,
+                    'question': q.text,
+                    'options': q.option_dict,
+                    'correct_answer': q.correct_answer,
                     'your_answer': answer
                 }
     
     except KeyboardInterrupt:
         print("\n\n练习被中断")
-        save_wrong_questions(wrong_questions)
     
     print(f"\n练习完成！最终得分：{score}/{total}")
     
     # 输出本次练习的错题汇总
     if wrong_in_practice:
         print("\n本次练习错题汇总：")
-        for num, wrong_q in wrong_in_practice.items():
-            print(f"\n第{wrong_q['chapter']}章 第{num}题: {wrong_q['question']}")
+        for wrong_q in wrong_in_practice.values():
+            print(f"\n第{wrong_q['chapter']}章 第{wrong_q['number']}题: {wrong_q['question']}")
             print(f"A. {wrong_q['options']['A']}")
             print(f"B. {wrong_q['options']['B']}")
             print(f"C. {wrong_q['options']['C']}")
@@ -341,16 +360,133 @@ def practice_wrong_questions(questions, wrong_questions):
     
     return score, total
 
+def adaptive_practice(questions, count=ADAPTIVE_COUNT):
+    """按作答统计逐题挑选，集中练习薄弱的章节和容易错的题目"""
+    selector = get_selector(questions)
+    storage = get_storage()
+    seed = new_seed()
+    rng = random.Random(seed)
+    session_id = storage.start_session(DEFAULT_USER, seed, count)
+    score = 0
+    answered = 0
+    chapter_results = {}
+    print(f"\n智能练习：根据答题记录挑选{count}道题")
+    
+    try:
+        for i in range(count):
+            q = selector.pick(DEFAULT_USER, rng)
+            if q is None:
+                break
+            shown = present(q, option_permutation(seed, q.id))
+            shuffled_options, shuffled_answer = shown['options'], shown['correct_answer']
+            
+            print(f"\n[{i+1}/{count}] 第{q.chapter}章 第{q.number}题: {q.text}")
+            print(f"A. {shuffled_options['A']}")
+            print(f"B. {shuffled_options['B']}")
+            print(f"C. {shuffled_options['C']}")
+            print(f"D. {shuffled_options['D']}")
+            
+            started = time.monotonic()
+            while True:
+                answer = input("\n请输入你的答案(A/B/C/D)，或输入Q退出: ").strip().upper()
+                if answer in ['A', 'B', 'C', 'D', 'Q']:
+                    break
+                print("输入无效，请输入A、B、C、D或Q退出")
+            
+            if answer == 'Q':
+                print("\n已退出练习")
+                break
+            
+            elapsed = time.monotonic() - started
+            correct = answer == shuffled_answer
+            selector.record(DEFAULT_USER, q.id, correct, elapsed)
+            storage.record_answer(session_id, q.id, answer, correct, i, elapsed)
+            answered += 1
+            right, total = chapter_results.get(q.chapter, (0, 0))
+            chapter_results[q.chapter] = (right + correct, total + 1)
+            
+            if correct:
+                print("✓ 回答正确！")
+                score += 1
+            else:
+                print(f"✗ 回答错误。正确答案是：{shuffled_answer}")
+                storage.set_wrong(DEFAULT_USER, q.id, {
+                    'chapter': q.chapter,
+                    'number': q.number,
+                    'question': q.text,
+                    'options': shuffled_options,
+                    'correct_answer': shuffled_answer,
+                    'your_answer': answer,
+                    'correct_count': 0
+                })
+                get_scheduler().record(DEFAULT_USER, q.id, False)
+    
+    except KeyboardInterrupt:
+        print("\n\n练习被中断")
+    
+    # 智能练习的题目是逐题挑选的，不能按进度继续
+    storage.set_session_status(session_id, 'finished')
+    
+    print(f"\n练习完成！得分：{score}/{answered}")
+    for chapter, (right, total) in sorted(chapter_results.items()):
+        print(f"第{chapter}章：{right}/{total}")
+    return score, answered
+
+def search_questions(questions):
+    """按关键词搜索题干和选项，可限定章节"""
+    index = get_search_index(questions)
+    while True:
+        query = input("\n请输入关键词（直接回车返回）: ").strip()
+        if not query:
+            break
+        chapter = input("限定章节（直接回车为全部章节）: ").strip()
+        try:
+            chapter = int(chapter) if chapter else None
+        except ValueError:
+            print("请输入有效的数字")
+            continue
+        
+        start = time.perf_counter()
+        results = index.search(query, chapter, SEARCH_LIMIT)
+        elapsed = (time.perf_counter() - start) * 1000
+        if not results:
+            print("没有找到相关的题目")
+            continue
+        
+        print(f"\n找到{len(results)}道题（{elapsed:.1f}ms）：")
+        for doc, _ in results:
+            q = questions[doc]
+            print(f"\n第{q.chapter}章 第{q.number}题：{q.text}")
+            for key, option in q.option_dict.items():
+                print(f"    {key}. {option}")
+            print(f"    答案：{q.correct_answer}")
+
+def show_report(questions):
+    """打印本机的学习报告（需要安装 numpy）"""
+    try:
+        analytics = AnswerAnalytics(get_storage(), questions)
+    except ImportError as e:
+        print(e)
+        return
+    analytics.refresh()
+    if not len(analytics.columns):
+        print("还没有作答记录！")
+        return
+    print_report(analytics.report(DEFAULT_USER))
+
 def quiz():
     while True:
         print("\n1. 开始新测验")
         print("2. 继续上次测验")
         print("3. 练习错题")
-        print("4. 退出")
+        print("4. 智能练习")
+        print("5. 学习报告")
+        print("6. 搜索题目")
+        print("7. 退出")
         
-        choice = input("\n请选择(1-4): ").strip()
+        choice = input("\n请选择(1-7): ").strip()
         
-        if choice == '4':
+        if choice == '7':
             print("再见！")
             break
             
@@ -361,12 +497,11 @@ def quiz():
         
         if choice == '1':
             # 显示章节选择菜单
-            chapters = sorted(set(q['chapter'] for q in questions))
+            chapters = questions.chapters()
             print("\n请选择要测试的章节：")
             print("0. 全部章节")
             for chapter in chapters:
-                chapter_questions = [q for q in questions if q['chapter'] == chapter]
-                print(f"{chapter}. 第{chapter}章 ({len(chapter_questions)}题)")
+                print(f"{chapter}. 第{chapter}章 {questions.chapter_title(chapter)} ({questions.chapter_count(chapter)}题)")
             
             while True:
                 try:
@@ -375,47 +510,55 @@ def quiz():
                         selected_questions = questions
                         break
                     elif chapter_choice in chapters:
-                        selected_questions = [q for q in questions if q['chapter'] == chapter_choice]
+                        selected_questions = questions.in_chapter(chapter_choice)
                         break
                     print(f"请输入0-{max(chapters)}之间的数字")
                 except ValueError:
                     print("请输入有效的数字")
             
-            practice_questions(selected_questions)
+            practice_questions(selected_questions, chapter=chapter_choice)
             
         elif choice == '2':
             saved_files = list_saved_progress()
             if not saved_files:
                 print("没有找到保存的进度！")
-                continue
-                
-            print("\n找到以下保存的进度：")
-            for i, f in enumerate(saved_files, 1):
-                print(f"{i}. {f}")
+            else:
+                print("\n找到以下保存的进度：")
+                for i, p in enumerate(saved_files, 1):
+                    scope = f"第{p['chapter']}章" if p['chapter'] else "全部章节"
+                    saved_at = datetime.fromtimestamp(p['updated']).strftime("%Y-%m-%d %H:%M")
+                    print(f"{i}. {saved_at} {scope} 已答{p['current_question']}/{p['total']}题 得分{p['score']}")
                 
             while True:
+                entry = input("\n请选择要继续的进度(输入数字)，或粘贴进度口令（直接回车返回）: ").strip()
+                if not entry:
+                    break
+                if not entry.isdigit():
+                    if practice_from_token(questions, entry):
+                        break
+                    continue
                 try:
-                    file_choice = int(input("\n请选择要继续的进度(输入数字): "))
+                    file_choice = int(entry)
                     if 1 <= file_choice <= len(saved_files):
-                        progress = load_progress(saved_files[file_choice-1])
-                        questions = questions[progress['current_question']:]
-                        practice_questions(questions)
+                        progress = load_progress(saved_files[file_choice-1]['id'])
+                        if progress['chapter']:
+                            questions = questions.in_chapter(progress['chapter'])
+                        get_storage().resume_session(progress['id'])
+                        practice_questions(questions, start_from=progress['current_question'],
+                                           seed=progress['seed'], chapter=progress['chapter'],
+                                           session_id=progress['id'])
                         break
-                    print(f"请输入1-{len(saved_files)}之间的数字")
+                    print(f"请输入1-{len(saved_files)}之间的数字" if saved_files else "请粘贴进度口令")
                 except ValueError:
                     print("请输入有效的数字")
                     
         elif choice == '3':
-            wrong_questions = load_wrong_questions()
-            if not wrong_questions:
+            if not get_storage().wrong_chapter_counts(DEFAULT_USER):
                 print("错题本中还没有题目！")
                 continue
             
             # 显示错题的章节分布
-            wrong_chapters = {}
-            for num, q in wrong_questions.items():
-                chapter = q['chapter']
-                wrong_chapters[chapter] = wrong_chapters.get(chapter, 0) + 1
+            wrong_chapters = get_storage().wrong_chapter_counts(DEFAULT_USER)
             
             print("\n错题分布：")
             print("0. 全部错题")
@@ -426,17 +569,25 @@ def quiz():
                 try:
                     chapter_choice = int(input("\n请选择要练习的章节: "))
                     if chapter_choice == 0:
-                        selected_wrong = wrong_questions
+                        selected_chapter = None
                         break
                     elif chapter_choice in wrong_chapters:
-                        selected_wrong = {num: q for num, q in wrong_questions.items() 
-                                       if q['chapter'] == chapter_choice}
+                        selected_chapter = chapter_choice
                         break
                     print(f"请输入0-{max(wrong_chapters.keys())}之间的数字")
                 except ValueError:
                     print("请输入有效的数字")
             
-            practice_wrong_questions(questions, selected_wrong)
+            practice_wrong_questions(questions, selected_chapter)
+        
+        elif choice == '4':
+            adaptive_practice(questions)
+        
+        elif choice == '5':
+            show_report(questions)
+        
+        elif choice == '6':
+            search_questions(questions)
 
 if __name__ == '__main__':
     print("欢迎参加园林植物景观设计测验！")
@@ -0,0 +1,1091 @@
+"""题库 API
+
+api/index.py（Vercel）和 backend/main.py（uvicorn）都用 create_app() 创建应用，
+接口、题库缓存和启动预热只有这一份。
+
+题库、数据库和各种索引是进程级的，同一进程中创建的多个应用共享它们。
+启动阶段（开始接收请求之前）在线程池中依次载入题库、打开数据库、生成预序列化内容、
+读入搜索索引、汇总选题统计，并把主要接口的代码路径各走一遍，冷启动后的第一个请求不必承担这些开销；
+每一步的耗时记录在日志中，也可以从 /api/test 查看。
+"""
+from fastapi import APIRouter, FastAPI, Request
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
+from starlette.concurrency import run_in_threadpool
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import logging
+import os
+import random
+from pathlib import Path
+import tempfile
+import threading
+import time
+from typing import Optional
+
+from bank_artifact import load_bank
+from bank_payloads import BankPayloads, dumps
+from question_store import QuestionStore, parse_question_key
+from quiz_parser import QuestionParser
+from shuffle_service import (SessionShuffle, grade, new_seed, option_permutation, present, session_order,
+                             shuffled_letter)
+from adaptive_selector import AdaptiveSelector
+from analytics import AnswerAnalytics
+from review_scheduler import ReviewScheduler
+from search_index import load_index
+from session_token import InvalidToken, SessionToken, new_user, sign_user, verify_user
+from shared_bank import SharedBank, publish, shared_directory
+from storage import ADAPTIVE_STATUS, open_storage
+from structured_log import RequestLogMiddleware, configure, get_logger
+from write_behind import QueueFull, WrongQuestionWriter
+
+log = get_logger('api')
+
+router = APIRouter()
+
+# 尝试多个可能的文件位置
+POSSIBLE_PATHS = [
+    Path(__file__).parent / "api/data/quiz.md",
+    Path(__file__).parent / "quiz.md",
+    Path(__file__).parent / "api/quiz.md",
+]
+
+def find_question_file():
+    """返回第一个存在的题库文件路径，找不到时返回None"""
+    for file_path in POSSIBLE_PATHS:
+        try:
+            if file_path.exists():
+                return file_path
+        except Exception as e:
+            log.warning('bank path check failed', path=str(file_path), error=str(e))
+    return None
+
+# 找不到题库文件时使用的内置示例题目
+FALLBACK_CONTENT = """**第1章 绪论**
+
+1. 题目：园林植物景观设计的主要任务是什么？
+    * A、提供游憩场所
+    * B、美化环境
+    * C、创造优美的植物景观
+    * D、以上都是
+    答案：D
+
+2. 题目：园林植物景观设计要遵循的基本原则不包括：
+    * A、适地适树
+    * B、因地制宜
+    * C、统一协调
+    * D、追求奢华
+    答案：D
+
+**第2章 基础知识**
+
+1. 题目：下列哪种不是常见的园林植物配置形式？
+    * A、花境
+    * B、花坛
+    * C、草坪
+    * D、沙漠
+    答案：D
+
+2. 题目：植物群落的垂直结构从上到下正确的顺序是：
+    * A、乔木层-灌木层-草本层-地被层
+    * B、草本层-灌木层-乔木层-地被层
+    * C、地被层-草本层-灌木层-乔木层
+    * D、乔木层-草本层-灌木层-地被层
+    答案：A"""
+
+def log_bank_trace(questions):
+    """调试模式下逐章、逐题输出题库内容"""
+    for chapter in questions.chapters():
+        log.debug('chapter', chapter=chapter, title=questions.chapter_title(chapter),
+                  count=questions.chapter_count(chapter))
+    for q in questions:
+        log.debug('question', id=q.id, chapter=q.chapter, number=q.number, question=q.text[:40],
+                  answer=q.correct_answer)
+
+def load_questions(file_path=None):
+    try:
+        log.debug('locating bank', cwd=str(Path.cwd()), file=str(Path(__file__)))
+        
+        questions = None
+        parser = QuestionParser()
+        if file_path is None:
+            file_path = find_question_file()
+        if file_path is not None:
+            try:
+                # 逐行流式解析，不把整个文件读进内存
+                with open(file_path, "r", encoding="utf-8") as f:
+                    questions = QuestionStore.from_dicts(parser.parse_bank(f), parser.chapter_titles)
+            except OSError as e:
+                log.error('bank read failed', path=str(file_path.absolute()), error=str(e))
+        
+        if questions is None:
+            log.warning('bank not found, using fallback content')
+            file_path = None
+            parser = QuestionParser()
+            questions = QuestionStore.from_dicts(parser.parse_bank(FALLBACK_CONTENT.splitlines()),
+                                                 parser.chapter_titles)
+        
+        # 每个题库版本只记录一条汇总，逐题的解析过程只在调试模式下输出
+        log.info('bank parsed', path=str(file_path) if file_path else None, questions=len(questions),
+                 chapters=len(parser.chapter_titles), diagnostics=parser.diagnostic_count)
+        for d in parser.diagnostics:
+            log.debug('diagnostic', line=d.line, kind=d.kind, message=d.message)
+        return questions
+    except Exception:
+        # 与其他分支返回同一类型，启动和各接口把它当作空题库处理
+        log.exception('bank load failed')
+        return QuestionStore([])
+
+def load_question_bank(file_path=None):
+    """优先读取预编译的题库产物，缺失或过期时才解析Markdown"""
+    if file_path is None:
+        return load_questions()
+    return load_bank(file_path, load_questions)
+
+class QuestionBankCache:
+    """进程级题库缓存
+    
+    题库只解析一次并常驻内存。每 check_interval 秒最多对题库文件做一次stat，
+    mtime或大小变化时在后台线程重建，重建完成前继续返回旧题库，
+    完成后整体替换，请求不会看到解析到一半的题库。
+    """
+    
+    def __init__(self, loader=load_question_bank, locator=find_question_file, check_interval=1.0):
+        self._loader = loader
+        self._locator = locator
+        self.check_interval = check_interval
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        # (题目列表, 文件签名)，整体替换以保证原子性
+        self._state = None
+        self._path = None
+        self._rebuilding = False
+        self.hits = 0
+        self.misses = 0
+        self.rebuilds = 0
+    
+    def _signature(self):
+        """对题库文件做一次stat，返回(路径, mtime, 大小)"""
+        for _ in range(2):
+            if self._path is None:
+                self._path = self._locator()
+                if self._path is None:
+                    return None
+            try:
+                st = self._path.stat()
+                return (str(self._path), st.st_mtime_ns, st.st_size)
+            except OSError:
+                # 文件被移走，重新查找一次
+                self._path = None
+        return None
+    
+    def _build(self, signature):
+        path = Path(signature[0]) if signature else None
+        start = time.perf_counter()
+        questions = self._loader(path)
+        log.info('bank loaded', path=str(path) if path else None, questions=len(questions),
+                 ms=round((time.perf_counter() - start) * 1000, 1))
+        if log.isEnabledFor(logging.DEBUG):
+            log_bank_trace(questions)
+        return questions, signature
+    
+    def _rebuild_in_background(self, signature):
+        try:
+            questions, signature = self._build(signature)
+            with self._lock:
+                # 解析失败时保留旧题库
+                if questions or self._state is None:
+                    self._state = (questions, signature)
+                self.rebuilds += 1
+        finally:
+            self._rebuilding = False
+    
+    @property
+    def ready(self):
+        """题库是否已经载入（之后的 get() 不会阻塞在解析上）"""
+        return self._state is not None
+    
+    def get(self):
+        """返回当前题库（共享对象，调用方不得修改）"""
+        state = self._state
+        now = time.monotonic()
+        if state is not None and now - self._checked < self.check_interval:
+            self.hits += 1
+            return state[0]
+        self._checked = now
+        signature = self._signature()
+        if state is None:
+            with self._lock:
+                if self._state is None:
+                    self.misses += 1
+                    self._state = self._build(signature)
+                else:
+                    self.hits += 1
+                return self._state[0]
+        
+        questions, current = state
+        with self._lock:
+            self.hits += 1
+            if signature != current and not self._rebuilding:
+                self._rebuilding = True
+                threading.Thread(target=self._rebuild_in_background,
+                                 args=(signature,), daemon=True).start()
+        return questions
+    
+    def source_of(self, questions):
+        """题库对应的源文件路径；已被替换的旧题库或内置示例题目返回None"""
+        state = self._state
+        if state and state[0] is questions and state[1]:
+            return Path(state[1][0])
+        return None
+    
+    def stats(self):
+        state = self._state
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "rebuilds": self.rebuilds,
+            "rebuilding": self._rebuilding,
+            "questions_count": len(state[0]) if state else 0,
+            "source": state[1][0] if state and state[1] else None,
+        }
+
+class SharedBankCache(QuestionBankCache):
+    """共享模式的题库缓存（见 shared_bank.py）
+    
+    版本签名取自共享目录的控制头而不是源文件；发布新版本后在后台线程映射新产物，
+    映射只需几毫秒，之后整体替换。尚未发布过时退回自行解析源文件。
+    """
+    
+    def __init__(self, directory, locator=find_question_file, check_interval=1.0):
+        self.shared = SharedBank(directory)
+        super().__init__(loader=self._open, locator=locator, check_interval=check_interval)
+    
+    def _open(self, path):
+        if path is None or path.suffix != '.bank':
+            return load_question_bank(path)
+        return self.shared.open(path)
+    
+    def _signature(self):
+        signature = self.shared.signature()
+        return signature if signature is not None else super()._signature()
+    
+    def publish(self):
+        """源文件与当前版本不同时发布新版本（多个 worker 同时调用时只有一个实际发布）"""
+        source = self._locator()
+        if source is not None:
+            return publish(source, self.shared.directory, load_questions)
+        return None
+    
+    def stats(self):
+        stats = super().stats()
+        current = self.shared.current()
+        stats["shared"] = {"directory": str(self.shared.directory),
+                           "version": current[0] if current else None}
+        return stats
+
+bank_cache = QuestionBankCache()
+
+def get_cached_questions():
+    return bank_cache.get()
+
+async def cached_questions():
+    """在 async 接口中取题库：尚未载入时在线程池中解析，不阻塞事件循环"""
+    if bank_cache.ready:
+        return bank_cache.get()
+    return await run_in_threadpool(bank_cache.get)
+
+# 部署环境中只有临时目录可写，可用环境变量 QUIZ_DB 指定数据库位置
+DB_PATH = os.environ.get('QUIZ_DB', str(Path(tempfile.gettempdir()) / 'quiz.db'))
+_storage = None
+_storage_lock = threading.Lock()
+
+def get_storage():
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            _storage = open_storage(DB_PATH)
+        return _storage
+
+_wrong_writer = None
+
+def get_wrong_writer():
+    global _wrong_writer
+    if _wrong_writer is None:
+        _wrong_writer = WrongQuestionWriter(get_storage(), executor=storage_executor())
+    return _wrong_writer
+
+_scheduler = None
+_selector = None
+
+def get_selector(questions):
+    """智能选题器，题库重建后重新从作答记录汇总统计"""
+    global _selector
+    selector = _selector
+    if selector is None or selector.store is not questions:
+        selector = _selector = AdaptiveSelector(questions, get_storage())
+    return selector
+
+_search_index = None
+_search_lock = threading.Lock()
+
+def get_search_index(questions):
+    """题目搜索索引，题库重建后重新读取或建立，保存在题库文件旁边"""
+    global _search_index
+    with _search_lock:
+        entry = _search_index
+        if entry is None or entry[0] is not questions:
+            # 共享模式下索引与题库一起发布在共享目录中，只读映射
+            mapped = isinstance(bank_cache, SharedBankCache)
+            entry = _search_index = (questions, load_index(bank_cache.source_of(questions), questions, mapped))
+        return entry[1]
+
+_payloads = None
+_payloads_lock = threading.Lock()
+
+def get_payloads(questions):
+    """预先序列化并压缩好的题库内容，每个题库版本只生成一次"""
+    global _payloads
+    with _payloads_lock:
+        entry = _payloads
+        if entry is None or entry[0] is not questions:
+            entry = _payloads = (questions, BankPayloads(questions))
+        return entry[1]
+
+_analytics = None
+_analytics_lock = threading.Lock()
+
+def get_analytics():
+    """作答分析，常驻内存，每次报告前只读入新增的作答记录"""
+    global _analytics
+    if _analytics is None:
+        _analytics = AnswerAnalytics(get_storage())
+    return _analytics
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = ReviewScheduler(get_storage())
+    return _scheduler
+
+# 线程池大小
+# 解析、洗牌、序列化都是纯 Python 计算，计算线程多了只会争抢 GIL，让事件循环线程更难拿到 GIL，
+# 反而拖慢所有请求（见 benchmarks/loop_lag.py：50 个并发客户端下 2 个线程的事件循环延迟 p50 约 7ms，
+# 按 CPU 数 + 4 个线程时约 27ms，吞吐量相同），所以计算用的默认线程池保持很小。
+# SQLite 读写不同：写锁被其他进程占用时一个线程最多等待 busy timeout（10 秒），等待时不持有 GIL；
+# 如果也放在只有两个线程的默认线程池里，两个等锁的请求就会让所有 def 接口排队。
+# 因此所有读写存储的接口、判分记录和错题写入队列都使用单独的存储线程池（run_storage），
+# 其大小按预计同时等锁的请求数设置，def 接口只做不访问存储的计算。
+WORKER_THREADS = int(os.environ.get('QUIZ_WORKER_THREADS') or 2)
+STORAGE_THREADS = int(os.environ.get('QUIZ_STORAGE_THREADS') or 8)
+_storage_executor = None
+_executor_lock = threading.Lock()
+
+def start_executor():
+    # def 接口和 run_in_threadpool 使用事件循环的默认线程池
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=WORKER_THREADS, thread_name_prefix='quiz-worker'))
+
+def storage_executor():
+    """存储读写专用的线程池"""
+    global _storage_executor
+    with _executor_lock:
+        if _storage_executor is None:
+            _storage_executor = ThreadPoolExecutor(max_workers=STORAGE_THREADS, thread_name_prefix='quiz-storage')
+        return _storage_executor
+
+async def run_storage(fn, *args):
+    """在存储线程池中执行 fn(*args)"""
+    return await asyncio.get_running_loop().run_in_executor(storage_executor(), partial(fn, *args))
+
+# 最近一次启动预热每一步的耗时（毫秒）
+warmup_timings = {}
+
+def load_indexed_bank():
+    """载入题库并建立id和章节索引"""
+    questions = get_cached_questions()
+    questions.ids()
+    return questions
+
+def warm_hot_paths(questions):
+    """把主要接口的代码路径各走一遍：洗牌、进度口令、展示、序列化、预生成内容、搜索和选题"""
+    seed = new_seed()
+    chapter = questions.chapters()[0]
+    dumps(build_page(questions, seed, chapter, 0, PAGE_SIZE))
+    open_session_token(questions, SessionToken.start(seed, questions.chapter_ids(chapter), chapter).encode())
+    dumps(SessionShuffle(seed, questions.chapter_ids(chapter)).layouts())
+    get_payloads(questions).get(chapter).serve(None, 'gzip')
+    get_search_index(questions).search(questions[0].text[:4])
+    get_selector(questions).pick('anonymous', random.Random(seed), chapter)
+
+async def warm_up():
+    """启动阶段在线程池中依次建立全部缓存，记录每一步的耗时"""
+    timings = {}
+    
+    async def step(name, fn, *args):
+        start = time.perf_counter()
+        result = await run_in_threadpool(fn, *args)
+        timings[name] = round((time.perf_counter() - start) * 1000, 1)
+        log.info('warmup', step=name, ms=timings[name])
+        return result
+    
+    questions = await step('bank', load_indexed_bank)
+    await step('storage', get_storage)
+    if questions:
+        await step('payloads', get_payloads, questions)
+        await step('search', get_search_index, questions)
+        await step('selector', get_selector, questions)
+        await step('hot_paths', warm_hot_paths, questions)
+    log.info('warmup done', ms=round(sum(timings.values()), 1))
+    warmup_timings.clear()
+    warmup_timings.update(timings)
+
+async def flush_wrong_writer():
+    # 关闭前把队列中的错题全部写入
+    if _wrong_writer is not None:
+        await _wrong_writer.close()
+
+USER_COOKIE = 'quiz_user'
+# 身份凭据的有效期（秒）
+USER_COOKIE_AGE = 400 * 24 * 3600
+
+class ClientIdentityMiddleware:
+    """ASGI 中间件：每个客户端一个由服务端分配并签名的用户id
+
+    错题本、作答历史、复习队列和选题统计都按这个id保存。请求带有效的 quiz_user cookie 时沿用其中的id，
+    否则分配一个新的并在响应中设置 cookie；接口通过 client_user(request) 取得，不再接受客户端自报的用户名。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        user = None
+        for name, value in scope.get('headers', ()):
+            if name == b'cookie':
+                for part in value.decode('latin-1').split(';'):
+                    key, _, cookie = part.strip().partition('=')
+                    if key == USER_COOKIE:
+                        user = verify_user(cookie)
+        issued = None
+        if user is None:
+            user = new_user()
+            issued = (f"{USER_COOKIE}={sign_user(user)}; Max-Age={USER_COOKIE_AGE}; Path=/; "
+                      "HttpOnly; SameSite=Lax").encode('latin-1')
+        scope.setdefault('state', {})['user'] = user
+
+        async def send_with_cookie(message):
+            if issued is not None and message['type'] == 'http.response.start':
+                message = dict(message, headers=[*message.get('headers', ()), (b'set-cookie', issued)])
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie if issued is not None else send)
+
+def client_user(request):
+    """当前客户端的用户id（见 ClientIdentityMiddleware）"""
+    return request.state.user
+
+def wrong_question_id(key, entry):
+    """错题的题目id：键可以是题目id，也可以是“章节-题号”形式"""
+    if 'id' in entry:
+        return int(entry['id'])
+    if str(key).isdigit():
+        return int(key)
+    return parse_question_key(key)
+
+# 分页取题：默认每页题数和单页上限
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 200
+
+# 会话种子是 u32（进度口令中占 4 字节），超出范围的种子会与其低 32 位的会话混在一起
+SEED_LIMIT = 1 << 32
+
+def invalid_seed(seed):
+    """请求中的种子超出范围时返回 400 响应，否则返回 None"""
+    if seed is not None and not 0 <= seed < SEED_LIMIT:
+        return JSONResponse({"error": f"Invalid seed: must be between 0 and {SEED_LIMIT - 1}"}, status_code=400)
+    return None
+
+def encode_cursor(seed, chapter, offset):
+    """游标包含种子、章节（0表示全部）和偏移量，服务端不需要保存会话"""
+    return f"{seed:x}-{chapter or 0}-{offset}"
+
+def decode_cursor(cursor):
+    seed, chapter, offset = cursor.split("-")
+    seed = int(seed, 16)
+    if not 0 <= seed < SEED_LIMIT:
+        raise ValueError(cursor)
+    return seed, int(chapter) or None, int(offset)
+
+def session_scope(questions, chapter):
+    """一次测验的题目范围（升序的题目id数组），洗牌和进度口令都以它为准"""
+    return questions.ids() if chapter is None else questions.chapter_ids(chapter)
+
+def open_session_token(questions, value):
+    """校验进度口令，返回 (口令, 题目范围, 错误信息)"""
+    try:
+        token = SessionToken.decode(value)
+    except InvalidToken:
+        return None, None, "Invalid session token"
+    if token.chapter is not None and not questions.chapter_count(token.chapter):
+        return None, None, "Session token expired: question bank changed"
+    ids = session_scope(questions, token.chapter)
+    if not token.matches(ids):
+        return None, None, "Session token expired: question bank changed"
+    return token, ids, None
+
+def shuffle_payload(questions, token, ids):
+    """题目顺序、选项布局和进度口令；layouts[i] 按显示顺序列出 order[i] 的原选项字母
+
+    wrong 列出口令中已答错的题目及其正确答案在本会话中显示的字母，继续测验时用来恢复错题列表。
+    """
+    session = SessionShuffle(token.seed, ids)
+    wrong = []
+    for i in token.wrong_positions():
+        q = questions.get(session.order[i])
+        if q is not None:
+            wrong.append({"id": q.id, "correct_answer": shuffled_letter(session.perms[i], q.answer)})
+    return {
+        "seed": token.seed,
+        "chapter": token.chapter,
+        "bank": get_payloads(questions).url(token.chapter),
+        "order": session.order.tolist(),
+        "layouts": session.layouts(),
+        "token": token.encode(),
+        "position": token.position,
+        "total": token.total,
+        "score": token.score,
+        "wrong": wrong,
+    }
+
+def build_page(questions, seed, chapter, offset, limit):
+    """按种子重新生成题目顺序并取出一页
+
+    顺序只由种子决定，任何一页都可以单独重新生成。
+    """
+    ids = session_scope(questions, chapter)
+    session = SessionShuffle(seed, ids)
+    page = session.page(questions, offset, limit, reveal=False)
+    
+    next_offset = offset + len(page)
+    return {
+        "seed": seed,
+        "chapter": chapter,
+        "total": len(session),
+        "offset": offset,
+        "questions": page,
+        "next_cursor": encode_cursor(seed, chapter, next_offset) if next_offset < len(session) else None
+    }
+
+@router.get("/")
+async def root():
+    return {
+        "status": "API is running",
+        "message": "Use /api/questions to get questions"
+    }
+
+@router.get("/api/test")
+def test():
+    """测试端点，用于检查API状态和题目加载"""
+    try:
+        questions = get_cached_questions()
+        # 获取一个随机题目作为示例
+        sample_question = None
+        if questions:
+            seed = new_seed()
+            question = questions[seed % len(questions)]
+            sample_question = present(question, option_permutation(seed, question.id), reveal=False)
+            
+        return {
+            "status": "ok",
+            "questions_count": len(questions),
+            "sample_question": sample_question,
+            "chapters": questions.chapters() if questions else [],
+            "cache": bank_cache.stats(),
+            "warmup": warmup_timings
+        }
+    except Exception as e:
+        import traceback
+        return {
+            "status": "error",
+            "error": str(e),
+            "traceback": traceback.format_exc()
+        }
+
+@router.get("/api/questions")
+def get_questions(seed: Optional[int] = None):
+    error = invalid_seed(seed)
+    if error is not None:
+        return error
+    questions = get_cached_questions()
+    if not questions:
+        return {"error": "Failed to load questions"}
+    
+    # 每次请求使用独立的会话种子，传入相同的种子可以重放同样的顺序
+    if seed is None:
+        seed = new_seed()
+    session = SessionShuffle(seed, questions.ids())
+    return json_response({"seed": seed, "questions": session.page(questions, 0, len(session), reveal=False)})
+
+@router.get("/api/chapters")
+async def get_chapters():
+    questions = await cached_questions()
+    if not questions:
+        return {"error": "Failed to load questions"}
+    # 章节列表、题数和标题都来自题库的章节索引
+    chapters = questions.chapters()
+    details = [
+        {"chapter": c, "title": questions.chapter_title(c), "count": questions.chapter_count(c)}
+        for c in chapters
+    ]
+    return {"chapters": chapters, "details": details}
+
+@router.get("/api/questions/{chapter}")
+def get_chapter_questions(chapter: int, seed: Optional[int] = None):
+    error = invalid_seed(seed)
+    if error is not None:
+        return error
+    questions = get_cached_questions()
+    if not questions:
+        return {"error": "Failed to load questions"}
+    
+    # 从章节索引中取出指定章节的题目
+    ids = questions.chapter_ids(chapter)
+    if not ids:
+        return {"error": f"No questions found for chapter {chapter}"}
+    
+    if seed is None:
+        seed = new_seed()
+    session = SessionShuffle(seed, ids)
+    return json_response({"seed": seed, "questions": session.page(questions, 0, len(session), reveal=False)})
+
+def json_response(content):
+    """在当前（线程池）线程中序列化好的响应
+
+    def 接口返回普通字典时，FastAPI 会在事件循环上逐层转换并序列化，题目多时会阻塞其他请求；
+    返回 Response 则原样发送。
+    """
+    return Response(dumps(content), media_type='application/json')
+
+def serve_payload(payload, request, v=None):
+    status, body, headers = payload.serve(request.headers.get('if-none-match'),
+                                          request.headers.get('accept-encoding'), v)
+    return Response(body, status_code=status, headers=headers,
+                    media_type=None if status == 304 else 'application/json')
+
+@router.get("/api/bank")
+def get_bank_manifest(request: Request):
+    """题库版本和每章内容的地址，内容未变时返回304"""
+    questions = get_cached_questions()
+    if not questions:
+        return {"error": "Failed to load questions"}
+    return serve_payload(get_payloads(questions).manifest, request)
+
+@router.get("/api/bank/all")
+def get_bank_all(request: Request, v: Optional[str] = None):
+    """整个题库的原始题目（按id排序，未洗牌）"""
+    questions = get_cached_questions()
+    if not questions:
+        return {"error": "Failed to load questions"}
+    return serve_payload(get_payloads(questions).all, request, v)
+
+@router.get("/api/bank/{chapter}")
+def get_bank_chapter(chapter: int, request: Request, v: Optional[str] = None):
+    """一章的原始题目，v 与当前版本一致时可长期缓存"""
+    questions = get_cached_questions()
+    if not questions:
+        return {"error": "Failed to load questions"}
+    payload = get_payloads(questions).get(chapter)
+    if payload is None:
+        return {"error": f"No questions found for chapter {chapter}"}
+    return serve_payload(payload, request, v)
+
+@router.get("/api/shuffle")
+def get_shuffle(chapter: Optional[int] = None, seed: Optional[int] = None):
+    """一次测验的随机化部分：题目顺序和每道题的选项布局
+
+    layouts[i] 按显示顺序列出 order[i] 的原选项字母，题目内容从 bank 地址获取。
+    token 是新测验的进度口令，判分时带上它，返回的新口令可以在任何实例上恢复测验。
+    """
+    error = invalid_seed(seed)
+    if error is not None:
+        return error
+    questions = get_cached_questions()
+    if not questions:
+        return {"error": "Failed to load questions"}
+    if chapter is not None and not questions.chapter_count(chapter):
+        return {"error": f"No questions found for chapter {chapter}"}
+    if seed is None:
+        seed = new_seed()
+    ids = session_scope(questions, chapter)
+    return json_response(shuffle_payload(questions, SessionToken.start(seed, ids, chapter), ids))
+
+@router.get("/api/session/resume")
+def resume_session(token: str):
+    """按进度口令恢复测验：返回与 /api/shuffle 相同的内容，加上口令中记录的位置和得分"""
+    questions = get_cached_questions()
+    if not questions:
+        return {"error": "Failed to load questions"}
+    session_token, ids, error = open_session_token(questions, token)
+    if error:
+        return {"error": error}
+    return json_response(shuffle_payload(questions, session_token, ids))
+
+@router.get("/api/session/start")
+def start_session(chapter: Optional[int] = None, limit: int = PAGE_SIZE):
+    """开始一次测验：生成会话种子并返回第一页"""
+    questions = get_cached_questions()
+    if not questions:
+        return {"error": "Failed to load questions"}
+    if chapter is not None and not questions.chapter_count(chapter):
+        return {"error": f"No questions found for chapter {chapter}"}
+    
+    seed = new_seed()
+    page = build_page(questions, seed, chapter, 0, max(1, min(limit, MAX_PAGE_SIZE)))
+    page["token"] = SessionToken.start(seed, session_scope(questions, chapter), chapter).encode()
+    return json_response(page)
+
+@router.get("/api/session/page")
+def get_session_page(cursor: str, limit: int = PAGE_SIZE):
+    """按游标获取后续页面"""
+    questions = get_cached_questions()
+    if not questions:
+        return {"error": "Failed to load questions"}
+    try:
+        seed, chapter, offset = decode_cursor(cursor)
+    except ValueError:
+        return {"error": f"Invalid cursor: {cursor}"}
+    
+    return json_response(build_page(questions, seed, chapter, offset, max(1, min(limit, MAX_PAGE_SIZE))))
+
+@router.post("/api/wrong-questions")
+async def save_wrong_questions(wrong_questions: dict, request: Request):
+    user = client_user(request)
+    try:
+        entries = {wrong_question_id(key, entry): entry for key, entry in wrong_questions.items()}
+    except (AttributeError, TypeError, ValueError):
+        return {"error": "Invalid wrong question keys"}
+    # 放入写入队列后立即返回，由后台任务合并成批写入
+    try:
+        await get_wrong_writer().submit(user, entries)
+    except QueueFull as e:
+        return JSONResponse({"error": str(e)}, status_code=503, headers={"Retry-After": "1"})
+    # 第一次加入时要从数据库读入该用户的复习队列
+    await run_storage(get_scheduler().add, user, entries)
+    return {"status": "success", "saved": len(entries)}
+
+MAX_GRADE_BATCH = 1000
+
+def parse_answers(submission):
+    """判分请求体中的作答 [(种子, 题目id, 显示的字母, 用时)]；没有单独指定种子的使用请求体的 seed"""
+    default_seed = submission.get('seed')
+    answers = []
+    for item in submission['answers']:
+        seconds = item.get('seconds')
+        answers.append((int(item.get('seed', default_seed)), int(item['id']), str(item['answer']).upper(),
+                        None if seconds is None else float(seconds)))
+    return answers
+
+def submitted_correct(questions, body):
+    """单次作答是否正确：带 "seed" 和显示的 "answer" 时在服务端判分，否则使用请求体中的 "correct" """
+    if 'answer' in body:
+        (result,) = grade(questions, [(int(body['seed']), int(body['id']), str(body['answer']).upper())])
+        if result is None:
+            raise ValueError(body['answer'])
+        return result[3]
+    return bool(body['correct'])
+
+def grade_submission(questions, answers):
+    """一次判分整批作答，返回 (判分结果, 响应中的逐题结果, 答错的题目 {题目id: 错题记录})"""
+    graded = grade(questions, [answer[:3] for answer in answers])
+    results = []
+    wrong = {}
+    for (_, qid, letter, _), result in zip(answers, graded):
+        if result is None:
+            results.append({"id": qid, "answer": letter, "correct": None, "correct_answer": None})
+            continue
+        q, perm, _, correct = result
+        results.append({"id": qid, "answer": letter, "correct": correct,
+                        "correct_answer": shuffled_letter(perm, q.answer)})
+        if not correct:
+            # 与客户端原来保存的错题记录相同：按会话显示的选项和答案，加上所选的字母
+            wrong[qid] = dict(present(q, perm), your_answer=letter)
+    return graded, results, wrong
+
+def token_positions(token, ids, answers):
+    """每项作答在口令会话顺序中的位置，不在口令题目范围内的为 None"""
+    # 只需要题目顺序，不必生成选项排列
+    positions = {qid: i for i, qid in enumerate(session_order(token.seed, ids))}
+    return [positions.get(qid) for _, qid, _, _ in answers]
+
+def already_answered(token, positions):
+    """作答中是否有口令里已经答过的位置，或同一位置出现了两次"""
+    seen = set()
+    for position in positions:
+        if position is None:
+            continue
+        if position in seen or token.is_answered(position):
+            return True
+        seen.add(position)
+    return False
+
+def advance_token(token, positions, graded):
+    """把判分结果记入进度口令；不在口令题目范围内的作答不计入"""
+    for position, result in zip(positions, graded):
+        if result is not None and position is not None:
+            token.record(position, result[3])
+    return token.encode()
+
+def record_graded(questions, user, chapter, answers, graded, wrong):
+    """判分结果的唯一写入路径：作答历史（按种子记入对应的测验）、选题统计和复习队列"""
+    sessions = {}
+    for (seed, qid, letter, seconds), result in zip(answers, graded):
+        if result is not None:
+            sessions.setdefault(seed, []).append((qid, letter, result[3], seconds))
+    total = len(questions) if chapter is None else questions.chapter_count(chapter)
+    storage = get_storage()
+    for seed, rows in sessions.items():
+        storage.record_answers(user, seed, rows, total, chapter or 0)
+    selector = get_selector(questions)
+    for rows in sessions.values():
+        for qid, _, correct, seconds in rows:
+            selector.record(user, qid, correct, seconds)
+    if wrong:
+        get_scheduler().add(user, wrong)
+
+@router.post("/api/grade")
+async def grade_answers(submission: dict, request: Request):
+    """批量判分并记录作答
+
+    请求体为 {"seed": 会话种子, "chapter": 章节, "answers": [{"id": 题目id, "answer": 显示的字母, "seconds": 用时}]}，
+    每项也可以带自己的 "seed"。按种子还原每道题的选项排列后判分，客户端拿到的题目不带答案；
+    结果中的 correct_answer 是正确答案在该会话中显示的字母，题目不存在或字母无法识别时 correct 为 null。
+    请求体带进度口令 "token" 时种子和章节取自口令，响应中的 "token" 是记入本次作答后的新口令；
+    口令中已经作答过的题目不能再次提交（409）。
+    作答记在当前客户端的用户名下（见 ClientIdentityMiddleware）。
+    """
+    user = client_user(request)
+    questions = await cached_questions()
+    if not questions:
+        return {"error": "Failed to load questions"}
+    token = ids = None
+    if submission.get('token') is not None:
+        token, ids, error = await run_in_threadpool(open_session_token, questions, submission['token'])
+        if error:
+            return {"error": error}
+        submission = dict(submission, seed=token.seed, chapter=token.chapter)
+    try:
+        answers = parse_answers(submission)
+        chapter = submission.get('chapter')
+        chapter = None if chapter is None else int(chapter)
+    except (AttributeError, KeyError, TypeError, ValueError):
+        return {"error": "Invalid answers"}
+    if len(answers) > MAX_GRADE_BATCH:
+        return {"error": f"Too many answers (max {MAX_GRADE_BATCH})"}
+    if token is not None and any(seed != token.seed for seed, _, _, _ in answers):
+        return {"error": "Answers do not belong to the session token"}
+    if token is not None:
+        # 口令中已经答过的题不再判分：否则可以先答错、看到正确答案后带着新口令重新提交
+        positions = await run_in_threadpool(token_positions, token, ids, answers)
+        if already_answered(token, positions):
+            return JSONResponse({"error": "Question already answered in this session"}, status_code=409)
+    
+    graded, results, wrong = await run_in_threadpool(grade_submission, questions, answers)
+    if wrong:
+        try:
+            await get_wrong_writer().submit(user, wrong)
+        except QueueFull as e:
+            return JSONResponse({"error": str(e)}, status_code=503, headers={"Retry-After": "1"})
+    await run_storage(record_graded, questions, user, chapter, answers, graded, wrong)
+    response = {
+        "user": user,
+        "graded": sum(1 for result in graded if result is not None),
+        "score": sum(1 for result in graded if result is not None and result[3]),
+        "results": results,
+    }
+    if token is not None:
+        response["token"] = await run_in_threadpool(advance_token, token, positions, graded)
+        response["position"] = token.position
+        response["total"] = token.total
+    return json_response(response)
+
+@router.get("/api/wrong-questions")
+async def get_wrong_questions(request: Request, chapter: Optional[int] = None):
+    user = client_user(request)
+    wrong_questions = await get_wrong_writer().wrong_questions(user, chapter)
+    return {"user": user, "count": len(wrong_questions), "wrong_questions": wrong_questions} 
+
+@router.get("/api/review/due")
+async def get_due_questions(request: Request, limit: int = 20, chapter: Optional[int] = None,
+                            seed: Optional[int] = None):
+    """该用户最早到期的错题，按到期先后排列"""
+    error = invalid_seed(seed)
+    if error is not None:
+        return error
+    questions = await cached_questions()
+    if not questions:
+        return {"error": "Failed to load questions"}
+    # 第一次访问某个用户时要从数据库载入复习队列
+    return await run_storage(due_questions, questions, client_user(request), limit, chapter, seed)
+
+def due_questions(questions, user, limit, chapter, seed):
+    scheduler = get_scheduler()
+    due = scheduler.next_due(user, max(1, min(limit, MAX_PAGE_SIZE)), chapter)
+    if seed is None:
+        seed = new_seed()
+    result = []
+    for qid in due:
+        q = questions.get(qid)
+        if q is not None:
+            result.append(present(q, option_permutation(seed, qid), reveal=False))
+    return json_response({"seed": seed, "questions": result, "next_review": scheduler.next_review_time(user)})
+
+@router.post("/api/review/answer")
+async def record_review(review: dict, request: Request):
+    """记录一次复习结果，请求体为 {"id": 题目id, "seed": 会话种子, "answer": 显示的字母}，
+    也可以用 "correct" 直接给出是否答对"""
+    user = client_user(request)
+    questions = await cached_questions()
+    try:
+        qid, correct = int(review['id']), submitted_correct(questions, review)
+    except (KeyError, TypeError, ValueError):
+        return {"error": "Invalid review"}
+    scheduler = get_scheduler()
+    state = await run_storage(scheduler.record, user, qid, correct)
+    graduated = correct and scheduler.graduated(state)
+    if graduated:
+        # 删除也经过写入队列，不会被队列中更早的更新覆盖
+        await get_wrong_writer().submit(user, {qid: None})
+        await run_storage(scheduler.forget, user, qid)
+    return {"id": qid, "interval": state.interval, "due": state.due, "graduated": graduated}
+
+@router.get("/api/adaptive/next")
+async def get_adaptive_question(request: Request, chapter: Optional[int] = None, seed: Optional[int] = None):
+    """按该用户的作答统计挑选下一道题；抽题和选项顺序都由返回的 seed 决定"""
+    error = invalid_seed(seed)
+    if error is not None:
+        return error
+    questions = await cached_questions()
+    if not questions:
+        return {"error": "Failed to load questions"}
+    # 用户模型不在内存中时从作答记录重建
+    return await run_storage(adaptive_question, questions, client_user(request), chapter, seed)
+
+def adaptive_question(questions, user, chapter, seed):
+    if seed is None:
+        seed = new_seed()
+    q = get_selector(questions).pick(user, random.Random(seed), chapter)
+    if q is None:
+        return {"error": f"No questions for chapter {chapter}"}
+    return {"seed": seed, "question": present(q, option_permutation(seed, q.id), reveal=False)}
+
+@router.post("/api/adaptive/answer")
+async def record_adaptive_answer(result: dict, request: Request):
+    """记录一次作答，请求体为 {"id": 题目id, "seed": 会话种子, "answer": 显示的字母, "seconds": 用时}，
+    也可以用 "correct" 直接给出是否答对"""
+    questions = await cached_questions()
+    if not questions:
+        return {"error": "Failed to load questions"}
+    return await run_storage(adaptive_answer, questions, client_user(request), result)
+
+def adaptive_answer(questions, user, result):
+    try:
+        qid, correct = int(result['id']), submitted_correct(questions, result)
+        seconds = result.get('seconds')
+        seconds = None if seconds is None else float(seconds)
+        seed = int(result.get('seed', 0))
+    except (KeyError, TypeError, ValueError):
+        return {"error": "Invalid answer"}
+    if questions.get(qid) is None:
+        return {"error": f"Question {qid} not found"}
+    # 先写入作答历史：选题统计在每个进程中都从作答历史汇总，只更新内存会在重启或换 worker 后丢失；
+    # seed 只用于判分，每道题的种子都不同，作答统一记入该用户的智能练习记录
+    get_storage().record_answers(user, seed, [(qid, str(result.get('answer', '')).upper(), correct, seconds)],
+                                 len(questions), status=ADAPTIVE_STATUS)
+    get_selector(questions).record(user, qid, correct, seconds)
+    return {"status": "success"}
+
+@router.get("/api/search")
+def search_questions(q: str = '', chapter: Optional[int] = None, limit: int = 20):
+    """按关键词搜索题干和选项，结果按相关度排列"""
+    if not q.strip():
+        return {"error": "Missing query"}
+    questions = get_cached_questions()
+    if not questions:
+        return {"error": "Failed to load questions"}
+    index = get_search_index(questions)
+    results = []
+    for doc, score in index.search(q, chapter, max(1, min(limit, MAX_PAGE_SIZE))):
+        entry = questions[doc].to_dict(reveal=False)
+        entry['score'] = round(score, 4)
+        results.append(entry)
+    return json_response({"query": q, "chapter": chapter, "count": len(results), "results": results})
+
+@router.get("/api/analytics")
+async def get_analytics_report(request: Request, mine: bool = False, top: int = 10):
+    """作答分析报告；mine 为真时章节正确率和学习曲线只统计当前客户端"""
+    # 每次报告前要读入新增的作答记录
+    return await run_storage(analytics_report, client_user(request) if mine else None, top)
+
+def analytics_report(user, top):
+    try:
+        analytics = get_analytics()
+    except ImportError as e:
+        return {"error": str(e)}
+    analytics.store = get_cached_questions()
+    with _analytics_lock:
+        analytics.refresh()
+        return json_response(analytics.report(user, max(1, min(top, MAX_PAGE_SIZE))))
+
+def create_app(bank_path=None, db_path=None, warmup=None, shared=None):
+    """创建 API 应用
+
+    bank_path 指定题库文件（默认按 POSSIBLE_PATHS 查找），db_path 指定数据库（默认 QUIZ_DB）。
+    warmup 为 False 时启动阶段只载入题库和数据库，默认由环境变量 QUIZ_WARMUP 决定（不设置时预热）。
+    shared 为共享目录时各 worker 只读映射同一份题库（见 shared_bank.py），默认由 QUIZ_SHARED_BANK 决定。
+    """
+    global bank_cache, DB_PATH
+    configure()
+    locator = find_question_file
+    if bank_path is not None:
+        path = Path(bank_path)
+        locator = lambda: path
+    directory = shared_directory(shared)
+    if directory is not None:
+        bank_cache = SharedBankCache(directory, locator=locator)
+    elif bank_path is not None:
+        bank_cache = QuestionBankCache(locator=locator)
+    if db_path is not None:
+        DB_PATH = str(db_path)
+    if warmup is None:
+        warmup = os.environ.get('QUIZ_WARMUP', '1') not in ('', '0')
+    
+    async def startup():
+        start_executor()
+        if isinstance(bank_cache, SharedBankCache):
+            version = await run_in_threadpool(bank_cache.publish)
+            log.info('shared bank', directory=str(bank_cache.shared.directory), version=version)
+        if warmup:
+            await warm_up()
+        else:
+            await run_in_threadpool(get_cached_questions)
+            await run_in_threadpool(get_storage)
+        get_wrong_writer().start()
+    
+    app = FastAPI(on_startup=[startup], on_shutdown=[flush_wrong_writer])
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    app.add_middleware(ClientIdentityMiddleware)
+    # 最后添加的中间件在最外层，CORS 的预检请求也有请求编号
+    app.add_middleware(RequestLogMiddleware)
+    app.include_router(router)
+    return app
@@ -1,9 +1,14 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
+from tkinter import ttk, messagebox, simpledialog
 import json
 import random
-from datetime import datetime
-from quiz import load_questions, load_wrong_questions, save_wrong_questions
+import time
+from quiz import (ADAPTIVE_COUNT, REVIEW_BATCH, SEARCH_LIMIT, get_scheduler, get_search_index,
+                  get_selector, get_storage, load_questions, record_stats, save_wrong_questions)
+from bank_artifact import load_bank
+from session_token import InvalidToken, SessionToken
+from shuffle_service import new_seed, option_permutation, present, shuffle_questions
+from storage import DEFAULT_USER
 
 class QuizApp:
     def __init__(self, root):
@@ -11,19 +16,42 @@ class QuizApp:
         self.root.title("园林植物景观设计测验")
         self.root.geometry("800x600")
         
-        # 加载题目
-        self.questions = load_questions('quiz.md')
+        # 加载题目（优先使用预编译题库）
+        self.questions = load_bank('quiz.md', load_questions)
         self.current_question = None
         self.score = 0
         self.question_index = 0
         self.selected_questions = []
+        self.seed = None
+        self.chapter = 0
+        self.review_mode = False
+        self.adaptive_total = 0     # 智能练习的题数，题目在作答过程中逐题挑选
+        self.rng = None
+        self.shown_at = None
+        self.session_id = None
+        self.token = None           # 普通测验的进度口令，错题练习和智能练习没有
         self.shuffled_options = None
         self.shuffled_answer = None
         self.wrong_questions = {}
         
+        self.root.protocol("WM_DELETE_WINDOW", self.quit)
         self.create_main_menu()
         
+    def close_session(self, status=None):
+        # 普通测验的题目顺序与命令行相同（都由种子决定），中途离开的保存下来，可以在命令行中继续；
+        # 错题练习和智能练习不能按进度继续，标记为已放弃
+        if self.session_id is not None:
+            if status is None:
+                status = 'saved' if self.token is not None else 'abandoned'
+            get_storage().set_session_status(self.session_id, status)
+            self.session_id = None
+        
+    def quit(self):
+        self.close_session()
+        self.root.quit()
+        
     def create_main_menu(self):
+        self.close_session()
         self.clear_window()
         
         # 创建主菜单框架
@@ -34,8 +62,65 @@ class QuizApp:
         
         # 主菜单按钮
         ttk.Button(menu_frame, text="开始新测验", command=self.show_chapter_selection).pack(pady=10, ipadx=20)
+        ttk.Button(menu_frame, text="输入进度口令", command=self.resume_from_token).pack(pady=10, ipadx=20)
         ttk.Button(menu_frame, text="练习错题", command=self.start_wrong_questions).pack(pady=10, ipadx=20)
-        ttk.Button(menu_frame, text="退出", command=self.root.quit).pack(pady=10, ipadx=20)
+        ttk.Button(menu_frame, text="智能练习", command=self.start_adaptive).pack(pady=10, ipadx=20)
+        ttk.Button(menu_frame, text="搜索题目", command=self.show_search).pack(pady=10, ipadx=20)
+        ttk.Button(menu_frame, text="退出", command=self.quit).pack(pady=10, ipadx=20)
+        
+    def show_search(self):
+        self.clear_window()
+        
+        search_frame = ttk.Frame(self.root, padding="20")
+        search_frame.pack(expand=True, fill='both')
+        
+        ttk.Label(search_frame, text="搜索题目", font=('Arial', 16)).pack(pady=10)
+        
+        # 关键词和章节
+        input_frame = ttk.Frame(search_frame)
+        input_frame.pack(fill='x', pady=5)
+        query_var = tk.StringVar()
+        entry = ttk.Entry(input_frame, textvariable=query_var, width=40)
+        entry.pack(side='left', padx=5)
+        chapters = ["全部章节"] + [f"第{c}章" for c in self.questions.chapters()]
+        chapter_var = tk.StringVar(value=chapters[0])
+        ttk.Combobox(input_frame, textvariable=chapter_var, values=chapters,
+                     state='readonly', width=10).pack(side='left', padx=5)
+        
+        # 搜索结果（只读文本，可滚动）
+        text_frame = ttk.Frame(search_frame)
+        text_frame.pack(expand=True, fill='both', pady=10)
+        results = tk.Text(text_frame, wrap='word', state='disabled')
+        scrollbar = ttk.Scrollbar(text_frame, orient="vertical", command=results.yview)
+        results.configure(yscrollcommand=scrollbar.set)
+        results.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+        
+        def search(event=None):
+            query = query_var.get().strip()
+            if not query:
+                return
+            choice = chapters.index(chapter_var.get())
+            chapter = self.questions.chapters()[choice - 1] if choice else None
+            found = get_search_index(self.questions).search(query, chapter, SEARCH_LIMIT)
+            
+            results.configure(state='normal')
+            results.delete('1.0', 'end')
+            if not found:
+                results.insert('end', "没有找到相关的题目")
+            for doc, _ in found:
+                q = self.questions[doc]
+                results.insert('end', f"第{q.chapter}章 第{q.number}题：{q.text}\n")
+                for key, option in q.option_dict.items():
+                    results.insert('end', f"    {key}. {option}\n")
+                results.insert('end', f"    答案：{q.correct_answer}\n\n")
+            results.configure(state='disabled')
+        
+        ttk.Button(input_frame, text="搜索", command=search).pack(side='left', padx=5)
+        entry.bind('<Return>', search)
+        entry.focus_set()
+        
+        ttk.Button(search_frame, text="返回", command=self.create_main_menu).pack(pady=10)
         
     def show_chapter_selection(self):
         self.clear_window()
@@ -45,51 +130,127 @@ class QuizApp:
         
         ttk.Label(chapter_frame, text="选择章节", font=('Arial', 16)).pack(pady=20)
         
-        chapters = sorted(set(q['chapter'] for q in self.questions))
+        chapters = self.questions.chapters()
         
         def select_chapter(chapter=None):
             if chapter is None:  # 全部章节
                 self.selected_questions = self.questions.copy()  # 创建副本以免影响原始题目顺序
             else:
-                self.selected_questions = [q for q in self.questions if q['chapter'] == chapter]
+                self.selected_questions = self.questions.in_chapter(chapter)
+            self.chapter = chapter or 0
+            self.review_mode = False
+            self.adaptive_total = 0
             self.start_quiz()
         
         ttk.Button(chapter_frame, text="全部章节", 
                   command=lambda: select_chapter()).pack(pady=5)
         
         for chapter in chapters:
-            chapter_questions = [q for q in self.questions if q['chapter'] == chapter]
             ttk.Button(chapter_frame, 
-                      text=f"第{chapter}章 ({len(chapter_questions)}题)",
+                      text=f"第{chapter}章 ({self.questions.chapter_count(chapter)}题)",
                       command=lambda c=chapter: select_chapter(c)).pack(pady=5)
         
         ttk.Button(chapter_frame, text="返回", command=self.create_main_menu).pack(pady=20)
         
-    def start_quiz(self):
+    def start_quiz(self, token=None):
         self.question_index = 0
         self.score = 0
         self.wrong_questions = {}
-        
-        # 使用当前时间作为随机种子
-        random.seed(datetime.now().timestamp())
-        # 随机打乱题目顺序
-        random.shuffle(self.selected_questions)
+        self.token = None
+        
+        # 每次测验使用独立的会话种子，题目和选项顺序都由它决定
+        self.seed = token.seed if token is not None else new_seed()
+        if not self.review_mode and not self.adaptive_total:
+            # 普通测验的进度可以保存为口令，在网页、命令行或其他电脑上继续
+            self.token = token or SessionToken.start(self.seed, [q.id for q in self.selected_questions],
+                                                     self.chapter or None)
+            self.question_index, self.score = self.token.position, self.token.score
+        self.selected_questions = shuffle_questions(self.seed, self.selected_questions)
+        self.rng = random.Random(self.seed)
+        total = self.adaptive_total or len(self.selected_questions)
+        self.session_id = get_storage().start_session(DEFAULT_USER, self.seed, total, self.chapter,
+                                                      self.score, self.question_index)
         
         self.show_question()
         
+    def resume_from_token(self):
+        value = simpledialog.askstring("继续测验", "请粘贴进度口令：", parent=self.root)
+        if not value:
+            return
+        try:
+            token = SessionToken.decode(value)
+        except InvalidToken as e:
+            messagebox.showerror("错误", str(e))
+            return
+        selected = self.questions.in_chapter(token.chapter) if token.chapter else self.questions.copy()
+        if not token.matches([q.id for q in selected]):
+            messagebox.showerror("错误", "题库已更新，这个进度口令已失效")
+            return
+        self.selected_questions = selected
+        self.chapter = token.chapter or 0
+        self.review_mode = False
+        self.adaptive_total = 0
+        self.start_quiz(token)
+        
+    def save_token(self):
+        # 显示进度口令并回到主菜单，口令可以复制到网页、命令行或其他电脑上继续
+        token = self.token.encode()
+        self.create_main_menu()
+        dialog = tk.Toplevel(self.root)
+        dialog.title("进度已保存")
+        ttk.Label(dialog, text="进度口令（可在网页、命令行或其他电脑上继续）：", padding=10).pack()
+        entry = ttk.Entry(dialog, width=60)
+        entry.insert(0, token)
+        entry.configure(state='readonly')
+        entry.pack(padx=10, pady=5)
+        
+        def copy():
+            self.root.clipboard_clear()
+            self.root.clipboard_append(token)
+        
+        buttons = ttk.Frame(dialog, padding=10)
+        buttons.pack()
+        ttk.Button(buttons, text="复制", command=copy).pack(side='left', padx=5)
+        ttk.Button(buttons, text="关闭", command=dialog.destroy).pack(side='left', padx=5)
+        
     def start_wrong_questions(self):
-        wrong_questions = load_wrong_questions()
-        if not wrong_questions:
+        if not get_storage().wrong_chapter_counts(DEFAULT_USER):
             messagebox.showinfo("提示", "错题本中还没有题目！")
             return
-            
-        self.selected_questions = [q for q in self.questions if q['number'] in wrong_questions]
-        random.shuffle(self.selected_questions)
+        
+        # 只练习已经到期的错题，按题目id在题库索引中查找
+        due = get_scheduler().next_due(DEFAULT_USER, REVIEW_BATCH)
+        self.selected_questions = [q for q in map(self.questions.get, due) if q is not None]
+        if not self.selected_questions:
+            messagebox.showinfo("提示", "暂时没有需要复习的错题！")
+            return
+        self.chapter = 0
+        self.review_mode = True
+        self.adaptive_total = 0
+        self.start_quiz()
+        
+    def start_adaptive(self):
+        # 按作答统计逐题挑选，集中练习薄弱的章节和容易错的题目
+        get_selector(self.questions)
+        self.selected_questions = []
+        self.chapter = 0
+        self.review_mode = False
+        self.adaptive_total = ADAPTIVE_COUNT
         self.start_quiz()
         
     def show_question(self):
         self.clear_window()
         
+        if self.question_index == len(self.selected_questions) < self.adaptive_total:
+            question = get_selector(self.questions).pick(DEFAULT_USER, self.rng)
+            if question is not None:
+                self.selected_questions.append(question)
+        
+        # 在网页或命令行中已经答过的题
+        while (self.token is not None and self.question_index < len(self.selected_questions)
+               and self.token.is_answered(self.question_index)):
+            self.question_index += 1
+        
         if self.question_index >= len(self.selected_questions):
             self.show_result()
             return
@@ -114,22 +275,17 @@ class QuizApp:
         ttk.Label(question_frame, text=progress_text, font=('Arial', 14)).pack(pady=5)
         
         # 显示题目
-        question_text = f"第{question['chapter']}章 第{question['number']}题:\n{question['question']}"
+        question_text = f"第{question.chapter}章 第{question.number}题:\n{question.text}"
         ttk.Label(question_frame, text=question_text, wraplength=700, font=('Arial', 14)).pack(pady=20)
         
         # 创建选项框架
         options_frame = ttk.Frame(question_frame)
         options_frame.pack(fill='both', expand=True, padx=40)
         
-        # 随机打乱选项
-        options = question['options']
-        options_list = [(key, value) for key, value in options.items()]
-        correct_content = options[question['correct_answer']]
-        random.shuffle(options_list)
-        
-        self.shuffled_options = {chr(65+i): content for i, (_, content) in enumerate(options_list)}
-        self.shuffled_answer = next(key for key, value in self.shuffled_options.items() 
-                                  if value == correct_content)
+        # 按会话种子打乱选项
+        shown = present(question, option_permutation(self.seed, question.id))
+        self.shuffled_options = shown['options']
+        self.shuffled_answer = shown['correct_answer']
         
         # 选项按钮
         self.answer_var = tk.StringVar()
@@ -149,6 +305,11 @@ class QuizApp:
                                    style='Custom.TRadiobutton')
             radio.pack(side='left', padx=20, fill='x', expand=True)
         
+        if self.token is not None:
+            ttk.Button(self.result_frame, text="保存进度", command=self.save_token).pack(side='right')
+        
+        self.shown_at = time.monotonic()
+        
     def check_answer(self):
         answer = self.answer_var.get()
         if not answer:
@@ -169,9 +330,10 @@ class QuizApp:
             result_text = f"✗ 回答错误。正确答案是：{self.shuffled_answer}\n点击任意位置继续"
             label = ttk.Label(self.result_frame, text=result_text, 
                              font=('Arial', 14, 'bold'), foreground='red')
-            self.wrong_questions[question['number']] = {
-                'chapter': question['chapter'],
-                'question': question['question'],
+            self.wrong_questions[question.key] = {
+                'chapter': question.chapter,
+                'number': question.number,
+                'question': question.text,
                 'options': self.shuffled_options,
                 'correct_answer': self.shuffled_answer,
                 'your_answer': answer
@@ -179,6 +341,14 @@ class QuizApp:
         
         label.pack(pady=10)
         
+        elapsed = time.monotonic() - self.shown_at
+        get_storage().record_answer(self.session_id, question.id, answer,
+                                    answer == self.shuffled_answer, self.question_index, elapsed)
+        record_stats(question, answer == self.shuffled_answer, elapsed)
+        self.record_review(question, answer == self.shuffled_answer)
+        if self.token is not None:
+            self.token.record(self.question_index, answer == self.shuffled_answer)
+        
         # 禁用所有选项
         for widget in self.main_frame.winfo_children():
             if isinstance(widget, ttk.Radiobutton):
@@ -187,6 +357,20 @@ class QuizApp:
         # 绑定点击事件到整个窗口
         self.root.bind('<Button-1>', self.handle_click)
         
+    def record_review(self, question, correct):
+        # 错题练习时按复习结果安排下次复习，间隔足够长的题目移出错题本；
+        # 普通测验中答错的题目立即加入复习队列
+        if correct and not self.review_mode:
+            return
+        if not correct:
+            # 错题本和复习队列在同一时刻写入（与命令行相同），中途退出也不会只留下复习记录
+            save_wrong_questions({question.key: dict(self.wrong_questions[question.key])})
+        scheduler = get_scheduler()
+        state = scheduler.record(DEFAULT_USER, question.id, correct)
+        if correct and scheduler.graduated(state):
+            get_storage().remove_wrong(DEFAULT_USER, question.id)
+            scheduler.forget(DEFAULT_USER, question.id)
+        
     def handle_click(self, event):
         # 解绑点击事件
         self.root.unbind('<Button-1>')
@@ -198,6 +382,7 @@ class QuizApp:
         self.show_question()
         
     def show_result(self):
+        self.close_session('finished')
         self.clear_window()
         
         result_frame = ttk.Frame(self.root, padding="20")
@@ -242,8 +427,8 @@ class QuizApp:
             canvas.bind('<Enter>', _bound_mousewheel)
             canvas.bind('<Leave>', _unbound_mousewheel)
             
-            for num, wrong_q in self.wrong_questions.items():
-                question_text = f"\n第{wrong_q['chapter']}章 第{num}题:\n{wrong_q['question']}"
+            for wrong_q in self.wrong_questions.values():
+                question_text = f"\n第{wrong_q['chapter']}章 第{wrong_q['number']}题:\n{wrong_q['question']}"
                 ttk.Label(scrollable_frame, text=question_text, wraplength=600).pack(pady=5)
                 
                 for key, value in wrong_q['options'].items():
@@ -255,9 +440,6 @@ class QuizApp:
             
             canvas.pack(side="left", fill="both", expand=True, pady=10)
             scrollbar.pack(side="right", fill="y")
-            
-            # 保存错题
-            save_wrong_questions(self.wrong_questions)
         
         # 返回主菜单按钮
         ttk.Button(result_frame, text="返回主菜单", command=self.create_main_menu).pack(pady=20)
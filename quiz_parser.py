@@ -0,0 +1,200 @@
+"""题库 Markdown 的流式解析器
+
+逐行读取，用状态机识别章节标题、题干、选项和答案，每解析完一道题就立即产出，
+不需要把整个文件读进内存。每行只做一次锚定的正则匹配，格式错误的输入也是线性时间。
+
+题目格式：
+    **第一章 绪论**
+
+    1.  题目：题干（可以跨行）
+        *   A、选项（可以跨行）
+        *   B、...
+        *   C、...
+        *   D、...
+        答案：D
+"""
+import re
+import unicodedata
+from collections import namedtuple
+
+from question_store import OPTION_KEYS, QuestionStore
+
+# 以下模式都作用于去掉首尾空白后的单行
+CHAPTER_RE = re.compile(r'\*\*第([^*章]*)章([^*]*)\*\*$')
+QUESTION_RE = re.compile(r'(\d+)\.\s*题目：(.*)')
+OPTION_RE = re.compile(r'\*\s*([A-D])(?:\s*[.．、]|\s)\s*(.*)')
+ANSWER_RE = re.compile(r'答案：\s*([A-D])$')
+
+# 解析规则变化时递增，预编译题库据此判断是否需要重新编译
+PARSER_VERSION = 2
+
+# 最多保留的诊断条数，超出部分只计数，保证异常输入下内存有界
+MAX_DIAGNOSTICS = 1000
+
+Diagnostic = namedtuple('Diagnostic', ['line', 'kind', 'message'])
+
+
+def clean_text(parts):
+    """合并多行文本并压缩空白"""
+    return ' '.join(' '.join(parts).split())
+
+
+def normalize(text):
+    """只保留文字和数字：统一全角半角、大小写，去掉标点、空白和着重号"""
+    return ''.join(ch for ch in unicodedata.normalize('NFKC', text).lower() if ch.isalnum())
+
+
+def comparison_key(q):
+    """判断两道题是否相同：题干加上排序后的归一化选项
+
+    只比较题干会把题干相同、选项完全不同的题（如“下列植物中属于浮水植物的是”）误判为重复。
+    """
+    return q['question'], tuple(sorted(normalize(q['options'][k]) for k in OPTION_KEYS))
+
+
+def answer_key(q):
+    """正确选项的归一化文本，选项顺序不同的同一道题也能比较答案"""
+    return normalize(q['options'][q['correct_answer']])
+
+
+class QuestionParser:
+    """逐行状态机解析器
+
+    解析过程中的问题记录在 diagnostics 中（带行号），章节标题记录在 chapter_titles 中。
+    章节按出现顺序从1开始编号，与题库原有的编号方式一致。
+    """
+
+    def __init__(self):
+        self.diagnostics = []
+        self.diagnostic_count = 0
+        self.chapter_titles = {}
+        self.last_line = None   # 最近产出的题目的起始行号
+        self._reset()
+
+    def _reset(self):
+        self._start = None      # 当前题目的起始行号
+        self._number = None
+        self._field = None      # 正在收集的字段：'question' 或选项字母
+        self._parts = {}
+
+    def _report(self, line, kind, message):
+        self.diagnostic_count += 1
+        if len(self.diagnostics) < MAX_DIAGNOSTICS:
+            self.diagnostics.append(Diagnostic(line, kind, message))
+
+    def _abandon(self, reason):
+        if self._start is not None:
+            self._report(self._start, 'incomplete', f"第{self._number}题{reason}，已跳过")
+        self._reset()
+
+    def iter_questions(self, lines):
+        """逐行解析，每遇到一道完整的题目就产出一个题目字典"""
+        chapter = 0
+        skipping = False    # 当前题目格式有误，跳过直到下一题
+        lineno = 0
+        for lineno, line in enumerate(lines, 1):
+            line = line.strip()
+            # 跳过空行和 HTML 注释（如 pdf_ingest 写入的来源说明）
+            if not line or line.startswith('<!--'):
+                continue
+            # 按首字符分派，每行最多做一次正则匹配
+            head = line[0]
+
+            m = CHAPTER_RE.match(line) if line.startswith('**') else None
+            if m:
+                self._abandon('在章节结束前不完整')
+                skipping = False
+                chapter += 1
+                self.chapter_titles[chapter] = ' '.join(m.group(2).split())
+                continue
+
+            m = QUESTION_RE.match(line) if head.isdigit() else None
+            if m:
+                self._abandon('缺少选项或答案')
+                skipping = False
+                if chapter == 0:
+                    self._report(lineno, 'orphan', f"第{m.group(1)}题出现在第一个章节标题之前，已跳过")
+                    skipping = True
+                    continue
+                self._start = lineno
+                self._number = m.group(1)
+                self._field = 'question'
+                self._parts = {'question': [m.group(2)]}
+                continue
+
+            if skipping:
+                continue
+
+            m = OPTION_RE.match(line) if head == '*' else None
+            if m and self._start is not None:
+                key = m.group(1)
+                count = len(self._parts) - 1
+                if count >= 4 or key != OPTION_KEYS[count]:
+                    expected = f"应为{OPTION_KEYS[count]}" if count < 4 else "选项已满"
+                    self._report(lineno, 'option-order',
+                                 f"第{self._number}题选项顺序错误：{expected}，实际为{key}")
+                    self._reset()
+                    skipping = True
+                    continue
+                self._field = key
+                self._parts[key] = [m.group(2)]
+                continue
+
+            m = ANSWER_RE.match(line) if head == '答' else None
+            if m:
+                if self._start is None:
+                    self._report(lineno, 'stray-answer', "答案不属于任何题目")
+                    continue
+                if len(self._parts) != 5:
+                    self._report(self._start, 'incomplete',
+                                 f"第{self._number}题只有{len(self._parts) - 1}个选项，已跳过")
+                    self._reset()
+                    continue
+                question = {
+                    'chapter': chapter,
+                    'number': self._number,
+                    'question': clean_text(self._parts['question']),
+                    'options': {k: clean_text(self._parts[k]) for k in OPTION_KEYS},
+                    'correct_answer': m.group(1)
+                }
+                self.last_line = self._start
+                self._reset()
+                yield question
+                continue
+
+            if self._field is not None:
+                # 题干或选项的续行
+                self._parts[self._field].append(line)
+            else:
+                self._report(lineno, 'unrecognized', f"无法识别的内容：{line[:40]}")
+
+        self._abandon('在文件结束前不完整')
+
+    def parse_bank(self, lines):
+        """解析整个题库：去除题干和选项都相同的重复题，记录其中答案矛盾的"""
+        seen = {}
+        questions = []
+        for q in self.iter_questions(lines):
+            line = self.last_line
+            key = comparison_key(q)
+            existing = seen.get(key)
+            if existing is not None:
+                if answer_key(existing) != answer_key(q):
+                    self._report(line, 'conflict',
+                                 f"题号 {existing['number']} 和 {q['number']} 题干和选项相同但答案分别为"
+                                 f"{existing['correct_answer']} 和 {q['correct_answer']}：{q['question']}")
+                else:
+                    self._report(line, 'duplicate',
+                                 f"题号 {existing['number']} 和 {q['number']} 重复")
+                continue
+            seen[key] = q
+            questions.append(q)
+        return questions
+
+
+def parse_file(filename):
+    """解析题库文件，返回(按id排序的题库, 解析器)"""
+    parser = QuestionParser()
+    with open(filename, 'r', encoding='utf-8') as f:
+        questions = QuestionStore.from_dicts(parser.parse_bank(f), parser.chapter_titles)
+    return questions, parser
@@ -0,0 +1,218 @@
+"""错题的间隔复习
+
+用 SM-2 算法为错题本中的每道题安排下次复习时间：
+    答对    复习次数+1，间隔依次为 1 天、6 天、之后每次乘以难度系数
+    答错    复习次数清零，间隔回到 1 天，并且立即重新到期
+    系数    每次复习后按作答质量调整难度系数，最低 1.3
+
+间隔达到 GRADUATE_DAYS 天的题目视为已掌握，从错题本中移除。
+
+每个用户的待复习题目保存在按到期时间排序的堆中，取出最早到期的 k 道题只需 O(k log n)，
+不需要读入并洗牌整个错题本。题目状态更新时直接压入新的堆项，旧项在弹出时按到期时间比对后丢弃。
+闲置超过 IDLE_SECONDS 的用户的堆会被丢弃，内存中最多保留 MAX_USERS 个，下次访问时从存储重新载入。
+
+用法：
+    scheduler = ReviewScheduler(storage)
+    for qid in scheduler.next_due(user, 20):
+        ...
+        state = scheduler.record(user, qid, correct)
+        if scheduler.graduated(state):
+            ...
+"""
+import heapq
+import threading
+import time
+from collections import OrderedDict
+
+from question_store import NUMBER_BITS
+
+DAY = 86400
+GRADUATE_DAYS = 21
+INITIAL_EASE = 2.5
+MIN_EASE = 1.3
+
+# 作答质量（0-5）：测验只有对错两种结果
+QUALITY_CORRECT = 4
+QUALITY_WRONG = 1
+
+# 内存中的复习堆：闲置多久后丢弃，以及最多保留多少个用户
+IDLE_SECONDS = 1800
+MAX_USERS = 1024
+
+
+class ReviewState:
+    __slots__ = ('qid', 'ease', 'interval', 'repetitions', 'lapses', 'due')
+
+    def __init__(self, qid, ease=INITIAL_EASE, interval=0.0, repetitions=0, lapses=0, due=0.0):
+        self.qid = qid
+        self.ease = ease
+        self.interval = interval        # 天
+        self.repetitions = repetitions
+        self.lapses = lapses
+        self.due = due                  # 时间戳
+
+    def astuple(self):
+        return (self.qid, self.ease, self.interval, self.repetitions, self.lapses, self.due)
+
+    def __repr__(self):
+        return (f"ReviewState(qid={self.qid}, ease={self.ease:.2f}, "
+                f"interval={self.interval:g}, due={self.due:.0f})")
+
+
+def sm2(state, quality, now):
+    """按 SM-2 更新复习状态"""
+    if quality >= 3:
+        if state.repetitions == 0:
+            state.interval = 1.0
+        elif state.repetitions == 1:
+            state.interval = 6.0
+        else:
+            state.interval = round(state.interval * state.ease, 1)
+        state.repetitions += 1
+        state.due = now + state.interval * DAY
+    else:
+        state.repetitions = 0
+        state.lapses += 1
+        state.interval = 1.0
+        # 答错的题在本次练习结束后就可以再练
+        state.due = now
+    state.ease = max(MIN_EASE, state.ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+    return state
+
+
+class ReviewQueue:
+    """一个用户的复习堆"""
+
+    def __init__(self, states=()):
+        self.states = {}
+        self._heap = []
+        for state in states:
+            self.states[state.qid] = state
+            self._heap.append((state.due, state.qid))
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self.states)
+
+    def __contains__(self, qid):
+        return qid in self.states
+
+    def push(self, state):
+        """加入或更新一道题"""
+        self.states[state.qid] = state
+        heapq.heappush(self._heap, (state.due, state.qid))
+        # 过期的堆项太多时重建一次
+        if len(self._heap) > 2 * len(self.states) + 64:
+            self._heap = [(s.due, s.qid) for s in self.states.values()]
+            heapq.heapify(self._heap)
+
+    def remove(self, qid):
+        self.states.pop(qid, None)
+
+    def _live(self, entry):
+        state = self.states.get(entry[1])
+        return state is not None and state.due == entry[0]
+
+    def next_due(self, n, now, chapter=None):
+        """最早到期的至多 n 道题的id（到期时间不晚于 now），不改变队列内容"""
+        taken = {}
+        result = []
+        heap = self._heap
+        while heap and len(result) < n and heap[0][0] <= now:
+            entry = heapq.heappop(heap)
+            # 同一道题可能留有到期时间相同的重复堆项
+            if not self._live(entry) or entry[1] in taken:
+                continue
+            taken[entry[1]] = entry
+            if chapter is None or entry[1] >> NUMBER_BITS == chapter:
+                result.append(entry[1])
+        for entry in taken.values():
+            heapq.heappush(heap, entry)
+        return result
+
+    def next_review_time(self):
+        """最早的到期时间，队列为空时返回None"""
+        while self._heap and not self._live(self._heap[0]):
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+
+class ReviewScheduler:
+    """按用户管理复习堆，复习状态保存在存储后端中
+
+    第一次访问某个用户时从存储载入其复习状态；错题本中还没有复习状态的题目视为立即到期。
+    """
+
+    def __init__(self, storage, idle_seconds=IDLE_SECONDS, max_users=MAX_USERS):
+        self.storage = storage
+        self.idle_seconds = idle_seconds
+        self.max_users = max_users
+        self._queues = OrderedDict()    # {用户: (复习堆, 最近使用时间)}，按最近使用排列
+        self._lock = threading.Lock()
+
+    def queue(self, user):
+        with self._lock:
+            now = time.monotonic()
+            entry = self._queues.pop(user, None)
+            if entry is None:
+                queue = ReviewQueue(ReviewState(*row) for row in self.storage.review_states(user))
+                for qid in self.storage.wrong_question_ids(user):
+                    if qid not in queue:
+                        queue.push(ReviewState(qid))
+            else:
+                queue = entry[0]
+            self._evict(now)
+            self._queues[user] = (queue, now)
+            return queue
+
+    def _evict(self, now):
+        """丢弃闲置过久或超出数量的复习堆；复习状态都已保存，随时可以重新载入"""
+        queues = self._queues
+        while queues:
+            _, (_, used) = next(iter(queues.items()))
+            # 随后还要放回当前用户，所以这里最多保留 max_users - 1 个
+            if len(queues) < self.max_users and now - used < self.idle_seconds:
+                break
+            queues.popitem(last=False)
+
+    def next_due(self, user, n=20, chapter=None, now=None):
+        queue = self.queue(user)
+        with self._lock:
+            return queue.next_due(n, time.time() if now is None else now, chapter)
+
+    def next_review_time(self, user):
+        queue = self.queue(user)
+        with self._lock:
+            return queue.next_review_time()
+
+    def add(self, user, qids, now=None):
+        """把新的错题加入复习队列（已在队列中的不变）"""
+        queue = self.queue(user)
+        now = time.time() if now is None else now
+        with self._lock:
+            for qid in qids:
+                if qid not in queue:
+                    queue.push(ReviewState(qid, due=now))
+
+    def record(self, user, qid, correct, now=None):
+        """记录一次复习结果，返回更新后的状态"""
+        queue = self.queue(user)
+        now = time.time() if now is None else now
+        with self._lock:
+            old = queue.states.get(qid)
+            state = ReviewState(*old.astuple()) if old else ReviewState(qid)
+            sm2(state, QUALITY_CORRECT if correct else QUALITY_WRONG, now)
+            queue.push(state)
+        self.storage.save_review(user, *state.astuple())
+        return state
+
+    @staticmethod
+    def graduated(state):
+        return state.interval >= GRADUATE_DAYS
+
+    def forget(self, user, qid):
+        """题目移出错题本后不再安排复习"""
+        queue = self.queue(user)
+        with self._lock:
+            queue.remove(qid)
+        self.storage.delete_review(user, qid)
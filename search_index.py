@@ -0,0 +1,321 @@
+"""题目全文搜索
+
+对题干和选项文本建立倒排索引。中文没有词的边界，按字切分的二元组（相邻两个字）作为检索词，
+另外为每个字建立单字词条，只在查询不足两个字时使用。选项中的词条按 OPTION_WEIGHT 折算词频。
+排序使用 BM25：
+    score = Σ idf(t) × tf × (K1 + 1) / (tf + K1 × (1 - B + B × 文档长度 / 平均长度))
+
+同一个词条的倒排列表按题目在题库中的位置排列，题库按id排序，同一章是连续的一段，
+按章节过滤时只需二分出每个倒排列表中属于该章的一段。
+
+索引在每个题库版本上只建立一次，保存在题库旁边（与源文件同名，扩展名为 .search），
+文件头记录源文件的大小、mtime 和哈希，源文件变化后自动重建。
+索引文件可以读入内存（load），也可以只读映射（map）：数组直接引用映射的页面，词条在词条表中二分查找，
+多个进程映射同一个文件时索引只占一份内存（见 shared_bank.py）。
+
+文件格式（小端）：
+    头部    magic(4) 格式版本(u16) 解析器版本(u16) 源文件大小(u64) 源文件mtime_ns(u64)
+            源文件sha256(32) 题目数(u32) 词条数(u32) 倒排项数(u32) 词条表字节数(u32)
+    数组    题目id(i64 × 题目数) 文档长度(f32 × 题目数)
+            词条起点(u32 × (词条数 + 1)) 倒排起点(u32 × (词条数 + 1))
+            倒排项题目位置(u32 × 倒排项数) 倒排项词频(f32 × 倒排项数)
+    词条表  全部词条按码位排序后的 UTF-8 编码首尾相接，第 i 个词条是 [词条起点[i], 词条起点[i+1]) 的字节
+"""
+import heapq
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+import unicodedata
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from pathlib import Path
+
+from bank_artifact import file_digest, source_unchanged
+from question_store import question_id
+from quiz_parser import PARSER_VERSION
+
+MAGIC = b'QSRC'
+FORMAT_VERSION = 2
+HEADER = struct.Struct('<4sHHQQ32sIIII')
+
+K1 = 1.2
+B = 0.75
+# 选项文本的词频权重（题干为1）
+OPTION_WEIGHT = 0.5
+
+_RUNS = re.compile(r'\w+')
+
+
+def _runs(text):
+    """统一全角半角和大小写后，按非文字字符切开"""
+    return _RUNS.findall(unicodedata.normalize('NFKC', text).lower())
+
+
+def terms(text):
+    """文本的全部词条：每个字，以及每两个相邻的字"""
+    result = []
+    for run in _runs(text):
+        result.extend(run)
+        result.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return result
+
+
+def query_terms(query):
+    """查询的词条：有两个字以上时只用二元组，否则用单字"""
+    runs = _runs(query)
+    bigrams = {run[i:i + 2] for run in runs for i in range(len(run) - 1)}
+    return bigrams or set(''.join(runs))
+
+
+def index_path(source):
+    """返回源文件对应的索引路径"""
+    return Path(source).with_suffix('.search')
+
+
+def _little_endian(a):
+    if sys.byteorder == 'big':
+        a.byteswap()
+    return a
+
+
+def _read_header(buf, path):
+    fields = HEADER.unpack_from(buf, 0)
+    magic, version, parser_version = fields[:3]
+    if magic != MAGIC or version != FORMAT_VERSION or parser_version != PARSER_VERSION:
+        raise ValueError(f"不支持的搜索索引格式：{path}")
+    return fields[3:]
+
+
+class _TermTable:
+    """映射的词条表：词条 -> 编号。词条按码位排序，UTF-8 编码后的字节顺序相同，按字节二分查找"""
+
+    def __init__(self, buf, starts, base):
+        self._buf = buf
+        self._starts = starts
+        self._base = base
+
+    def __len__(self):
+        return len(self._starts) - 1
+
+    def _term(self, i):
+        return self._buf[self._base + self._starts[i]:self._base + self._starts[i + 1]]
+
+    def get(self, term, default=None):
+        key = term.encode('utf-8')
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self._term(lo) == key:
+            return lo
+        return default
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._term(i).decode('utf-8')
+
+
+class SearchIndex:
+    """倒排索引；文档编号是题目在题库中的位置
+
+    terms 是词条 -> 编号的映射（按词条排序），其余数组可以是 array，也可以是映射文件上的 memoryview。
+    """
+
+    def __init__(self, qids, lengths, terms, offsets, docs, tfs, source_meta=None):
+        self.qids = qids
+        self.lengths = lengths
+        self.terms = terms
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        # (源文件大小, mtime_ns, sha256)，未保存过的索引为None
+        self.source_meta = source_meta
+        n = len(qids)
+        average = sum(lengths) / n if n else 1.0
+        # 每篇文档 BM25 分母中与词频无关的部分
+        self._norms = array('d', (K1 * (1 - B + B * length / (average or 1.0)) for length in lengths))
+
+    def __len__(self):
+        return len(self.qids)
+
+    @classmethod
+    def build(cls, questions):
+        """为题库建立索引，questions 按id排序（QuestionStore）"""
+        # 词条 -> [文档编号, 词频, 文档编号, 词频, ...]
+        postings = {}
+        qids = array('q')
+        lengths = array('f')
+        for doc, q in enumerate(questions):
+            stem = terms(q.text)
+            options = terms('\n'.join(q.options))
+            counts = Counter(stem)
+            for term, count in Counter(options).items():
+                counts[term] += OPTION_WEIGHT * count
+            for term, tf in counts.items():
+                entry = postings.get(term)
+                if entry is None:
+                    postings[term] = [doc, tf]
+                else:
+                    entry += (doc, tf)
+            qids.append(q.id)
+            lengths.append(len(stem) + OPTION_WEIGHT * len(options))
+
+        term_list = sorted(postings)
+        offsets = array('I', [0])
+        docs = array('I')
+        tfs = array('f')
+        for term in term_list:
+            entry = postings[term]
+            docs.extend(entry[0::2])
+            tfs.extend(entry[1::2])
+            offsets.append(len(docs))
+        return cls(qids, lengths, {term: i for i, term in enumerate(term_list)}, offsets, docs, tfs)
+
+    def save(self, path, source):
+        """写入索引文件，记录源文件版本"""
+        source = Path(source)
+        st = source.stat()
+        digest = file_digest(source)
+        encoded = [term.encode('utf-8') for term in self.terms]
+        starts = array('I', [0])
+        for term in encoded:
+            starts.append(starts[-1] + len(term))
+        term_bytes = b''.join(encoded)
+        header = HEADER.pack(MAGIC, FORMAT_VERSION, PARSER_VERSION, st.st_size, st.st_mtime_ns, digest,
+                             len(self.qids), len(encoded), len(self.docs), len(term_bytes))
+        # 先写临时文件再改名，读者不会看到写了一半的索引
+        path = Path(path)
+        tmp = path.with_name(path.name + '.tmp')
+        with open(tmp, 'wb') as f:
+            f.write(header)
+            for a in (self.qids, self.lengths, starts, self.offsets, self.docs, self.tfs):
+                f.write(_little_endian(array(a.typecode, a)).tobytes())
+            f.write(term_bytes)
+        os.replace(tmp, path)
+        self.source_meta = (st.st_size, st.st_mtime_ns, digest)
+
+    @classmethod
+    def load(cls, path):
+        """读入索引文件，格式或解析器版本不符时抛出 ValueError"""
+        with open(path, 'rb') as f:
+            data = f.read()
+        size, mtime_ns, digest, n_docs, n_terms, n_postings, term_bytes = _read_header(data, path)
+        offset = HEADER.size
+
+        def read(typecode, count):
+            nonlocal offset
+            a = array(typecode)
+            end = offset + a.itemsize * count
+            a.frombytes(data[offset:end])
+            offset = end
+            return _little_endian(a)
+
+        qids = read('q', n_docs)
+        lengths = read('f', n_docs)
+        starts = read('I', n_terms + 1)
+        offsets = read('I', n_terms + 1)
+        docs = read('I', n_postings)
+        tfs = read('f', n_postings)
+        if offset + term_bytes != len(data):
+            raise ValueError(f"搜索索引已损坏：{path}")
+        terms = _TermTable(data, starts, offset)
+        return cls(qids, lengths, {term: i for i, term in enumerate(terms)}, offsets, docs, tfs,
+                   (size, mtime_ns, digest))
+
+    @classmethod
+    def map(cls, path):
+        """只读映射索引文件，不复制数组和词条表；大端机器上退回 load()"""
+        if sys.byteorder == 'big':
+            return cls.load(path)
+        with open(path, 'rb') as f:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        size, mtime_ns, digest, n_docs, n_terms, n_postings, term_bytes = _read_header(buf, path)
+        view = memoryview(buf)
+        offset = HEADER.size
+
+        def read(typecode, count):
+            nonlocal offset
+            end = offset + struct.calcsize(typecode) * count
+            if end > len(buf):
+                raise ValueError(f"搜索索引已损坏：{path}")
+            a = view[offset:end].cast(typecode)
+            offset = end
+            return a
+
+        qids = read('q', n_docs)
+        lengths = read('f', n_docs)
+        starts = read('I', n_terms + 1)
+        offsets = read('I', n_terms + 1)
+        docs = read('I', n_postings)
+        tfs = read('f', n_postings)
+        if offset + term_bytes != len(buf):
+            raise ValueError(f"搜索索引已损坏：{path}")
+        return cls(qids, lengths, _TermTable(buf, starts, offset), offsets, docs, tfs,
+                   (size, mtime_ns, digest))
+
+    def is_fresh(self, source):
+        return self.source_meta is not None and source_unchanged(source, *self.source_meta)
+
+    def _doc_range(self, chapter):
+        if chapter is None:
+            return 0, len(self.qids)
+        return (bisect_left(self.qids, question_id(chapter, 0)),
+                bisect_left(self.qids, question_id(chapter + 1, 0)))
+
+    def search(self, query, chapter=None, limit=20):
+        """按 BM25 得分返回至多 limit 个 [(文档编号, 得分)]，可只搜某一章"""
+        first, last = self._doc_range(chapter)
+        n = len(self.qids)
+        norms = self._norms
+        scores = {}
+        for term in query_terms(query):
+            t = self.terms.get(term)
+            if t is None:
+                continue
+            start, end = self.offsets[t], self.offsets[t + 1]
+            df = end - start
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            if chapter is not None:
+                start, end = bisect_left(self.docs, first, start, end), bisect_left(self.docs, last, start, end)
+            weight = idf * (K1 + 1)
+            get = scores.get
+            for doc, tf in zip(self.docs[start:end], self.tfs[start:end]):
+                scores[doc] = get(doc, 0.0) + weight * tf / (tf + norms[doc])
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+
+def open_index(source, mapped=False):
+    """打开源文件对应的索引，不存在、损坏或已过期时返回None；mapped 为 True 时只读映射"""
+    path = index_path(source)
+    if not path.exists():
+        return None
+    try:
+        index = SearchIndex.map(path) if mapped else SearchIndex.load(path)
+    except (OSError, ValueError, struct.error, UnicodeDecodeError):
+        return None
+    return index if index.is_fresh(source) else None
+
+
+def load_index(source, questions, mapped=False):
+    """优先读取已保存的索引；缺失或过期时为 questions 重新建立并尽量保存
+
+    source 为None（题库不是从文件读入的）或目录不可写时只在内存中使用。
+    """
+    if source is not None:
+        index = open_index(source, mapped)
+        if index is not None and index.qids == array('q', questions.ids()):
+            return index
+    index = SearchIndex.build(questions)
+    if source is not None:
+        try:
+            index.save(index_path(source), source)
+        except OSError:
+            pass
+    return index
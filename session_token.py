@@ -0,0 +1,243 @@
+"""无状态的测验进度口令
+
+一次普通测验的题目顺序和选项顺序完全由（题目范围、会话种子）决定（见 shuffle_service.py），
+所以恢复一次测验只需要：题目范围的指纹、种子、章节、题目总数、当前位置，
+以及每个位置是否已答、是否答对的位图。口令把这些字段打包、附上 HMAC-SHA256 签名后用 base64url 编码，
+任何持有同一密钥的实例都能直接校验并恢复进度，不需要查询存储或本地文件；
+API、quiz.py 和 quiz_gui.py 使用同一种格式，网页上没做完的测验可以在命令行中继续，反之亦然。
+
+格式（小端）：版本(u8) 标志(u8) 指纹(u32) 种子(u32) 章节(u16，0表示全部) 总数(u32) 位置(u32)
+             已答位图、答对位图（各 ceil(总数/8) 字节；标志位 1 表示两段位图经过 zlib 压缩）
+             签名（HMAC-SHA256 的前 16 字节）
+
+指纹是题目范围内题目id数组的 blake2b 摘要：增删题目会改变顺序，旧口令随之失效；
+只修改题目内容不影响顺序，口令仍然有效。
+
+密钥依次取自环境变量 QUIZ_SESSION_KEY、密钥文件（QUIZ_SESSION_KEY_FILE，默认 ~/.quiz_session_key，
+不存在时生成）；都不可用时使用进程内的随机密钥，口令只在本进程中有效。
+多实例部署（如 Vercel）必须设置 QUIZ_SESSION_KEY，否则各实例签发的口令互不通用。
+同一个密钥也用来签名 API 分配给每个客户端的用户id（sign_user / verify_user）。
+"""
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from pathlib import Path
+
+from structured_log import get_logger
+
+log = get_logger('session_token')
+
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<BBIIHII')
+SIGNATURE_SIZE = 16
+FLAG_COMPRESSED = 1
+# 位图不超过这个长度时不尝试压缩
+COMPRESS_MIN = 64
+# 解压后的位图最多这么长，防止构造的口令解压出过大的数据
+MAX_TOTAL = 1 << 24
+
+_key = None
+_key_lock = threading.Lock()
+
+
+class InvalidToken(ValueError):
+    """口令格式错误、签名不符或与当前题库不匹配"""
+
+
+def fingerprint(ids):
+    """题目id数组的指纹（u32）"""
+    data = array('q', ids)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return int.from_bytes(hashlib.blake2b(data.tobytes(), digest_size=4).digest(), 'little')
+
+
+def key_file():
+    return Path(os.environ.get('QUIZ_SESSION_KEY_FILE') or Path.home() / '.quiz_session_key')
+
+
+def _load_key():
+    value = os.environ.get('QUIZ_SESSION_KEY')
+    if value:
+        return value.encode('utf-8')
+    path = key_file()
+    try:
+        key = path.read_bytes()
+        if key:
+            return key
+    except OSError:
+        pass
+    key = secrets.token_bytes(32)
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(key)
+        return key
+    except FileExistsError:
+        # 另一个进程刚刚生成了密钥
+        return path.read_bytes() or key
+    except OSError as e:
+        log.warning('session key not persisted', path=str(path), error=str(e))
+        return key
+
+
+def session_key():
+    """签名用的密钥，进程内只读取一次"""
+    global _key
+    if _key is None:
+        with _key_lock:
+            if _key is None:
+                _key = _load_key()
+    return _key
+
+
+def _sign(key, data):
+    return hmac.new(key, data, hashlib.sha256).digest()[:SIGNATURE_SIZE]
+
+
+def _bit(bits, i):
+    return bits[i >> 3] >> (i & 7) & 1
+
+
+def new_user():
+    """服务端分配的匿名用户id"""
+    return 'u-' + secrets.token_urlsafe(12)
+
+
+def sign_user(user):
+    """用户id加上签名，作为客户端保存的身份凭据"""
+    signature = _sign(session_key(), b'user:' + user.encode('utf-8'))
+    return f"{user}.{base64.urlsafe_b64encode(signature).rstrip(b'=').decode('ascii')}"
+
+
+def verify_user(value):
+    """校验身份凭据，返回其中的用户id；格式错误或签名不符时返回None"""
+    user, _, signature = (value or '').rpartition('.')
+    if not user:
+        return None
+    expected = sign_user(user).rpartition('.')[2]
+    try:
+        return user if hmac.compare_digest(signature, expected) else None
+    except TypeError:
+        # 含有非 ASCII 字符
+        return None
+
+
+class SessionToken:
+    """一次测验的进度
+
+    position 是第一道还没有作答的题目在会话顺序中的位置；
+    answered、correct 是按会话顺序排列的位图。
+    """
+    __slots__ = ('bank', 'seed', 'chapter', 'total', 'position', 'answered', 'correct')
+
+    def __init__(self, bank, seed, chapter, total, position=0, answered=None, correct=None):
+        size = (total + 7) // 8
+        self.bank = bank
+        self.seed = seed
+        self.chapter = chapter
+        self.total = total
+        self.position = position
+        self.answered = bytearray(answered) if answered is not None else bytearray(size)
+        self.correct = bytearray(correct) if correct is not None else bytearray(size)
+
+    @classmethod
+    def start(cls, seed, ids, chapter=None):
+        """为题目范围 ids（升序，与 SessionShuffle 的输入相同）上的新测验创建口令"""
+        return cls(fingerprint(ids), seed, chapter, len(ids))
+
+    def matches(self, ids):
+        """口令是否仍适用于当前题库中的这个题目范围"""
+        return len(ids) == self.total and fingerprint(ids) == self.bank
+
+    def is_answered(self, position):
+        return bool(_bit(self.answered, position))
+
+    def is_correct(self, position):
+        return bool(_bit(self.correct, position))
+
+    def record(self, position, correct):
+        """记录会话顺序中第 position 道题的作答结果，当前位置移到下一道还没有作答的题"""
+        if not 0 <= position < self.total:
+            raise IndexError(position)
+        byte, mask = position >> 3, 1 << (position & 7)
+        self.answered[byte] |= mask
+        if correct:
+            self.correct[byte] |= mask
+        else:
+            self.correct[byte] &= ~mask
+        while self.position < self.total and _bit(self.answered, self.position):
+            self.position += 1
+
+    def wrong_positions(self):
+        """已作答但答错的位置（升序）"""
+        for byte, (answered, correct) in enumerate(zip(self.answered, self.correct)):
+            missed = answered & ~correct
+            while missed:
+                low = missed & -missed
+                yield byte * 8 + low.bit_length() - 1
+                missed ^= low
+
+    @property
+    def answered_count(self):
+        return bin(int.from_bytes(self.answered, 'little')).count('1')
+
+    @property
+    def score(self):
+        return bin(int.from_bytes(self.correct, 'little')).count('1')
+
+    @property
+    def finished(self):
+        return self.position >= self.total
+
+    def encode(self, key=None):
+        flags = 0
+        bits = bytes(self.answered + self.correct)
+        if len(bits) > COMPRESS_MIN:
+            packed = zlib.compress(bits, 9)
+            if len(packed) < len(bits):
+                flags |= FLAG_COMPRESSED
+                bits = packed
+        data = HEADER.pack(FORMAT_VERSION, flags, self.bank, self.seed, self.chapter or 0,
+                           self.total, self.position) + bits
+        data += _sign(key or session_key(), data)
+        return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+    @classmethod
+    def decode(cls, token, key=None):
+        """校验签名并解出口令，任何问题都抛出 InvalidToken"""
+        try:
+            token = token.strip()
+            data = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        except (AttributeError, TypeError, ValueError):
+            raise InvalidToken('口令格式错误') from None
+        if len(data) < HEADER.size + SIGNATURE_SIZE:
+            raise InvalidToken('口令格式错误')
+        body, signature = data[:-SIGNATURE_SIZE], data[-SIGNATURE_SIZE:]
+        if not hmac.compare_digest(signature, _sign(key or session_key(), body)):
+            raise InvalidToken('口令签名不符')
+        version, flags, bank, seed, chapter, total, position = HEADER.unpack_from(body)
+        if version != FORMAT_VERSION or total > MAX_TOTAL or position > total:
+            raise InvalidToken('口令格式错误')
+        size = (total + 7) // 8
+        bits = body[HEADER.size:]
+        if flags & FLAG_COMPRESSED:
+            try:
+                decompressor = zlib.decompressobj()
+                bits = decompressor.decompress(bits, 2 * size + 1)
+            except zlib.error:
+                raise InvalidToken('口令格式错误') from None
+        if len(bits) != 2 * size:
+            raise InvalidToken('口令格式错误')
+        return cls(bank, seed, chapter or None, total, position, bits[:size], bits[size:])
+
+    def __repr__(self):
+        return (f"SessionToken(seed={self.seed}, chapter={self.chapter}, "
+                f"position={self.position}/{self.total}, score={self.score})")
@@ -0,0 +1,262 @@
+"""多进程共享题库
+
+多个 worker 进程各自解析 quiz.md 时，每个进程都常驻一份完整的题目对象，内存随进程数线性增长，
+题库更新也要每个进程分别发现、分别重新解析。共享模式下由一个进程把题库编译成预编译产物
+（bank_artifact.py 的格式）发布到共享目录（默认在 /dev/shm 下，即内存文件系统），
+各 worker 只读 mmap 同一个文件，页面由内核在进程间共享；题目对象按需构建、用完即丢，不在每个进程中常驻。
+搜索索引也随每个版本一起发布，worker 不必各自建立。
+只有题目记录和搜索索引是共享的：预序列化的响应（bank_payloads.py）、id 索引和选题统计仍由每个 worker
+各自建立，这部分内存随题库大小增长（实测见 benchmarks/shared_bank.py）。
+
+共享目录中的文件：
+    current                控制头，创建后只原地更新，不会被替换
+    bank-<版本号>.bank      各版本的题库产物，写完后不再修改
+    bank-<版本号>.search    对应的搜索索引
+
+控制头（小端）：magic(4) 格式版本(u16) 保留(u16) 序号(u64) 版本号(u64) 题目数(u32) 源文件sha256(32)
+发布时先写好新版本的产物，再更新控制头：序号加一（奇数表示正在写），写入版本号等，序号再加一。
+读者在读取前后各读一次序号，相同且为偶数才采用（seqlock），worker 只会看到完整的旧版本或新版本。
+旧版本的产物保留 KEEP 个；已删除的文件在仍映射着它的进程中继续有效，直到该进程切换到新版本。
+
+用法：
+    python shared_bank.py publish [quiz.md]     # 发布一次
+    python shared_bank.py watch [quiz.md]       # 源文件变化时重新发布
+    python shared_bank.py status
+    QUIZ_SHARED_BANK=1 uvicorn main:app --workers 8    # worker 从共享目录读取题库（也可以设为目录路径）
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows 没有 fcntl，发布时不加锁
+    fcntl = None
+
+from bank_artifact import BankArtifact, compile_bank, file_digest, load_bank
+from question_store import QuestionStore
+from search_index import index_path, load_index
+
+MAGIC = b'QSHM'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHQQI32s')
+# 序号在控制头中的偏移
+SEQUENCE = struct.Struct('<Q')
+SEQUENCE_OFFSET = 8
+KEEP = 2
+
+
+def default_directory():
+    base = Path('/dev/shm')
+    if not base.is_dir():
+        base = Path(tempfile.gettempdir())
+    return base / 'quiz-bank'
+
+
+def shared_directory(value=None):
+    """共享目录，未启用时返回None
+
+    value 为 True 或 "1" 时使用默认目录，为 False、"" 或 "0" 时不启用，否则是目录路径；
+    为None时读取环境变量 QUIZ_SHARED_BANK。
+    """
+    if value is None:
+        value = os.environ.get('QUIZ_SHARED_BANK', '')
+    if value in (False, '', '0'):
+        return None
+    if value in (True, '1'):
+        return default_directory()
+    return Path(value)
+
+
+def bank_file(directory, version):
+    return Path(directory) / f'bank-{version}.bank'
+
+
+class SharedBank:
+    """共享目录的读者：读取控制头，打开当前版本的产物"""
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self._header = None
+
+    def _map(self):
+        if self._header is None:
+            try:
+                with open(self.directory / 'current', 'rb') as f:
+                    self._header = mmap.mmap(f.fileno(), HEADER.size, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                # 还没有发布过
+                return None
+        return self._header
+
+    def current(self):
+        """(版本号, 题目数, 源文件sha256)，没有发布过时返回None"""
+        header = self._map()
+        if header is None:
+            return None
+        for _ in range(1000):
+            (before,) = SEQUENCE.unpack_from(header, SEQUENCE_OFFSET)
+            magic, version, _, _, number, count, digest = HEADER.unpack_from(header, 0)
+            (after,) = SEQUENCE.unpack_from(header, SEQUENCE_OFFSET)
+            if before == after and not before & 1:
+                if magic != MAGIC or version != FORMAT_VERSION or not before:
+                    return None
+                return number, count, digest
+            time.sleep(0.001)
+        return None
+
+    def signature(self):
+        """(产物路径, 版本号, 题目数)，用作题库缓存的版本签名"""
+        current = self.current()
+        if current is None:
+            return None
+        number, count, _ = current
+        return (str(bank_file(self.directory, number)), number, count)
+
+    def open(self, path):
+        """打开一个版本的产物；题目对象不缓存，访问时从共享页面构建"""
+        bank = BankArtifact(path, cache=False)
+        return QuestionStore(bank, bank.chapter_titles)
+
+    def close(self):
+        if self._header is not None:
+            self._header.close()
+            self._header = None
+
+
+def _open_header(directory):
+    """以读写方式映射控制头，文件不存在时创建"""
+    fd = os.open(Path(directory) / 'current', os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if os.fstat(fd).st_size < HEADER.size:
+            os.ftruncate(fd, HEADER.size)
+        return mmap.mmap(fd, HEADER.size)
+    finally:
+        os.close(fd)
+
+
+class _PublishLock:
+    """同一目录同时只有一个进程发布"""
+
+    def __init__(self, directory):
+        self.path = Path(directory) / 'publish.lock'
+
+    def __enter__(self):
+        self._file = open(self.path, 'a')
+        if fcntl is not None:
+            fcntl.flock(self._file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        self._file.close()
+
+
+def _write_header(header, number, count, digest):
+    (sequence,) = SEQUENCE.unpack_from(header, SEQUENCE_OFFSET)
+    sequence += sequence & 1  # 上次发布中途退出时序号停在奇数
+    SEQUENCE.pack_into(header, SEQUENCE_OFFSET, sequence + 1)
+    HEADER.pack_into(header, 0, MAGIC, FORMAT_VERSION, 0, sequence + 1, number, count, digest)
+    SEQUENCE.pack_into(header, SEQUENCE_OFFSET, sequence + 2)
+    header.flush()
+
+
+def _remove_old(directory, number):
+    for path in Path(directory).glob('bank-*.*'):
+        version = path.stem.split('-', 1)[1]
+        if version.isdigit() and int(version) <= number - KEEP:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+
+def publish(source, directory=None, parse=None, force=False):
+    """把源文件发布为共享题库的新版本，返回版本号
+
+    parse(source) 在没有最新的预编译产物时解析 Markdown，默认使用 quiz_parser。
+    源文件与当前版本相同（sha256 一致）且不是 force 时不重新发布，返回当前版本号。
+    """
+    source = Path(source)
+    directory = Path(directory) if directory else default_directory()
+    directory.mkdir(parents=True, exist_ok=True)
+    if parse is None:
+        from quiz_parser import parse_file
+
+        def parse(path):
+            return parse_file(path)[0]
+
+    with _PublishLock(directory):
+        digest = file_digest(source)
+        current = SharedBank(directory).current()
+        if current is not None and current[2] == digest and not force:
+            return current[0]
+        questions = load_bank(source, parse)
+        header = _open_header(directory)
+        try:
+            # 持有发布锁时没有其他写者，直接读上次的版本号：上次发布中途退出（序号停在奇数）时
+            # 读者看不到当前版本，但新版本号仍要递增，不能覆盖 worker 正在使用的版本
+            magic, version, _, _, last, _, _ = HEADER.unpack_from(header, 0)
+            number = last + 1 if magic == MAGIC and version == FORMAT_VERSION else 1
+            target = compile_bank(source, questions, bank_file(directory, number))
+            load_index(source, questions).save(index_path(target), target)
+            _write_header(header, number, len(questions), digest)
+        finally:
+            header.close()
+        _remove_old(directory, number)
+        return number
+
+
+def watch(source, directory=None, interval=1.0):
+    """源文件的 mtime 或大小变化时重新发布"""
+    last = None
+    while True:
+        try:
+            st = Path(source).stat()
+            signature = (st.st_mtime_ns, st.st_size)
+        except OSError:
+            signature = None
+        if signature is not None and signature != last:
+            number = publish(source, directory)
+            print(f"{time.strftime('%H:%M:%S')} 当前版本 {number}")
+            last = signature
+        time.sleep(interval)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='把题库发布到共享目录，供多个 worker 进程只读映射')
+    parser.add_argument('command', choices=('publish', 'watch', 'status'))
+    parser.add_argument('source', nargs='?', default=str(Path(__file__).parent / 'quiz.md'),
+                        help='题库 Markdown 文件')
+    parser.add_argument('--dir', help=f'共享目录（默认 {default_directory()}）')
+    parser.add_argument('--force', action='store_true', help='源文件没有变化也重新发布')
+    parser.add_argument('--interval', type=float, default=1.0, help='watch 检查源文件的间隔（秒）')
+    args = parser.parse_args(argv)
+    directory = Path(args.dir) if args.dir else default_directory()
+
+    if args.command == 'status':
+        current = SharedBank(directory).current()
+        if current is None:
+            print(f"{directory}：尚未发布")
+            return 1
+        number, count, digest = current
+        path = bank_file(directory, number)
+        print(f"{directory}：版本 {number}，{count}题，{path.stat().st_size}字节，源文件sha256 {digest.hex()[:16]}")
+        return 0
+    if args.command == 'watch':
+        try:
+            watch(args.source, directory, args.interval)
+        except KeyboardInterrupt:
+            pass
+        return 0
+    number = publish(args.source, directory, force=args.force)
+    print(f"已发布到 {directory}：版本 {number}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
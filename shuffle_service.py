@@ -0,0 +1,131 @@
+"""由会话种子决定的题目顺序和选项顺序
+
+每次测验使用一个会话种子：
+    题目顺序  用 random.Random(seed) 对题目id数组做一次洗牌
+    选项顺序  4个选项只有24种排列，预先算好排列表及其逆表；
+              每道题的排列编号由种子和题目id经过整数混合得到
+
+同一个种子总能得到同样的题目顺序和选项顺序，测验可以按种子重放；
+求正确答案的新字母只需查一次逆表，不需要重建字典再线性查找。
+判分同样只需要种子：把显示的字母经排列表还原成原选项下标，再与答案比较，
+客户端拿到的题目可以不带答案。
+不会修改全局随机数生成器的状态，并发请求之间互不影响。
+"""
+import random
+import secrets
+from array import array
+from itertools import permutations
+
+from question_store import OPTION_KEYS
+
+# PERMUTATIONS[p][j] = 第 j 个显示位置上的原选项下标
+PERMUTATIONS = tuple(permutations(range(len(OPTION_KEYS))))
+# INVERSE[p][i] = 原选项 i 显示在第几个位置
+INVERSE = tuple(tuple(perm.index(i) for i in range(len(perm))) for perm in PERMUTATIONS)
+# LAYOUTS[p] = 按显示顺序排列的原选项字母，如 "CADB" 表示显示为A的是原来的C
+LAYOUTS = tuple(''.join(OPTION_KEYS[i] for i in perm) for perm in PERMUTATIONS)
+
+LETTER_INDEX = {key: i for i, key in enumerate(OPTION_KEYS)}
+
+MASK64 = (1 << 64) - 1
+
+
+def new_seed():
+    """生成一个新的会话种子"""
+    return secrets.randbits(32)
+
+
+def _mix(x):
+    """splitmix64 的混合函数，把相邻的整数打散成均匀分布的64位整数"""
+    x = (x + 0x9E3779B97F4A7C15) & MASK64
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & MASK64
+    return x ^ (x >> 31)
+
+
+def option_permutation(seed, qid):
+    """会话中某道题的选项排列编号（0-23），只由种子和题目id决定"""
+    return _mix((seed << 32) ^ qid) % len(PERMUTATIONS)
+
+
+def shuffled_letter(perm, answer):
+    """原选项下标 answer 在排列 perm 下显示的字母"""
+    return OPTION_KEYS[INVERSE[perm][answer]]
+
+
+def original_index(perm, letter):
+    """排列 perm 下显示为 letter 的选项对应的原选项下标"""
+    return PERMUTATIONS[perm][OPTION_KEYS.index(letter)]
+
+
+def shuffle_questions(seed, questions):
+    """返回按种子洗牌后的题目列表（不修改原列表）"""
+    shuffled = list(questions)
+    random.Random(seed).shuffle(shuffled)
+    return shuffled
+
+
+def present(question, perm, reveal=True):
+    """按排列生成展示用的题目字典；reveal 为 False 时不含正确答案（由服务端判分）"""
+    d = question.to_dict(reveal)
+    d['options'] = {key: question.options[i] for key, i in zip(OPTION_KEYS, PERMUTATIONS[perm])}
+    if reveal:
+        d['correct_answer'] = shuffled_letter(perm, question.answer)
+    return d
+
+
+def grade(questions, answers):
+    """批量判分，answers 为 [(种子, 题目id, 显示的字母)]
+
+    返回与 answers 对齐的列表，每项为 (题目, 排列编号, 原选项下标, 是否答对)；
+    题目不存在或字母无法识别时为None。
+    """
+    results = []
+    for seed, qid, letter in answers:
+        q = questions.get(qid)
+        shown = LETTER_INDEX.get(letter)
+        if q is None or shown is None:
+            results.append(None)
+            continue
+        perm = option_permutation(seed, qid)
+        chosen = PERMUTATIONS[perm][shown]
+        results.append((q, perm, chosen, chosen == q.answer))
+    return results
+
+
+def session_order(seed, ids):
+    """会话的题目顺序：对题目id数组做一次洗牌，返回新数组"""
+    order = array('q', ids)
+    random.Random(seed).shuffle(order)
+    return order
+
+
+class SessionShuffle:
+    """一次测验的题目顺序和每道题的选项排列
+
+    order 是洗牌后的题目id数组，perms 是与之对齐的选项排列编号数组，
+    两者在构造时一次生成。
+    """
+    __slots__ = ('seed', 'order', 'perms')
+
+    def __init__(self, seed, ids):
+        self.seed = seed
+        self.order = session_order(seed, ids)
+        self.perms = array('B', (option_permutation(seed, qid) for qid in self.order))
+
+    def __len__(self):
+        return len(self.order)
+
+    def page(self, questions, offset, limit, reveal=True):
+        """取出 [offset, offset+limit) 范围内的展示用题目字典"""
+        end = min(offset + limit, len(self.order))
+        return [present(questions.get(self.order[i]), self.perms[i], reveal) for i in range(offset, end)]
+
+    def layouts(self):
+        """与 order 对齐的选项布局字符串列表，客户端据此在缓存的原始题目上还原选项顺序"""
+        return [LAYOUTS[perm] for perm in self.perms]
+
+    def items(self, questions):
+        """依次产出(题目, 选项排列编号)"""
+        for qid, perm in zip(self.order, self.perms):
+            yield questions.get(qid), perm
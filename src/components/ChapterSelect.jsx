@@ -4,6 +4,7 @@ import { useNavigate } from 'react-router-dom'
 function ChapterSelect() {
   const navigate = useNavigate()
   const [chapters, setChapters] = useState([])
+  const [counts, setCounts] = useState({})
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState(null)
 
@@ -23,6 +24,9 @@ function ChapterSelect() {
         throw new Error(data.error)
       }
       setChapters(data.chapters)
+      setCounts(Object.fromEntries(
+        (data.details || []).map(d => [d.chapter, d.count])
+      ))
       setError(null)
     } catch (error) {
       console.error('Error fetching chapters:', error)
@@ -65,7 +69,7 @@ function ChapterSelect() {
             className="chapter-button"
             onClick={() => handleChapterSelect(chapter)}
           >
-            第{chapter}章
+            第{chapter}章{counts[chapter] ? ` (${counts[chapter]}题)` : ''}
           </button>
         ))}
       </div>
@@ -1,17 +1,34 @@
-import React, { useState, useEffect } from 'react'
+import React, { useState, useEffect, useRef } from 'react'
 import { useNavigate, useLocation } from 'react-router-dom'
 import ReactMarkdown from 'react-markdown'
 import rehypeRaw from 'rehype-raw'
 import remarkGfm from 'remark-gfm'
 
+// 没做完的测验：章节、最新的进度口令，以及错题的作答（口令里只有对错，没有选了哪个字母）
+const SAVED_SESSION = 'quizSession'
+
+const readSavedSession = () => {
+  try {
+    return JSON.parse(localStorage.getItem(SAVED_SESSION))
+  } catch {
+    return null
+  }
+}
+
 function Quiz() {
   const [questions, setQuestions] = useState([])
+  const [total, setTotal] = useState(0)
   const [currentQuestion, setCurrentQuestion] = useState(0)
   const [score, setScore] = useState(0)
   const [wrongQuestions, setWrongQuestions] = useState({})
+  const [showAnswer, setShowAnswer] = useState(false)
+  const [checking, setChecking] = useState(false)
   const [loading, setLoading] = useState(true)
   const [error, setError] = useState(null)
-  const [showAnswer, setShowAnswer] = useState(false)
+  const [gradeFailed, setGradeFailed] = useState(false)
+  const startedAt = useRef(Date.now())
+  // 当前测验的章节和进度口令，每次判分后换成服务端返回的新口令
+  const session = useRef(null)
   const navigate = useNavigate()
   const location = useLocation()
   const selectedChapter = location.state?.chapter
@@ -21,67 +38,161 @@ function Quiz() {
     fetchQuestions()
   }, [selectedChapter])
 
+  const fetchJson = async (url) => {
+    const response = await fetch(url)
+    if (!response.ok) {
+      throw new Error(`Failed to fetch questions: ${response.statusText}`)
+    }
+    const data = await response.json()
+
+    if (data.error) {
+      throw new Error(data.error)
+    }
+    return data
+  }
+
+  // 按选项布局还原洗牌后的题目：layout 按显示顺序列出原选项字母
+  // 题目数据不含答案，每答一题由服务端按种子判分并给出正确答案
+  const applyLayout = (question, layout) => {
+    const keys = ['A', 'B', 'C', 'D']
+    const options = {}
+    keys.forEach((key, i) => {
+      options[key] = question.options[layout[i]]
+    })
+    return { ...question, options }
+  }
+
+  const saveSession = (token, wrong) => {
+    const yourAnswers = {}
+    Object.values(wrong).forEach(q => {
+      yourAnswers[q.id] = q.your_answer
+    })
+    localStorage.setItem(SAVED_SESSION, JSON.stringify({
+      chapter: session.current.chapter,
+      token,
+      answers: yourAnswers
+    }))
+  }
+
   const fetchQuestions = async () => {
     try {
       setLoading(true)
       setError(null)
-      
-      const url = selectedChapter 
-        ? `/api/questions/${selectedChapter}`
-        : '/api/questions'
-      const response = await fetch(url)
-      if (!response.ok) {
-        throw new Error(`Failed to fetch questions: ${response.statusText}`)
+
+      // 先取本次测验的题目顺序和选项布局（很小），题目内容按带版本号的地址获取，
+      // 内容未变时直接使用浏览器缓存；同一章节有没做完的测验时可以按口令继续
+      const chapter = selectedChapter || null
+      const saved = readSavedSession()
+      let shuffle = null
+      if (saved && saved.chapter === chapter && window.confirm('上次的测验还没有做完，是否继续？')) {
+        try {
+          shuffle = await fetchJson(`/api/session/resume?token=${encodeURIComponent(saved.token)}`)
+        } catch (error) {
+          // 口令失效（如题库已更新）时开始新的测验
+          console.error('Error resuming session:', error)
+        }
       }
-      const data = await response.json()
-      
-      if (data.error) {
-        throw new Error(data.error)
+      if (!shuffle) {
+        localStorage.removeItem(SAVED_SESSION)
+        shuffle = await fetchJson(chapter ? `/api/shuffle?chapter=${chapter}` : '/api/shuffle')
       }
-      if (!data.questions || !Array.isArray(data.questions)) {
+      const bank = await fetchJson(shuffle.bank)
+      if (!bank.questions || !Array.isArray(bank.questions)) {
         throw new Error('Invalid questions data format')
       }
-      setQuestions(data.questions)
+      const byId = new Map(bank.questions.map(q => [q.id, q]))
+      const shuffled = shuffle.order
+        .map((id, i) => byId.has(id) ? applyLayout(byId.get(id), shuffle.layouts[i]) : null)
+        .filter(Boolean)
+      // 继续测验时按口令恢复之前答错的题目，选过的字母取自本地保存的记录
+      const laidOut = new Map(shuffled.map(q => [q.id, q]))
+      const yourAnswers = (shuffle.wrong.length > 0 && saved?.answers) || {}
+      const wrong = {}
+      shuffle.wrong.forEach(({ id, correct_answer }) => {
+        if (laidOut.has(id)) {
+          wrong[id] = { ...laidOut.get(id), correct_answer, your_answer: yourAnswers[id] || '?' }
+        }
+      })
+      session.current = { chapter, token: shuffle.token }
+      setTotal(shuffled.length)
+      setQuestions(shuffled)
+      setCurrentQuestion(Math.min(shuffle.position, shuffled.length - 1))
+      setScore(shuffle.score)
+      setWrongQuestions(wrong)
+      setShowAnswer(false)
+      setGradeFailed(false)
+      startedAt.current = Date.now()
+      setLoading(false)
     } catch (error) {
       console.error('Error fetching questions:', error)
       setError(error.message)
-    } finally {
       setLoading(false)
     }
   }
 
-  const handleAnswer = (answer) => {
-    const question = questions[currentQuestion]
-    const isCorrect = answer === question.correct_answer
-
-    if (isCorrect) {
-      setScore(score + 1)
-    } else {
-      setWrongQuestions({
-        ...wrongQuestions,
-        [question.number]: {
-          ...question,
-          your_answer: answer
-        }
+  // 提交一道题的作答：服务端按口令中的种子判分、记录作答历史和错题，并返回记入这道题后的新口令
+  const gradeAnswer = async (question, answer, seconds) => {
+    const response = await fetch('/api/grade', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({
+        token: session.current.token,
+        answers: [{ id: question.id, answer, seconds }]
       })
+    })
+    if (!response.ok) {
+      throw new Error(`Failed to grade answers: ${response.statusText}`)
     }
+    const data = await response.json()
+    if (data.error) {
+      throw new Error(data.error)
+    }
+    session.current.token = data.token
+    return data.results[0]
+  }
 
-    question.your_answer = answer
-    
-    setShowAnswer(true)
+  const handleAnswer = async (answer) => {
+    const question = questions[currentQuestion]
+    const seconds = (Date.now() - startedAt.current) / 1000
+    setChecking(true)
+    try {
+      const result = await gradeAnswer(question, answer, seconds)
+      const graded = { ...question, your_answer: answer, correct_answer: result.correct_answer }
+      const updated = questions.slice()
+      updated[currentQuestion] = graded
+      setQuestions(updated)
+
+      let wrong = wrongQuestions
+      if (result.correct) {
+        setScore(score + 1)
+      } else {
+        wrong = { ...wrongQuestions, [question.id]: graded }
+        setWrongQuestions(wrong)
+      }
+      saveSession(session.current.token, wrong)
+      setShowAnswer(true)
+    } catch (error) {
+      console.error('Error grading answers:', error)
+      setGradeFailed(true)
+      setError(error.message)
+    } finally {
+      setChecking(false)
+    }
   }
 
   const goToNextQuestion = () => {
     setShowAnswer(false)
-    if (currentQuestion + 1 < questions.length) {
+    if (currentQuestion + 1 < total) {
       setCurrentQuestion(currentQuestion + 1)
+      startedAt.current = Date.now()
     } else {
-      navigate('/result', { 
-        state: { 
-          score, 
-          total: questions.length, 
-          wrongQuestions 
-        } 
+      localStorage.removeItem(SAVED_SESSION)
+      navigate('/result', {
+        state: {
+          score,
+          total,
+          wrongQuestions
+        }
       })
     }
   }
@@ -119,7 +230,7 @@ function Quiz() {
 
   if (error) {
     return <div className="error">
-      <p>加载题目失败: {error}</p>
+      <p>{gradeFailed ? '提交答案失败' : '加载题目失败'}: {error}</p>
       <button className="back-button" onClick={() => navigate('/')}>
         返回主菜单
       </button>
@@ -139,7 +250,7 @@ function Quiz() {
   return (
     <div className="quiz">
       <div className="progress">
-        第 {currentQuestion + 1}/{questions.length} 题
+        第 {currentQuestion + 1}/{total} 题
       </div>
       <div className="question">
         {renderMarkdown(question.question)}
@@ -148,7 +259,7 @@ function Quiz() {
         {Object.entries(question.options).map(([key, value]) => (
           <button
             key={key}
-            onClick={() => !showAnswer && handleAnswer(key)}
+            onClick={() => !showAnswer && !checking && handleAnswer(key)}
             className={`option ${
               showAnswer ? 
                 key === question.correct_answer ? 
@@ -156,7 +267,7 @@ function Quiz() {
                   'wrong' 
                 : ''
             }`}
-            disabled={showAnswer}
+            disabled={showAnswer || checking}
           >
             {key}. {renderMarkdown(value)}
           </button>
@@ -186,4 +297,4 @@ function Quiz() {
   )
 }
 
-export default Quiz 
\ No newline at end of file
+export default Quiz
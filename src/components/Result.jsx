@@ -6,7 +6,7 @@ function Result() {
   const navigate = useNavigate()
   const { score, total, wrongQuestions } = location.state || {}
 
-  if (!score) {
+  if (score === undefined) {
     return <div>No result data available</div>
   }
 
@@ -19,9 +19,9 @@ function Result() {
       {Object.keys(wrongQuestions).length > 0 && (
         <div className="wrong-questions">
           <h3>错题回顾：</h3>
-          {Object.entries(wrongQuestions).map(([num, q]) => (
-            <div key={num} className="wrong-question">
-              <p>第{q.chapter}章 第{num}题: {q.question}</p>
+          {Object.entries(wrongQuestions).map(([id, q]) => (
+            <div key={id} className="wrong-question">
+              <p>第{q.chapter}章 第{q.number}题: {q.question}</p>
               <div className="options">
                 {Object.entries(q.options).map(([key, value]) => (
                   <div key={key} className="option">
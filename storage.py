@@ -0,0 +1,623 @@
+"""答题数据存储
+
+进度、错题本和答题历史统一保存在存储后端中，CLI、GUI 和 API 共用同一套接口。
+目前只有 SQLite 后端：
+
+    sessions         每次测验一行，状态为 active（自动保存）、saved（手动保存）或 finished
+    answers          答题历史，每答一题追加一行
+    wrong_questions  错题本，(用户, 题目id) 唯一
+    reviews          错题的间隔复习状态，见 review_scheduler.py
+
+数据库使用 WAL 模式，读者不会阻塞写者；每个线程使用自己的连接，
+写事务以 BEGIN IMMEDIATE 开始并设置忙等待超时，多个进程或线程同时写入时依次排队。
+列出进度、继续测验、按章节查询错题都走索引，不需要扫描目录或读入整个文件。
+旧版的数据文件（进度和错题本 JSON、追加写入的答题日志）由 import_legacy_files 在第一次创建数据库时导入。
+
+用法：
+    storage = open_storage('quiz.db')
+    sid = storage.start_session('local', seed, total)
+    storage.record_answer(sid, qid, 'A', True, 0)
+"""
+import glob
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+from question_store import NUMBER_BITS, id_key, parse_question_key, question_key
+
+DEFAULT_USER = 'local'
+SCHEMA_VERSION = 3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id INTEGER PRIMARY KEY,
+    user TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    chapter INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL,
+    score INTEGER NOT NULL DEFAULT 0,
+    current_question INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'active',
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS sessions_user_updated ON sessions (user, status, updated);
+
+CREATE TABLE IF NOT EXISTS answers (
+    id INTEGER PRIMARY KEY,
+    session_id INTEGER NOT NULL,
+    user TEXT NOT NULL,
+    qid INTEGER NOT NULL,
+    answer TEXT NOT NULL,
+    correct INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    elapsed REAL
+);
+CREATE INDEX IF NOT EXISTS answers_session ON answers (session_id, position);
+CREATE INDEX IF NOT EXISTS answers_user_ts ON answers (user, ts);
+CREATE INDEX IF NOT EXISTS answers_user_qid ON answers (user, qid);
+
+CREATE TABLE IF NOT EXISTS wrong_questions (
+    user TEXT NOT NULL,
+    qid INTEGER NOT NULL,
+    chapter INTEGER NOT NULL,
+    entry TEXT NOT NULL,
+    correct_count INTEGER NOT NULL DEFAULT 0,
+    updated REAL NOT NULL,
+    PRIMARY KEY (user, qid)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS wrong_user_chapter ON wrong_questions (user, chapter);
+
+CREATE TABLE IF NOT EXISTS reviews (
+    user TEXT NOT NULL,
+    qid INTEGER NOT NULL,
+    ease REAL NOT NULL,
+    interval REAL NOT NULL,
+    repetitions INTEGER NOT NULL,
+    lapses INTEGER NOT NULL,
+    due REAL NOT NULL,
+    PRIMARY KEY (user, qid)
+) WITHOUT ROWID;
+"""
+
+# 旧版本数据库升级到新版本时，在建表语句之外还需要执行的语句
+MIGRATIONS = {
+    3: ["ALTER TABLE answers ADD COLUMN elapsed REAL"],
+}
+
+SESSION_COLUMNS = 'id, user, seed, chapter, total, score, current_question, status, created, updated'
+
+# API 的智能练习逐题作答，每个用户只有一条这种状态的测验记录，不出现在可继续的测验列表中
+ADAPTIVE_STATUS = 'adaptive'
+
+
+class Storage(ABC):
+    """存储后端接口，SQLiteStorage 是目前唯一的实现
+
+    题目用题目id表示；错题本返回时以 "章节-题号" 为键，与原来的 wrong_questions.json 一致。
+    """
+
+    # 测验进度
+    @abstractmethod
+    def start_session(self, user, seed, total, chapter=0, score=0, current_question=0):
+        ...
+
+    @abstractmethod
+    def record_answer(self, session_id, qid, answer, correct, position, elapsed=None):
+        ...
+
+    @abstractmethod
+    def record_answers(self, user, seed, answers, total, chapter=0, status='active'):
+        ...
+
+    @abstractmethod
+    def set_session_status(self, session_id, status):
+        ...
+
+    @abstractmethod
+    def get_session(self, session_id):
+        ...
+
+    @abstractmethod
+    def active_session(self, user):
+        ...
+
+    @abstractmethod
+    def list_sessions(self, user, statuses=('active', 'saved'), limit=20):
+        ...
+
+    @abstractmethod
+    def session_answers(self, session_id):
+        ...
+
+    # 错题本
+    @abstractmethod
+    def wrong_questions(self, user, chapter=None):
+        ...
+
+    @abstractmethod
+    def wrong_chapter_counts(self, user):
+        ...
+
+    @abstractmethod
+    def write_wrong_batch(self, updates):
+        ...
+
+    def set_wrong_many(self, user, entries):
+        self.write_wrong_batch({user: entries})
+
+    def set_wrong(self, user, qid, entry):
+        self.set_wrong_many(user, {qid: entry})
+
+    @abstractmethod
+    def remove_wrong(self, user, qid):
+        ...
+
+    @abstractmethod
+    def wrong_question_ids(self, user):
+        ...
+
+    # 间隔复习
+    @abstractmethod
+    def review_states(self, user):
+        ...
+
+    @abstractmethod
+    def save_review(self, user, qid, ease, interval, repetitions, lapses, due):
+        ...
+
+    @abstractmethod
+    def delete_review(self, user, qid):
+        ...
+
+    # 答题历史
+    @abstractmethod
+    def history(self, user, since=None, limit=100):
+        ...
+
+    @abstractmethod
+    def answer_stats(self, user=None):
+        ...
+
+    @abstractmethod
+    def answer_batches(self, after_id=0, size=100000):
+        ...
+
+    def close(self):
+        pass
+
+
+class SQLiteStorage(Storage):
+    def __init__(self, path, timeout=10.0):
+        self.path = str(path)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        # 在写事务中检查版本，多个进程同时打开新数据库时只有一个会建表；
+        # 所有语句都是 IF NOT EXISTS，旧版本的数据库执行一遍即可补上新增的表
+        with self._transaction() as conn:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version > SCHEMA_VERSION:
+                raise ValueError(f"不支持的数据库版本：{self.path}")
+            self.is_new = version == 0
+            if version < SCHEMA_VERSION:
+                # 先对已有的表执行迁移，新建的数据库直接按最新的建表语句创建
+                if version:
+                    for target in range(version + 1, SCHEMA_VERSION + 1):
+                        for statement in MIGRATIONS.get(target, ()):
+                            conn.execute(statement)
+                for statement in SCHEMA.split(';'):
+                    conn.execute(statement)
+                conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None 关闭 sqlite3 模块的隐式事务，由 _transaction 显式控制
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None,
+                                   check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            # WAL 模式下 NORMAL 只在检查点时 fsync，断电最多丢失最近的事务，不会损坏数据库
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        """写事务：一开始就取得写锁，避免先读后写时的升级死锁"""
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute('COMMIT')
+        except BaseException:
+            # COMMIT 失败（如 SQLITE_BUSY）时事务仍然打开，同样要回滚，否则这个连接之后的语句都在旧事务中
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+
+    # 测验进度
+
+    def start_session(self, user, seed, total, chapter=0, score=0, current_question=0):
+        """开始一次测验并返回其id；该用户之前未完成的自动保存转为手动保存，仍可继续"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("UPDATE sessions SET status = 'saved' WHERE user = ? AND status = 'active'",
+                         (user,))
+            cur = conn.execute(
+                "INSERT INTO sessions (user, seed, chapter, total, score, current_question, created, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (user, seed, chapter, total, score, current_question, now, now))
+            return cur.lastrowid
+
+    def resume_session(self, session_id):
+        """把一个已保存的测验重新设为当前测验"""
+        with self._transaction() as conn:
+            row = conn.execute('SELECT user FROM sessions WHERE id = ?', (session_id,)).fetchone()
+            if row is None:
+                raise KeyError(session_id)
+            conn.execute("UPDATE sessions SET status = 'saved' WHERE user = ? AND status = 'active'",
+                         (row['user'],))
+            conn.execute("UPDATE sessions SET status = 'active', updated = ? WHERE id = ?",
+                         (time.time(), session_id))
+
+    def record_answer(self, session_id, qid, answer, correct, position, elapsed=None):
+        """记录一次作答：追加一行历史并更新测验进度，写入量与历史长度无关；elapsed 为作答用时（秒）"""
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute('SELECT user FROM sessions WHERE id = ?', (session_id,)).fetchone()
+            if row is None:
+                raise KeyError(session_id)
+            conn.execute(
+                "INSERT INTO answers (session_id, user, qid, answer, correct, position, ts, elapsed)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (session_id, row['user'], qid, answer, int(correct), position, now, elapsed))
+            conn.execute(
+                "UPDATE sessions SET score = score + ?, current_question = ?, updated = ? WHERE id = ?",
+                (int(correct), position + 1, now, session_id))
+
+    def record_answers(self, user, seed, answers, total, chapter=0, status='active'):
+        """在一个事务中记录一批作答 [(题目id, 答案, 是否答对, 用时)]，返回测验id
+
+        记入该用户种子相同的最近一次测验，没有时开始一次新测验（与 start_session 相同，
+        之前未完成的自动保存转为手动保存）。
+        status 为其他状态（如 ADAPTIVE_STATUS）时按状态而不是种子查找，该用户所有这类作答记入同一次测验，
+        不影响其他测验的状态。
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            if status == 'active':
+                row = conn.execute('SELECT id, current_question FROM sessions WHERE user = ? AND seed = ?'
+                                   ' AND status != ? ORDER BY id DESC LIMIT 1',
+                                   (user, seed, ADAPTIVE_STATUS)).fetchone()
+            else:
+                row = conn.execute('SELECT id, current_question FROM sessions WHERE user = ? AND status = ?'
+                                   ' ORDER BY id DESC LIMIT 1', (user, status)).fetchone()
+            if row is None:
+                if status == 'active':
+                    conn.execute("UPDATE sessions SET status = 'saved' WHERE user = ? AND status = 'active'",
+                                 (user,))
+                session_id = conn.execute(
+                    "INSERT INTO sessions (user, seed, chapter, total, status, created, updated)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)", (user, seed, chapter, total, status, now, now)).lastrowid
+                start = 0
+            else:
+                session_id, start = row['id'], row['current_question']
+            conn.executemany(
+                "INSERT INTO answers (session_id, user, qid, answer, correct, position, ts, elapsed)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(session_id, user, qid, answer, int(correct), start + i, now, elapsed)
+                 for i, (qid, answer, correct, elapsed) in enumerate(answers)])
+            conn.execute(
+                "UPDATE sessions SET score = score + ?, current_question = ?, updated = ? WHERE id = ?",
+                (sum(1 for a in answers if a[2]), start + len(answers), now, session_id))
+            return session_id
+
+    def set_session_status(self, session_id, status):
+        with self._transaction() as conn:
+            conn.execute('UPDATE sessions SET status = ?, updated = ? WHERE id = ?',
+                         (status, time.time(), session_id))
+
+    def get_session(self, session_id):
+        row = self._connection().execute(
+            f'SELECT {SESSION_COLUMNS} FROM sessions WHERE id = ?', (session_id,)).fetchone()
+        return dict(row) if row else None
+
+    def active_session(self, user):
+        """该用户当前未完成的测验（自动保存的进度），没有时返回None"""
+        row = self._connection().execute(
+            f"SELECT {SESSION_COLUMNS} FROM sessions WHERE user = ? AND status = 'active'"
+            " ORDER BY updated DESC LIMIT 1", (user,)).fetchone()
+        return dict(row) if row else None
+
+    def list_sessions(self, user, statuses=('active', 'saved'), limit=20):
+        """该用户的测验，最近更新的在前面"""
+        marks = ', '.join('?' * len(statuses))
+        rows = self._connection().execute(
+            f'SELECT {SESSION_COLUMNS} FROM sessions WHERE user = ? AND status IN ({marks})'
+            ' ORDER BY updated DESC LIMIT ?', (user, *statuses, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def session_answers(self, session_id):
+        """{题目id: 答案}，按作答顺序"""
+        rows = self._connection().execute(
+            'SELECT qid, answer FROM answers WHERE session_id = ? ORDER BY position',
+            (session_id,)).fetchall()
+        return {row['qid']: row['answer'] for row in rows}
+
+    # 错题本
+
+    def wrong_questions(self, user, chapter=None):
+        """{题目键: 错题记录}，可只取某一章"""
+        sql = 'SELECT qid, entry, correct_count FROM wrong_questions WHERE user = ?'
+        params = [user]
+        if chapter is not None:
+            sql += ' AND chapter = ?'
+            params.append(chapter)
+        result = {}
+        for row in self._connection().execute(sql + ' ORDER BY qid', params):
+            entry = json.loads(row['entry'])
+            entry['correct_count'] = row['correct_count']
+            result[id_key(row['qid'])] = entry
+        return result
+
+    def wrong_chapter_counts(self, user):
+        """{章节号: 错题数}"""
+        rows = self._connection().execute(
+            'SELECT chapter, COUNT(*) FROM wrong_questions WHERE user = ? GROUP BY chapter ORDER BY chapter',
+            (user,)).fetchall()
+        return {chapter: count for chapter, count in rows}
+
+    def write_wrong_batch(self, updates):
+        """在一个事务中写入多个用户的错题，updates 为 {用户: {题目id: 错题记录}}，记录为None表示删除"""
+        now = time.time()
+        rows = []
+        deleted = []
+        for user, entries in updates.items():
+            for qid, entry in entries.items():
+                if entry is None:
+                    deleted.append((user, qid))
+                    continue
+                entry = dict(entry)
+                correct_count = entry.pop('correct_count', 0)
+                rows.append((user, qid, qid >> NUMBER_BITS,
+                             json.dumps(entry, ensure_ascii=False), correct_count, now))
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT INTO wrong_questions (user, qid, chapter, entry, correct_count, updated)"
+                " VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (user, qid) DO UPDATE SET"
+                " entry = excluded.entry, correct_count = excluded.correct_count, updated = excluded.updated",
+                rows)
+            conn.executemany('DELETE FROM wrong_questions WHERE user = ? AND qid = ?', deleted)
+
+    def remove_wrong(self, user, qid):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM wrong_questions WHERE user = ? AND qid = ?', (user, qid))
+
+    def wrong_question_ids(self, user):
+        rows = self._connection().execute(
+            'SELECT qid FROM wrong_questions WHERE user = ? ORDER BY qid', (user,)).fetchall()
+        return [row[0] for row in rows]
+
+    # 间隔复习
+
+    def review_states(self, user):
+        """该用户全部复习状态，每项为 (qid, ease, interval, repetitions, lapses, due)"""
+        return self._connection().execute(
+            'SELECT qid, ease, interval, repetitions, lapses, due FROM reviews WHERE user = ?',
+            (user,)).fetchall()
+
+    def save_review(self, user, qid, ease, interval, repetitions, lapses, due):
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO reviews (user, qid, ease, interval, repetitions, lapses, due)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (user, qid, ease, interval, repetitions, lapses, due))
+
+    def delete_review(self, user, qid):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM reviews WHERE user = ? AND qid = ?', (user, qid))
+
+    # 答题历史
+
+    def history(self, user, since=None, limit=100):
+        """该用户最近的作答记录，最新的在前面"""
+        rows = self._connection().execute(
+            'SELECT session_id, qid, answer, correct, position, ts FROM answers'
+            ' WHERE user = ? AND ts >= ? ORDER BY ts DESC LIMIT ?',
+            (user, since or 0, limit)).fetchall()
+        return [dict(row) for row in rows]
+
+    def answer_stats(self, user=None):
+        """逐题汇总作答记录：[(qid, 作答次数, 答错次数, 计时次数, 用时合计)]，user 为None时汇总所有用户"""
+        sql = ('SELECT qid, COUNT(*), SUM(1 - correct), COUNT(elapsed), TOTAL(elapsed) FROM answers'
+               + (' WHERE user = ?' if user is not None else '') + ' GROUP BY qid')
+        return self._connection().execute(sql, () if user is None else (user,)).fetchall()
+
+    def answer_batches(self, after_id=0, size=100000):
+        """按id顺序分批读出 after_id 之后的作答记录，附带所在测验的种子
+
+        每批是 [(id, user, qid, answer, correct, ts, elapsed, seed)]，行为普通元组，
+        大量读取时不构造 sqlite3.Row。
+        """
+        cursor = self._connection().cursor()
+        cursor.row_factory = None
+        cursor.execute(
+            'SELECT a.id, a.user, a.qid, a.answer, a.correct, a.ts, a.elapsed, s.seed'
+            ' FROM answers a JOIN sessions s ON s.id = a.session_id'
+            ' WHERE a.id > ? ORDER BY a.id', (after_id,))
+        while True:
+            rows = cursor.fetchmany(size)
+            if not rows:
+                break
+            yield rows
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+
+def open_storage(location=None):
+    """打开存储后端
+
+    location 为数据库文件路径；未指定时读取环境变量 QUIZ_DB，默认为当前目录下的 quiz.db。
+    """
+    location = location or os.environ.get('QUIZ_DB', 'quiz.db')
+    return SQLiteStorage(location)
+
+
+# 旧版本的数据文件，只在第一次创建数据库时导入
+
+LEGACY_JOURNAL = 'answer_journal.jsonl'
+LEGACY_SNAPSHOT = 'answer_snapshot.json'
+
+
+def read_legacy_journal(directory='.'):
+    """还原旧版追加写入的答题日志中的 (错题本, 未完成的进度)
+
+    先读快照，再重放日志中序号更大的记录；崩溃时写了一半的最后一行直接忽略。
+    """
+    wrong_questions, progress, snapshot_seq = {}, None, 0
+    snapshot_path = os.path.join(directory, LEGACY_SNAPSHOT)
+    if os.path.exists(snapshot_path):
+        with open(snapshot_path, 'r', encoding='utf-8') as f:
+            snapshot = json.load(f)
+        wrong_questions, progress, snapshot_seq = snapshot['wrong_questions'], snapshot['progress'], snapshot['seq']
+    journal_path = os.path.join(directory, LEGACY_JOURNAL)
+    if os.path.exists(journal_path):
+        with open(journal_path, 'rb') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError
+                    record = json.loads(line)
+                except ValueError:
+                    break
+                if record['seq'] <= snapshot_seq:
+                    continue
+                op = record['op']
+                if op == 'start':
+                    progress = {key: record.get(key, 0) for key in ('total', 'score', 'current_question')}
+                    if 'seed' in record:
+                        progress['seed'] = record['seed']
+                elif op == 'answer' and progress is not None:
+                    progress['score'] += record['correct']
+                    progress['current_question'] = record['position'] + 1
+                elif op == 'finish':
+                    progress = None
+                elif op == 'wrong_set':
+                    wrong_questions[record['key']] = record['entry']
+                elif op == 'wrong_del':
+                    wrong_questions.pop(record['key'], None)
+    return wrong_questions, progress
+
+
+def migrate_wrong_keys(wrong_questions):
+    """把旧版以题号为键的错题转换成以"章节-题号"为键，返回缺少章节信息而丢弃的键
+
+    旧版的键只有题号，而题号在每章都从1开始，不同章节的题目会互相覆盖。
+    每条错题记录里都保存了章节号，可以据此还原出唯一的键。
+    """
+    dropped = []
+    for key in list(wrong_questions):
+        if '-' in key:
+            continue
+        entry = wrong_questions.pop(key)
+        if not key.isdigit() or not isinstance(entry, dict) or 'chapter' not in entry:
+            dropped.append(key)
+            continue
+        entry.setdefault('number', int(key))
+        wrong_questions[question_key(entry['chapter'], int(key))] = entry
+    return dropped
+
+
+def import_legacy_session(storage, user, progress, status='active'):
+    """导入一份旧版进度，返回测验id
+
+    旧版的进度文件和自动保存没有种子，current_question 是未洗牌的完整题库中的下标，
+    在按种子洗牌的顺序中继续会跳过随机的若干道题，所以只作为已结束的记录保留；
+    答题日志中带种子的进度照常可以继续。
+    """
+    seed = progress.get('seed')
+    session_id = storage.start_session(user, 0 if seed is None else int(seed), int(progress['total']),
+                                       score=int(progress['score']),
+                                       current_question=int(progress['current_question']))
+    if seed is None:
+        status = 'finished'
+    if status != 'active':
+        storage.set_session_status(session_id, status)
+    return session_id
+
+
+def _read_json(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def import_legacy_files(storage, user, directory='.'):
+    """导入旧版的进度文件、答题日志、自动保存和错题本，返回警告信息列表
+
+    无法解析的文件和记录跳过并给出警告，不影响其余内容的导入。
+    """
+    warnings = []
+    # 旧版手动保存的进度文件，文件名中带有保存时间
+    for filename in sorted(glob.glob(os.path.join(directory, 'quiz_progress_*.json'))):
+        try:
+            import_legacy_session(storage, user, _read_json(filename), 'saved')
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            warnings.append(f"无法导入进度文件 {filename}")
+
+    # 答题日志中已经包含了更早导入的 auto_save.json 和 wrong_questions.json
+    wrong_questions, auto_save = {}, None
+    if any(os.path.exists(os.path.join(directory, name)) for name in (LEGACY_JOURNAL, LEGACY_SNAPSHOT)):
+        try:
+            wrong_questions, auto_save = read_legacy_journal(directory)
+        except (OSError, ValueError, KeyError, TypeError):
+            warnings.append(f"无法读取答题日志 {os.path.join(directory, LEGACY_JOURNAL)}")
+    else:
+        path = os.path.join(directory, 'wrong_questions.json')
+        if os.path.exists(path):
+            try:
+                wrong_questions = _read_json(path)
+                if not isinstance(wrong_questions, dict):
+                    raise ValueError(path)
+            except (OSError, ValueError):
+                wrong_questions = {}
+                warnings.append(f"无法导入错题本 {path}")
+            for key in migrate_wrong_keys(wrong_questions):
+                warnings.append(f"错题 {key} 缺少章节信息，已丢弃")
+        path = os.path.join(directory, 'auto_save.json')
+        if os.path.exists(path):
+            try:
+                auto_save = _read_json(path)
+            except (OSError, ValueError):
+                warnings.append(f"无法导入自动保存 {path}")
+
+    entries = {}
+    for key, entry in wrong_questions.items():
+        try:
+            if not isinstance(entry, dict):
+                raise ValueError(key)
+            entries[parse_question_key(key)] = entry
+        except (ValueError, AttributeError):
+            warnings.append(f"错题 {key} 无法识别，已丢弃")
+    storage.set_wrong_many(user, entries)
+    if auto_save:
+        try:
+            import_legacy_session(storage, user, auto_save)
+        except (ValueError, KeyError, TypeError, AttributeError):
+            warnings.append("无法导入自动保存的进度")
+    return warnings
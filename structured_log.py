@@ -0,0 +1,179 @@
+"""结构化日志
+
+服务端日志统一经过标准库 logging 的 "quiz" 记录器，每条日志输出为一行 JSON：
+    {"ts": 时间戳, "level": 级别, "logger": 名称, "msg": 事件, "request_id": 请求编号, ...字段}
+
+请求编号：RequestLogMiddleware 为每个请求分配编号（客户端带 X-Request-ID 时沿用），
+保存在 contextvars 中，请求期间的所有日志都带上它，并在响应头中返回。
+
+采样：INFO 及以下的日志按请求采样，同一个请求的日志要么全部输出要么全部不输出；
+WARNING 及以上总是输出。请求之外（启动、后台任务）的日志不采样。
+
+环境变量：
+    QUIZ_LOG_LEVEL   日志级别，默认 INFO
+    QUIZ_LOG_SAMPLE  请求日志的采样比例（0-1），默认 0.1
+    QUIZ_DEBUG       设为 1 时打开调试模式：级别为 DEBUG、全部采样，并输出逐题的解析过程
+
+用法：
+    log = get_logger(__name__)
+    log.info('bank loaded', path=str(path), questions=len(questions))
+"""
+import contextvars
+import json
+import logging
+import os
+import re
+import sys
+import time
+import zlib
+
+ROOT = 'quiz'
+DEFAULT_SAMPLE = 0.1
+
+_request_id = contextvars.ContextVar('request_id', default=None)
+_sampled = contextvars.ContextVar('sampled', default=True)
+_VALID_ID = re.compile(r'[A-Za-z0-9._-]{1,64}')
+_RESERVED = frozenset(('exc_info', 'stack_info', 'stacklevel', 'extra'))
+
+_sample_rate = DEFAULT_SAMPLE
+
+
+def debug_enabled():
+    return os.environ.get('QUIZ_DEBUG', '') not in ('', '0')
+
+
+def request_id():
+    """当前请求的编号，请求之外为None"""
+    return _request_id.get()
+
+
+def begin_request(rid=None):
+    """进入一个请求：设置请求编号并决定是否采样，返回 (编号, 用于恢复的令牌)
+
+    是否采样由编号的哈希决定，同一个编号在各个进程中的结果一致。
+    """
+    if rid is None or not _VALID_ID.fullmatch(rid):
+        rid = os.urandom(8).hex()
+    sampled = _sample_rate >= 1 or zlib.crc32(rid.encode('ascii')) < _sample_rate * 2 ** 32
+    return rid, (_request_id.set(rid), _sampled.set(sampled))
+
+
+def end_request(tokens):
+    id_token, sampled_token = tokens
+    _request_id.reset(id_token)
+    _sampled.reset(sampled_token)
+
+
+class SampleFilter(logging.Filter):
+    """未被采样的请求只丢弃 INFO 及以下的日志"""
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or _sampled.get()
+
+
+class JsonFormatter(logging.Formatter):
+    """每条日志格式化为一行 JSON"""
+
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        rid = getattr(record, 'request_id', None)
+        if rid is not None:
+            entry['request_id'] = rid
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class StructuredLogger(logging.LoggerAdapter):
+    """关键字参数作为结构化字段：log.info('event', key=value)"""
+
+    def isEnabledFor(self, level):
+        # 未被采样的请求在生成日志记录之前就跳过
+        if level < logging.WARNING and not _sampled.get():
+            return False
+        return self.logger.isEnabledFor(level)
+
+    def process(self, msg, kwargs):
+        fields = {k: kwargs.pop(k) for k in list(kwargs) if k not in _RESERVED}
+        extra = dict(kwargs.get('extra') or (), fields=fields, request_id=_request_id.get())
+        kwargs['extra'] = extra
+        return msg, kwargs
+
+
+def get_logger(name):
+    """返回 "quiz" 之下的结构化记录器，如 get_logger('api') 对应 quiz.api"""
+    return StructuredLogger(logging.getLogger(f'{ROOT}.{name}'), {})
+
+
+def configure(level=None, sample=None, stream=None):
+    """配置 "quiz" 记录器：JSON 格式输出到 stream（默认标准输出）
+
+    未指定的参数从环境变量读取。重复调用会替换之前的输出，不会重复输出。
+    """
+    global _sample_rate
+    debug = debug_enabled()
+    if level is None:
+        level = 'DEBUG' if debug else os.environ.get('QUIZ_LOG_LEVEL', 'INFO')
+    if sample is None:
+        try:
+            sample = 1.0 if debug else float(os.environ.get('QUIZ_LOG_SAMPLE', DEFAULT_SAMPLE))
+        except ValueError:
+            sample = DEFAULT_SAMPLE
+    _sample_rate = min(max(sample, 0.0), 1.0)
+
+    logger = logging.getLogger(ROOT)
+    logger.setLevel(level.upper() if isinstance(level, str) else level)
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    handler = logging.StreamHandler(stream or sys.stdout)
+    handler.setFormatter(JsonFormatter())
+    handler.addFilter(SampleFilter())
+    logger.addHandler(handler)
+    return logger
+
+
+class RequestLogMiddleware:
+    """ASGI 中间件：为每个 HTTP 请求分配编号，结束时记录一条访问日志"""
+
+    def __init__(self, app, logger=None):
+        self.app = app
+        self.log = logger or get_logger('request')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        header = None
+        for name, value in scope.get('headers', ()):
+            if name == b'x-request-id':
+                header = value.decode('latin-1')
+                break
+        rid, tokens = begin_request(header)
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_id(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                message = dict(message, headers=[*message.get('headers', ()),
+                                                 (b'x-request-id', rid.encode('ascii'))])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        except Exception:
+            self.log.exception('request failed', method=scope.get('method'), path=scope.get('path'))
+            raise
+        finally:
+            if self.log.isEnabledFor(logging.INFO):
+                self.log.info('request', method=scope.get('method'), path=scope.get('path'), status=status,
+                              ms=round((time.perf_counter() - start) * 1000, 2))
+            end_request(tokens)
@@ -0,0 +1,46 @@
+import random
+
+from adaptive_selector import AdaptiveSelector
+from question_store import Question, QuestionStore
+from storage import ADAPTIVE_STATUS, open_storage
+
+
+def store(chapters=2, per_chapter=5):
+    return QuestionStore([Question(c, n, f'第{c}章第{n}题', ('甲', '乙', '丙', '丁'), 0)
+                          for c in range(1, chapters + 1) for n in range(1, per_chapter + 1)])
+
+
+def test_user_models_are_bounded_and_rebuilt_from_storage(tmp_path):
+    questions = store()
+    storage = open_storage(tmp_path / 'quiz.db')
+    selector = AdaptiveSelector(questions, storage, max_users=2)
+    first = selector.user('a')
+    selector.user('b')
+    selector.user('a')
+    selector.user('c')
+    # 最久未使用的 b 被淘汰
+    assert list(selector._users) == ['a', 'c']
+    assert selector.user('a') is first
+
+    # 不在内存中的用户作答时不建立模型，重建时从存储读出这次作答
+    qid = questions[0].id
+    storage.record_answers('b', 1, [(qid, 'B', False, 3.0)], len(questions), status=ADAPTIVE_STATUS)
+    selector.record('b', qid, False, 3.0)
+    assert 'b' not in selector._users
+    assert selector.user('b').attempts[0] == 1
+    assert len(selector._users) == 2
+
+
+def test_adaptive_answers_share_one_session(tmp_path):
+    questions = store()
+    storage = open_storage(tmp_path / 'quiz.db')
+    normal = storage.record_answers('a', 7, [(questions[0].id, 'A', True, None)], len(questions))
+    for seed, q in zip((11, 12, 13), questions[1:4]):
+        storage.record_answers('a', seed, [(q.id, 'A', True, None)], len(questions), status=ADAPTIVE_STATUS)
+
+    [adaptive] = storage.list_sessions('a', statuses=(ADAPTIVE_STATUS,))
+    assert (adaptive['current_question'], adaptive['score']) == (3, 3)
+    # 智能练习不影响当前测验，也不出现在可继续的列表中
+    assert [s['id'] for s in storage.list_sessions('a')] == [normal]
+    assert storage.active_session('a')['id'] == normal
+    assert AdaptiveSelector(questions, storage).pick('a', random.Random(1)) is not None
@@ -0,0 +1,186 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import quiz_app
+import session_token
+from question_store import question_id
+from shuffle_service import option_permutation, shuffled_letter
+from storage import ADAPTIVE_STATUS
+
+# 第 n 题的答案是第 n 个选项
+BANK = [
+    '**第一章 绪论**',
+    '1.  题目：梅花属于（ ）。',
+    '    *   A、蔷薇科', '    *   B、木兰科', '    *   C、豆科', '    *   D、菊科',
+    '    答案：A',
+    '2.  题目：睡莲属于（ ）。',
+    '    *   A、浮叶植物', '    *   B、浮水植物', '    *   C、挺水植物', '    *   D、沉水植物',
+    '    答案：B',
+    '3.  题目：银杏是（ ）。',
+    '    *   A、常绿乔木', '    *   B、灌木', '    *   C、落叶乔木', '    *   D、藤本',
+    '    答案：C',
+    '4.  题目：草坪草中属于暖季型的是（ ）。',
+    '    *   A、早熟禾', '    *   B、黑麦草', '    *   C、高羊茅', '    *   D、狗牙根',
+    '    答案：D',
+]
+SEED = 20240601
+
+
+def make_app(tmp_path, monkeypatch, content, warmup=False, shared=False):
+    bank = tmp_path / 'quiz.md'
+    bank.write_bytes(content)
+    monkeypatch.setattr(session_token, '_key', b'test-key')
+    # create_app 和各接口共用模块级的题库、数据库和写入器，测试结束后还原
+    for name in ('bank_cache', 'DB_PATH', '_storage', '_wrong_writer', '_scheduler', '_selector'):
+        monkeypatch.setattr(quiz_app, name, getattr(quiz_app, name))
+    for name in ('_storage', '_wrong_writer', '_scheduler', '_selector'):
+        monkeypatch.setattr(quiz_app, name, None)
+    return quiz_app.create_app(bank_path=bank, db_path=tmp_path / 'quiz.db', warmup=warmup, shared=shared)
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    app = make_app(tmp_path, monkeypatch, ('\n'.join(BANK) + '\n').encode('utf-8'))
+    with TestClient(app) as client:
+        yield client
+
+
+def shown(qid, index):
+    """原选项下标 index 在本会话中显示的字母"""
+    return shuffled_letter(option_permutation(SEED, qid), index)
+
+
+def test_grade_against_seed(client):
+    right, wrong = question_id(1, 1), question_id(1, 2)
+    response = client.post('/api/grade', json={'seed': SEED, 'chapter': 1, 'answers': [
+        {'id': right, 'answer': shown(right, 0), 'seconds': 3},
+        {'id': wrong, 'answer': shown(wrong, 0), 'seconds': 5},
+        {'id': question_id(1, 99), 'answer': 'A'},
+    ]}).json()
+    assert response['graded'] == 2
+    assert response['score'] == 1
+    assert [(r['id'], r['correct'], r['correct_answer']) for r in response['results'][:2]] == [
+        (right, True, shown(right, 0)),
+        (wrong, False, shown(wrong, 1)),
+    ]
+    assert response['results'][2]['correct'] is None
+
+    # 作答记在服务端分配给这个客户端的用户名下
+    user = response['user']
+    assert user.startswith('u-')
+    storage = quiz_app.get_storage()
+    [session] = storage.list_sessions(user)
+    assert (session['seed'], session['chapter'], session['total'], session['score']) == (SEED, 1, 4, 1)
+    assert client.get('/api/wrong-questions').json()['count'] == 1
+
+
+def test_grade_with_token_carries_wrong_answers(client):
+    shuffle = client.get('/api/shuffle', params={'chapter': 1, 'seed': SEED}).json()
+    first = shuffle['order'][0]
+    # 第一题故意答错
+    wrong_letter = next(key for key in 'ABCD' if key != shown(first, first - question_id(1, 1)))
+    response = client.post('/api/grade', json={'token': shuffle['token'], 'answers': [
+        {'id': first, 'answer': wrong_letter},
+    ]}).json()
+    assert response['position'] == 1
+    assert response['results'][0]['correct'] is False
+
+    resumed = client.get('/api/session/resume', params={'token': response['token']}).json()
+    assert resumed['position'] == 1
+    assert resumed['score'] == 0
+    assert resumed['wrong'] == [{'id': first, 'correct_answer': response['results'][0]['correct_answer']}]
+
+
+def test_grade_rejects_foreign_seed(client):
+    shuffle = client.get('/api/shuffle', params={'seed': SEED}).json()
+    response = client.post('/api/grade', json={'token': shuffle['token'], 'answers': [
+        {'id': shuffle['order'][0], 'answer': 'A', 'seed': SEED + 1},
+    ]}).json()
+    assert response == {'error': 'Answers do not belong to the session token'}
+
+
+@pytest.mark.parametrize('path', [
+    '/api/questions', '/api/questions/1', '/api/shuffle', '/api/review/due', '/api/adaptive/next',
+])
+@pytest.mark.parametrize('seed', [-1, 1 << 32])
+def test_seed_out_of_range_is_rejected(client, path, seed):
+    response = client.get(path, params={'seed': seed})
+    assert response.status_code == 400
+    assert 'Invalid seed' in response.json()['error']
+
+
+def test_largest_seed_is_accepted(client):
+    shuffle = client.get('/api/shuffle', params={'seed': (1 << 32) - 1}).json()
+    resumed = client.get('/api/session/resume', params={'token': shuffle['token']}).json()
+    assert resumed['seed'] == shuffle['seed'] == (1 << 32) - 1
+    assert resumed['order'] == shuffle['order']
+
+
+def test_answered_position_cannot_be_resubmitted(client):
+    shuffle = client.get('/api/shuffle', params={'chapter': 1, 'seed': SEED}).json()
+    first = shuffle['order'][0]
+    right = shown(first, first - question_id(1, 1))
+    wrong_letter = next(key for key in 'ABCD' if key != right)
+    graded = client.post('/api/grade', json={'token': shuffle['token'], 'answers': [
+        {'id': first, 'answer': wrong_letter},
+    ]}).json()
+    user = graded['user']
+
+    # 看到正确答案后带着新口令重新提交
+    retry = client.post('/api/grade', json={'token': graded['token'], 'answers': [
+        {'id': first, 'answer': graded['results'][0]['correct_answer']},
+    ]})
+    assert retry.status_code == 409
+    # 同一批中重复的题目也不接受
+    twice = client.post('/api/grade', json={'token': shuffle['token'], 'answers': [
+        {'id': first, 'answer': wrong_letter}, {'id': first, 'answer': right},
+    ]})
+    assert twice.status_code == 409
+
+    resumed = client.get('/api/session/resume', params={'token': graded['token']}).json()
+    assert resumed['score'] == 0
+    assert [entry['id'] for entry in resumed['wrong']] == [first]
+    assert len(quiz_app.get_storage().history(user)) == 1
+
+
+def test_unreadable_bank_starts_with_empty_bank(tmp_path, monkeypatch):
+    # GBK 编码的题库按 UTF-8 解析失败，应用仍然启动，各接口按空题库应答
+    app = make_app(tmp_path, monkeypatch, '\n'.join(BANK).encode('gbk'), warmup=True)
+    with TestClient(app) as client:
+        assert client.get('/api/questions').json() == {'error': 'Failed to load questions'}
+        assert client.get('/api/shuffle').json() == {'error': 'Failed to load questions'}
+
+
+def test_adaptive_answers_are_recorded_in_one_session(client):
+    for _ in range(3):
+        picked = client.get('/api/adaptive/next').json()
+        q = picked['question']
+        assert client.post('/api/adaptive/answer', json={
+            'id': q['id'], 'seed': picked['seed'], 'answer': 'A', 'seconds': 2,
+        }).json() == {'status': 'success'}
+    user = session_token.verify_user(client.cookies[quiz_app.USER_COOKIE])
+    storage = quiz_app.get_storage()
+    [session] = storage.list_sessions(user, statuses=(ADAPTIVE_STATUS,))
+    assert session['current_question'] == 3
+    assert len(storage.history(user)) == 3
+
+
+def test_session_pages_follow_cursor(client):
+    first = client.get('/api/session/start', params={'chapter': 1, 'limit': 3}).json()
+    assert (first['chapter'], first['total'], first['offset']) == (1, 4, 0)
+    assert 'correct_answer' not in first['questions'][0]
+    assert first['next_cursor'] == quiz_app.encode_cursor(first['seed'], 1, 3)
+
+    rest = client.get('/api/session/page', params={'cursor': first['next_cursor']}).json()
+    assert (rest['offset'], rest['next_cursor']) == (3, None)
+    # 各页按同一种子重新生成，合起来是整章的一个排列
+    ids = [q['id'] for q in first['questions'] + rest['questions']]
+    assert sorted(ids) == [question_id(1, n) for n in range(1, 5)]
+    resumed = client.get('/api/session/resume', params={'token': first['token']}).json()
+    assert resumed['order'] == ids
+
+
+@pytest.mark.parametrize('cursor', ['', 'x-1-0', '1-1', f'{1 << 32:x}-0-0'])
+def test_invalid_cursor_is_rejected(client, cursor):
+    assert client.get('/api/session/page', params={'cursor': cursor}).json() == {
+        'error': f'Invalid cursor: {cursor}'}
@@ -0,0 +1,82 @@
+import json
+
+import bank_lint
+from bank_lint import find_clusters, lint, minhash, shingles
+
+
+def question(number, stem, options, answer, chapter=1):
+    return {
+        'chapter': chapter, 'number': str(number), 'question': stem,
+        'options': dict(zip('ABCD', options)), 'correct_answer': answer,
+        'source': 'quiz.md', 'line': number,
+    }
+
+
+PLUM = ['蔷薇科', '木兰科', '豆科', '菊科']
+
+
+def write_bank(path, *questions):
+    lines = ['**第一章 绪论**']
+    for number, stem, options, answer in questions:
+        lines.append(f'{number}.  题目：{stem}')
+        lines += [f'    *   {key}、{text}' for key, text in zip('ABCD', options)]
+        lines.append(f'    答案：{answer}')
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+
+
+def test_same_set_gives_same_signature():
+    assert minhash(shingles('梅花属于哪一科')) == minhash(shingles('梅花属于哪一科'))
+    assert minhash(shingles('梅花属于哪一科')) != minhash(shingles('睡莲属于哪一类植物'))
+
+
+def test_near_duplicates_with_reordered_options():
+    questions = [
+        question(1, '梅花属于下列哪一个科的植物（ ）。', PLUM, 'A'),
+        question(2, '梅花属于下列哪一个科的植物？', [PLUM[1], PLUM[0], PLUM[3], PLUM[2]], 'B'),
+        question(3, '睡莲属于（ ）。', ['浮叶植物', '浮水植物', '挺水植物', '沉水植物'], 'A'),
+    ]
+    assert [indices for indices, _ in find_clusters(questions)] == [[0, 1]]
+    [cluster] = lint(questions)['clusters']
+    assert cluster['kind'] == 'duplicate' and not cluster['polarity']
+
+
+def test_shared_stem_with_different_options_is_not_a_duplicate():
+    questions = [
+        question(1, '下列描述梅花的诗句是（ ）。', ['疏影横斜水清浅', '采菊东篱下', '接天莲叶无穷碧', '竹外桃花三两枝'], 'A'),
+        question(2, '下列描述梅花的诗句是（ ）。', ['暗香浮动月黄昏', '人闲桂花落', '小荷才露尖尖角', '春色满园关不住'], 'A'),
+    ]
+    assert find_clusters(questions) == []
+
+
+def test_conflicting_answers_and_polarity():
+    questions = [
+        question(1, '梅花属于下列哪一个科的植物（ ）。', PLUM, 'A'),
+        question(2, '梅花属于下列哪一个科的植物（ ）。', PLUM, 'B'),
+    ]
+    [cluster] = lint(questions)['clusters']
+    assert cluster['kind'] == 'conflict' and not cluster['polarity']
+
+    # 只差一个否定字的反义题：答案不同，但标记为 polarity
+    questions = [
+        question(1, '在园林树木分类中，梅花属于下列哪一个科的植物（ ）。', PLUM, 'A'),
+        question(2, '在园林树木分类中，梅花不属于下列哪一个科的植物（ ）。', PLUM, 'B'),
+    ]
+    assert lint(questions)['clusters'] == []
+    report = lint(questions, threshold=0.7)
+    [cluster] = report['clusters']
+    assert cluster['kind'] == 'conflict' and cluster['polarity']
+    assert report['summary'] == {'clusters': 1, 'conflicts': 1, 'duplicates': 0, 'polarity': 1}
+
+
+def test_exit_code_and_json_report(tmp_path, capsys):
+    conflict = tmp_path / 'conflict.md'
+    write_bank(conflict, (1, '梅花属于下列哪一个科的植物（ ）。', PLUM, 'A'),
+               (2, '梅花属于下列哪一个科的植物？', [PLUM[1], PLUM[0], PLUM[3], PLUM[2]], 'A'))
+    assert bank_lint.main([str(conflict), '--json', '-']) == 1
+    report = json.loads(capsys.readouterr().out)
+    assert [q['line'] for q in report['clusters'][0]['questions']] == [2, 8]
+
+    clean = tmp_path / 'clean.md'
+    write_bank(clean, (1, '梅花属于下列哪一个科的植物（ ）。', PLUM, 'A'))
+    assert bank_lint.main([str(clean), '--json', str(tmp_path / 'report.json')]) == 0
+    assert json.loads((tmp_path / 'report.json').read_text(encoding='utf-8'))['clusters'] == []
@@ -0,0 +1,87 @@
+import gzip
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from bank_payloads import IMMUTABLE, REVALIDATE, BankPayloads, Payload, accepted_encodings
+from question_store import Question, QuestionStore
+from test_api import BANK, make_app
+
+QUESTIONS = QuestionStore([
+    Question(chapter, number, f'第{chapter}章第{number}题：下列植物中属于蔷薇科的是（ ）。',
+             ('梅花', '玉兰', '合欢', '菊花'), 0)
+    for chapter in (1, 2) for number in range(1, 6)
+], {1: '绪论', 2: '乔木'})
+
+
+def test_accepted_encodings():
+    assert accepted_encodings('gzip, deflate') == {'gzip', 'deflate'}
+    assert accepted_encodings('gzip;q=0, br') == {'br'}
+    assert 'gzip' in accepted_encodings('*')
+    assert accepted_encodings(None) == set()
+
+
+def test_payload_is_compressed_with_strong_etag():
+    payload = Payload({'questions': [q.to_dict(reveal=False) for q in QUESTIONS]})
+    data, etag, encoding = payload.select('gzip')
+    assert encoding == 'gzip'
+    assert gzip.decompress(data) == payload.body
+    assert etag == f'"{payload.version}-gzip"' != payload.etag
+    assert 'correct_answer' not in json.loads(payload.body)['questions'][0]
+
+    # 没有接受的压缩方式时返回原文
+    assert payload.select('identity') == (payload.body, payload.etag, None)
+    # 同样的内容总是得到同样的版本和压缩字节
+    assert Payload(json.loads(payload.body)).variants == payload.variants
+
+
+def test_payload_serve():
+    payload = Payload({'questions': [q.to_dict(reveal=False) for q in QUESTIONS]})
+    status, body, headers = payload.serve(accept_encoding='gzip', version=payload.version)
+    assert (status, headers['Content-Encoding'], headers['Cache-Control']) == (200, 'gzip', IMMUTABLE)
+    assert headers['Vary'] == 'Accept-Encoding'
+
+    # 任一压缩版本的 ETag（包括弱校验形式）都算命中
+    for tag in (payload.etag, headers['ETag'], f'W/{payload.etag}', '"other", ' + payload.etag, '*'):
+        assert payload.serve(if_none_match=tag)[:2] == (304, b'')
+    status, _, headers = payload.serve(if_none_match='"other"', version='old')
+    assert status == 200 and headers['Cache-Control'] == REVALIDATE
+
+
+def test_manifest_lists_chapter_versions():
+    payloads = BankPayloads(QUESTIONS)
+    manifest = json.loads(payloads.manifest.body)
+    assert manifest['version'] == payloads.version == payloads.all.version
+    assert [(c['chapter'], c['title'], c['count']) for c in manifest['chapters']] == [(1, '绪论', 5), (2, '乔木', 5)]
+    assert manifest['chapters'][1]['url'] == f'/api/bank/2?v={payloads.get(2).version}'
+    assert payloads.get(3) is None
+
+    # 只改动一章时另一章的版本不变
+    changed = QuestionStore(list(QUESTIONS[:5]) + [Question(2, 1, '新题', ('甲', '乙', '丙', '丁'), 1)],
+                            QUESTIONS.chapter_titles)
+    other = BankPayloads(changed)
+    assert other.get(1).version == payloads.get(1).version
+    assert other.get(2).version != payloads.get(2).version
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    app = make_app(tmp_path, monkeypatch, ('\n'.join(BANK) + '\n').encode('utf-8'))
+    with TestClient(app) as client:
+        yield client
+
+
+def test_bank_endpoints_revalidate(client):
+    manifest = client.get('/api/bank').json()
+    [chapter] = manifest['chapters']
+    response = client.get(chapter['url'], headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['content-encoding'] == 'gzip'
+    assert response.headers['cache-control'] == IMMUTABLE
+    assert [q['number'] for q in response.json()['questions']] == [1, 2, 3, 4]
+
+    again = client.get('/api/bank/1', headers={'If-None-Match': response.headers['etag']})
+    assert again.status_code == 304 and again.content == b''
+    assert client.get('/api/bank/all', params={'v': 'old'}).headers['cache-control'] == REVALIDATE
+    assert client.get('/api/bank/9').json() == {'error': 'No questions found for chapter 9'}
@@ -0,0 +1,34 @@
+import json
+
+from benchmarks import suite
+from benchmarks.common import percentile
+
+
+def results(**values):
+    r = suite.Results()
+    for name, (value, better) in values.items():
+        r.add(name, value, 'ms' if better == 'lower' else 'req/s', better)
+    return {'meta': {'commit': 'abc', 'time': 'now'}, 'metrics': r.metrics}
+
+
+def test_percentile():
+    assert percentile([3, 1, 2, 4], 0.5) == 3
+    assert percentile(range(100), 0.99) == 99
+    assert percentile([5], 0.99) == 5
+
+
+def test_compare_flags_regressions_by_direction(capsys):
+    baseline = results(latency=(10, 'lower'), throughput=(100, 'higher'), gone=(1, 'lower'))
+    current = results(latency=(11, 'lower'), throughput=(70, 'higher'), new=(1, 'lower'))
+    # 延迟变差 10% 在阈值内，吞吐量下降 30% 算回退；基准中没有的指标不比较
+    assert suite.compare(baseline, current, 0.2) == ['throughput']
+    assert suite.compare(baseline, results(latency=(13, 'lower')), 0.2) == ['latency']
+    assert '1 项指标本次没有测量' in capsys.readouterr().out
+
+
+def test_main_compares_saved_results(tmp_path):
+    baseline, current = tmp_path / 'baseline.json', tmp_path / 'current.json'
+    baseline.write_text(json.dumps(results(latency=(10, 'lower'))), encoding='utf-8')
+    current.write_text(json.dumps(results(latency=(9, 'lower'))), encoding='utf-8')
+    assert suite.main(['--input', str(current), '--compare', str(baseline)]) == 0
+    assert suite.main(['--input', str(baseline), '--compare', str(current), '--threshold', '0.05']) == 1
@@ -0,0 +1,61 @@
+from quiz_parser import QuestionParser
+
+
+def bank(*questions):
+    lines = ['**第一章 绪论**']
+    for number, stem, options, answer in questions:
+        lines.append(f'{number}.  题目：{stem}')
+        lines += [f'    *   {key}、{text}' for key, text in zip('ABCD', options)]
+        lines.append(f'    答案：{answer}')
+    return lines
+
+
+def parse(*questions):
+    parser = QuestionParser()
+    return parser.parse_bank(bank(*questions)), parser
+
+
+def kinds(parser):
+    return [d.kind for d in parser.diagnostics]
+
+
+def test_same_stem_different_options_are_kept():
+    questions, parser = parse(
+        (1, '下列植物中属于浮水植物的是（ ）。', ['荷花', '睡莲', '菖蒲', '芦苇'], 'B'),
+        (2, '下列植物中属于浮水植物的是（ ）。', ['凤眼莲', '香蒲', '千屈菜', '水葱'], 'A'),
+    )
+    assert [q['number'] for q in questions] == ['1', '2']
+    assert kinds(parser) == []
+
+
+def test_duplicate_with_reordered_options_is_dropped():
+    questions, parser = parse(
+        (1, '梅花属于（ ）。', ['蔷薇科', '木兰科', '豆科', '菊科'], 'A'),
+        (2, '梅花属于（ ）。', ['木兰科', '蔷薇科', '菊科', '豆科'], 'B'),
+    )
+    assert [q['number'] for q in questions] == ['1']
+    assert kinds(parser) == ['duplicate']
+
+
+def test_options_compared_after_normalization():
+    questions, parser = parse(
+        (1, '梅花属于（ ）。', ['蔷薇科', '木兰科', '豆科', '菊科'], 'A'),
+        (2, '梅花属于（ ）。', ['蔷薇科。', 'Ｍ木兰科', '豆 科', '菊科'], 'A'),
+    )
+    assert len(questions) == 2
+    questions, parser = parse(
+        (1, '梅花属于（ ）。', ['蔷薇科', '木兰科', '豆科', '菊科'], 'A'),
+        (2, '梅花属于（ ）。', ['蔷薇科。', '木兰科', '豆 科', '菊科'], 'A'),
+    )
+    assert len(questions) == 1
+    assert kinds(parser) == ['duplicate']
+
+
+def test_conflicting_answer_is_reported():
+    questions, parser = parse(
+        (1, '梅花属于（ ）。', ['蔷薇科', '木兰科', '豆科', '菊科'], 'A'),
+        (2, '梅花属于（ ）。', ['蔷薇科', '木兰科', '豆科', '菊科'], 'C'),
+    )
+    assert [q['number'] for q in questions] == ['1']
+    assert kinds(parser) == ['conflict']
+    assert parser.diagnostics[0].line == 8
@@ -0,0 +1,50 @@
+from question_store import question_id
+from review_scheduler import DAY, ReviewScheduler
+from storage import open_storage
+
+Q1, Q2, Q3 = question_id(1, 1), question_id(1, 2), question_id(2, 1)
+NOW = 1_700_000_000.0
+
+
+def scheduler(tmp_path, **kwargs):
+    storage = open_storage(tmp_path / 'quiz.db')
+    storage.set_wrong_many('a', {qid: {'your_answer': 'A'} for qid in (Q1, Q2, Q3)})
+    return storage, ReviewScheduler(storage, **kwargs)
+
+
+def test_intervals_follow_sm2(tmp_path):
+    _, reviews = scheduler(tmp_path)
+    intervals = [reviews.record('a', Q1, True, now=NOW).interval for _ in range(4)]
+    assert intervals[:2] == [1.0, 6.0]
+    assert intervals[2] > 6.0 and intervals[3] > intervals[2]
+    assert reviews.graduated(reviews.record('a', Q1, True, now=NOW))
+
+    wrong = reviews.record('a', Q1, False, now=NOW)
+    assert (wrong.interval, wrong.repetitions, wrong.due) == (1.0, 0, NOW)
+
+
+def test_next_due_orders_by_due_time(tmp_path):
+    _, reviews = scheduler(tmp_path)
+    # 错题本中还没有复习状态的题目立即到期
+    assert sorted(reviews.next_due('a', 10, now=NOW)) == [Q1, Q2, Q3]
+    reviews.record('a', Q1, True, now=NOW)
+    reviews.record('a', Q2, True, now=NOW - DAY)
+    assert reviews.next_due('a', 10, now=NOW) == [Q3, Q2]
+    assert reviews.next_due('a', 10, chapter=2, now=NOW) == [Q3]
+    assert reviews.next_due('a', 10, now=NOW + 2 * DAY) == [Q3, Q2, Q1]
+    assert reviews.next_review_time('a') == 0.0
+
+
+def test_idle_queues_are_reloaded_from_storage(tmp_path):
+    storage, reviews = scheduler(tmp_path, max_users=1)
+    state = reviews.record('a', Q1, True, now=NOW)
+    reviews.next_due('b', now=NOW)
+    # 超出数量时最久未使用的堆被丢弃，再次访问时状态从存储载入
+    assert list(reviews._queues) == ['b']
+    assert reviews.queue('a').states[Q1].due == state.due
+    assert Q1 not in reviews.next_due('a', 10, now=NOW)
+
+    idle = ReviewScheduler(storage, idle_seconds=0)
+    idle.queue('a')
+    idle.queue('b')
+    assert list(idle._queues) == ['b']
@@ -0,0 +1,56 @@
+import pytest
+
+from question_store import Question, QuestionStore, question_id
+from search_index import SearchIndex, index_path, load_index, open_index, query_terms
+
+QUESTIONS = QuestionStore([
+    Question(1, 1, '梅花属于（ ）。', ('蔷薇科', '木兰科', '豆科', '菊科'), 0),
+    Question(1, 2, '睡莲属于（ ）。', ('浮叶植物', '浮水植物', '挺水植物', '沉水植物'), 1),
+    Question(2, 1, '下列属于蔷薇科的是（ ）。', ('梅花', '玉兰', '合欢', '菊花'), 0),
+    Question(2, 2, '银杏是（ ）。', ('常绿乔木', '灌木', '落叶乔木', '藤本'), 2),
+])
+
+
+def found(index, query, chapter=None):
+    return [index.qids[doc] for doc, _ in index.search(query, chapter)]
+
+
+def test_query_terms():
+    # 两个字以上只用二元组；全角字符和大小写先统一
+    assert query_terms('梅花 属于') == {'梅花', '属于'}
+    assert query_terms('ＡＢ') == {'ab'}
+    assert query_terms('梅') == {'梅'}
+
+
+def test_stem_ranks_above_option():
+    index = SearchIndex.build(QUESTIONS)
+    # 题干中的“梅花”比选项中的权重高
+    assert found(index, '梅花') == [question_id(1, 1), question_id(2, 1)]
+    assert found(index, '梅花', chapter=2) == [question_id(2, 1)]
+    assert found(index, '蔷薇', chapter=3) == []
+    assert found(index, '松柏') == []
+
+
+@pytest.mark.parametrize('mapped', [False, True])
+def test_saved_index_matches_built_index(tmp_path, mapped):
+    source = tmp_path / 'quiz.md'
+    source.write_text('题库', encoding='utf-8')
+    built = load_index(source, QUESTIONS)
+    assert index_path(source).exists()
+
+    index = open_index(source, mapped)
+    assert index is not None
+    for query in ('梅花', '水植物', '乔木', '梅'):
+        assert index.search(query) == built.search(query)
+
+
+def test_stale_index_is_rebuilt(tmp_path):
+    source = tmp_path / 'quiz.md'
+    source.write_text('题库', encoding='utf-8')
+    load_index(source, QUESTIONS)
+    source.write_text('新的题库', encoding='utf-8')
+    assert open_index(source) is None
+
+    index = load_index(source, QUESTIONS.in_chapter(2))
+    assert list(index.qids) == [question_id(2, 1), question_id(2, 2)]
+    assert open_index(source) is not None
@@ -0,0 +1,89 @@
+import base64
+import struct
+
+import pytest
+
+import session_token
+from session_token import FLAG_COMPRESSED, HEADER, InvalidToken, SessionToken, sign_user, verify_user
+
+KEY = b'test-key'
+IDS = list(range(1 << 20, (1 << 20) + 40))
+
+
+@pytest.fixture(autouse=True)
+def fixed_key(monkeypatch):
+    monkeypatch.setattr(session_token, '_key', KEY)
+
+
+def raw(token):
+    return bytearray(base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)))
+
+
+def test_round_trip():
+    token = SessionToken.start(0xFFFFFFFF, IDS, chapter=1)
+    for position, correct in [(0, True), (1, False), (3, True)]:
+        token.record(position, correct)
+
+    decoded = SessionToken.decode(token.encode())
+    assert decoded.matches(IDS)
+    assert (decoded.seed, decoded.chapter, decoded.total) == (0xFFFFFFFF, 1, len(IDS))
+    # 第 2 道（位置 2）还没有作答
+    assert decoded.position == 2
+    assert (decoded.answered_count, decoded.score) == (3, 2)
+    assert list(decoded.wrong_positions()) == [1]
+    assert [decoded.is_answered(i) for i in range(4)] == [True, True, False, True]
+
+    decoded.record(2, False)
+    assert decoded.position == 4
+    assert list(decoded.wrong_positions()) == [1, 2]
+
+
+def test_large_session_is_compressed():
+    ids = list(range(10000))
+    token = SessionToken.start(7, ids)
+    token.record(9999, True)
+    value = token.encode()
+    assert raw(value)[1] & FLAG_COMPRESSED
+    decoded = SessionToken.decode(value)
+    assert decoded.is_correct(9999) and decoded.position == 0 and decoded.chapter is None
+
+
+def test_seed_must_fit_in_u32():
+    with pytest.raises(struct.error):
+        SessionToken.start(1 << 32, IDS).encode()
+
+
+@pytest.mark.parametrize('offset', [0, 2, HEADER.size, -1])
+def test_tampered_token_is_rejected(offset):
+    data = raw(SessionToken.start(42, IDS).encode())
+    data[offset] ^= 1
+    with pytest.raises(InvalidToken):
+        SessionToken.decode(base64.urlsafe_b64encode(bytes(data)).decode('ascii'))
+
+
+@pytest.mark.parametrize('value', ['', 'not a token', '!!!!', None])
+def test_malformed_token_is_rejected(value):
+    with pytest.raises(InvalidToken):
+        SessionToken.decode(value)
+
+
+def test_token_from_other_key_is_rejected():
+    value = SessionToken.start(42, IDS).encode(key=b'other-key')
+    with pytest.raises(InvalidToken):
+        SessionToken.decode(value)
+
+
+def test_changed_bank_does_not_match():
+    decoded = SessionToken.decode(SessionToken.start(42, IDS).encode())
+    assert not decoded.matches(IDS[:-1])
+    assert not decoded.matches(IDS[:-1] + [IDS[-1] + 1])
+
+
+def test_user_signature():
+    value = sign_user('u-abc')
+    assert verify_user(value) == 'u-abc'
+    assert verify_user('u-abd.' + value.rpartition('.')[2]) is None
+    assert verify_user(value[:-1]) is None
+    assert verify_user('u-abc.签名') is None
+    assert verify_user('') is None
+    assert verify_user(None) is None
@@ -0,0 +1,81 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import quiz_app
+import shared_bank
+from question_store import question_id
+from search_index import index_path, open_index
+from shared_bank import SEQUENCE, SEQUENCE_OFFSET, SharedBank, bank_file, publish, shared_directory
+from test_api import BANK, make_app
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / 'quiz.md'
+    path.write_text('\n'.join(BANK) + '\n', encoding='utf-8')
+    return path
+
+
+def test_shared_directory():
+    assert shared_directory('0') is None and shared_directory(False) is None
+    assert shared_directory('1') == shared_directory(True) == shared_bank.default_directory()
+    assert str(shared_directory('/srv/bank')) == '/srv/bank'
+
+
+def test_publish_and_read(tmp_path, source):
+    directory = tmp_path / 'shared'
+    reader = SharedBank(directory)
+    assert reader.current() is None
+
+    assert publish(source, directory) == 1
+    path, number, count = reader.signature()
+    assert (path, number, count) == (str(bank_file(directory, 1)), 1, 4)
+    questions = reader.open(path)
+    assert [q.id for q in questions] == [question_id(1, n) for n in range(1, 5)]
+    assert questions.get(question_id(1, 2)).text == '睡莲属于（ ）。'
+    # 搜索索引随版本一起发布
+    assert open_index(bank_file(directory, 1)) is not None
+    # 源文件没有变化时不重新发布
+    assert publish(source, directory) == 1
+    reader.close()
+
+
+def test_new_versions_replace_old_ones(tmp_path, source):
+    directory = tmp_path / 'shared'
+    reader = SharedBank(directory)
+    for number in range(1, 4):
+        assert publish(source, directory, force=True) == number
+        assert reader.current()[0] == number
+    # 只保留最近 KEEP 个版本
+    assert not bank_file(directory, 1).exists()
+    assert not index_path(bank_file(directory, 1)).exists()
+    assert bank_file(directory, 2).exists() and bank_file(directory, 3).exists()
+    reader.close()
+
+
+def test_reader_skips_header_being_written(tmp_path, source, monkeypatch):
+    directory = tmp_path / 'shared'
+    publish(source, directory)
+    header = shared_bank._open_header(directory)
+    reader = SharedBank(directory)
+    monkeypatch.setattr(shared_bank.time, 'sleep', lambda seconds: None)
+    try:
+        # 写到一半（序号为奇数）时读者不采用
+        (sequence,) = SEQUENCE.unpack_from(header, SEQUENCE_OFFSET)
+        SEQUENCE.pack_into(header, SEQUENCE_OFFSET, sequence + 1)
+        assert reader.current() is None
+        # 上次发布中途退出后，下一次发布仍能写出完整的控制头
+        assert publish(source, directory, force=True) == 2
+        assert reader.current()[0] == 2
+    finally:
+        reader.close()
+        header.close()
+
+
+def test_app_serves_shared_bank(tmp_path, monkeypatch):
+    app = make_app(tmp_path, monkeypatch, ('\n'.join(BANK) + '\n').encode('utf-8'), shared=tmp_path / 'shared')
+    with TestClient(app) as client:
+        assert isinstance(quiz_app.bank_cache, quiz_app.SharedBankCache)
+        assert bank_file(tmp_path / 'shared', 1).exists()
+        assert len(client.get('/api/questions').json()['questions']) == 4
+        assert quiz_app.bank_cache.stats()['shared']['version'] == 1
@@ -0,0 +1,28 @@
+from question_store import Question
+from shuffle_service import (LAYOUTS, PERMUTATIONS, SessionShuffle, option_permutation, present,
+                             shuffle_questions, shuffled_letter)
+
+
+def test_option_permutation_is_deterministic():
+    perms = [option_permutation(12345, qid) for qid in range(1000)]
+    assert perms == [option_permutation(12345, qid) for qid in range(1000)]
+    assert all(0 <= p < len(PERMUTATIONS) for p in perms)
+    # 相邻的题目id也要分散到各种排列上
+    assert len(set(perms)) == len(PERMUTATIONS)
+    assert perms != [option_permutation(12346, qid) for qid in range(1000)]
+
+
+def test_session_shuffle_matches_list_shuffle():
+    ids = list(range(1 << 20, (1 << 20) + 50))
+    session = SessionShuffle(99, ids)
+    assert session.order.tolist() == shuffle_questions(99, ids)
+    assert session.layouts() == [LAYOUTS[option_permutation(99, qid)] for qid in session.order]
+
+
+def test_present_maps_answer_to_shown_letter():
+    q = Question(1, 1, '题干', ('甲', '乙', '丙', '丁'), 2)
+    for perm in range(len(PERMUTATIONS)):
+        shown = present(q, perm)
+        assert shown['options'][shown['correct_answer']] == '丙'
+        assert shown['correct_answer'] == shuffled_letter(perm, 2)
+        assert 'correct_answer' not in present(q, perm, reveal=False)
@@ -0,0 +1,128 @@
+import json
+import sqlite3
+
+import pytest
+
+from storage import LEGACY_JOURNAL, SCHEMA_VERSION, import_legacy_files, open_storage
+
+# 第一版数据库的建表语句：answers 没有 elapsed 列，也没有 reviews 表
+SCHEMA_V1 = """
+CREATE TABLE sessions (
+    id INTEGER PRIMARY KEY, user TEXT NOT NULL, seed INTEGER NOT NULL, chapter INTEGER NOT NULL DEFAULT 0,
+    total INTEGER NOT NULL, score INTEGER NOT NULL DEFAULT 0, current_question INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'active', created REAL NOT NULL, updated REAL NOT NULL
+);
+CREATE TABLE answers (
+    id INTEGER PRIMARY KEY, session_id INTEGER NOT NULL, user TEXT NOT NULL, qid INTEGER NOT NULL,
+    answer TEXT NOT NULL, correct INTEGER NOT NULL, position INTEGER NOT NULL, ts REAL NOT NULL
+);
+CREATE TABLE wrong_questions (
+    user TEXT NOT NULL, qid INTEGER NOT NULL, chapter INTEGER NOT NULL, entry TEXT NOT NULL,
+    correct_count INTEGER NOT NULL DEFAULT 0, updated REAL NOT NULL, PRIMARY KEY (user, qid)
+) WITHOUT ROWID;
+INSERT INTO sessions VALUES (1, 'local', 7, 1, 10, 1, 1, 'saved', 0, 0);
+INSERT INTO answers VALUES (1, 1, 'local', 1048577, 'A', 1, 0, 0);
+INSERT INTO wrong_questions VALUES ('local', 1048578, 1, '{"chapter": 1, "number": 2}', 0, 0);
+PRAGMA user_version = 1;
+"""
+
+
+def test_migrates_v1_database(tmp_path):
+    path = tmp_path / 'quiz.db'
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA_V1)
+    conn.close()
+
+    storage = open_storage(path)
+    try:
+        assert not storage.is_new
+        assert storage._connection().execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+        # 原有数据保留
+        assert storage.get_session(1)['score'] == 1
+        assert storage.session_answers(1) == {1048577: 'A'}
+        assert list(storage.wrong_questions('local')) == ['1-2']
+        # 新增的列和表可以使用
+        storage.record_answer(1, 1048578, 'B', False, 1, elapsed=2.5)
+        stats = {row[0]: tuple(row[1:]) for row in storage.answer_stats('local')}
+        assert stats == {1048577: (1, 0, 0, 0.0), 1048578: (1, 1, 1, 2.5)}
+        storage.save_review('local', 1048578, 2.5, 1.0, 0, 1, 100.0)
+        assert len(storage.review_states('local')) == 1
+    finally:
+        storage.close()
+
+    # 再次打开时不重复迁移
+    storage = open_storage(path)
+    assert storage.get_session(1)['current_question'] == 2
+    storage.close()
+
+
+def test_new_database_is_current(tmp_path):
+    storage = open_storage(tmp_path / 'quiz.db')
+    assert storage.is_new
+    assert storage._connection().execute('PRAGMA user_version').fetchone()[0] == SCHEMA_VERSION
+    storage.close()
+
+
+def test_failed_commit_rolls_back(tmp_path):
+    storage = open_storage(tmp_path / 'quiz.db')
+    conn = storage._connection()
+    conn.execute('PRAGMA foreign_keys = ON')
+    conn.execute('CREATE TABLE parent (id INTEGER PRIMARY KEY)')
+    conn.execute('CREATE TABLE child (parent INTEGER REFERENCES parent (id) DEFERRABLE INITIALLY DEFERRED)')
+    # 延迟检查的外键到 COMMIT 时才失败
+    with pytest.raises(sqlite3.IntegrityError):
+        with storage._transaction() as tx:
+            tx.execute('INSERT INTO child VALUES (1)')
+    assert not conn.in_transaction
+    sid = storage.start_session('local', 1, 10)
+    assert storage.get_session(sid)['total'] == 10
+    storage.close()
+
+
+def test_legacy_progress_without_seed_is_not_resumable(tmp_path):
+    (tmp_path / 'quiz_progress_20240101_120000.json').write_text(
+        json.dumps({'total': 100, 'score': 3, 'current_question': 5}), encoding='utf-8')
+    (tmp_path / 'auto_save.json').write_text(
+        json.dumps({'total': 100, 'score': 1, 'current_question': 2}), encoding='utf-8')
+    storage = open_storage(tmp_path / 'quiz.db')
+    assert import_legacy_files(storage, 'local', str(tmp_path)) == []
+    # 没有种子的旧进度按原题库顺序作答，只作为已结束的记录保留
+    assert storage.list_sessions('local') == []
+    assert storage.active_session('local') is None
+    finished = storage.list_sessions('local', statuses=('finished',))
+    assert sorted((s['score'], s['current_question']) for s in finished) == [(1, 2), (3, 5)]
+    storage.close()
+
+
+def test_legacy_journal_progress_with_seed_is_resumable(tmp_path):
+    (tmp_path / LEGACY_JOURNAL).write_text(
+        json.dumps({'seq': 1, 'op': 'start', 'seed': 42, 'total': 10, 'score': 0, 'current_question': 0}) + '\n'
+        + json.dumps({'seq': 2, 'op': 'answer', 'correct': 1, 'position': 0}) + '\n', encoding='utf-8')
+    storage = open_storage(tmp_path / 'quiz.db')
+    assert import_legacy_files(storage, 'local', str(tmp_path)) == []
+    active = storage.active_session('local')
+    assert (active['seed'], active['score'], active['current_question']) == (42, 1, 1)
+    storage.close()
+
+
+def test_corrupt_legacy_files_are_skipped(tmp_path):
+    (tmp_path / 'quiz_progress_20240101_120000.json').write_text('{"total": 10', encoding='utf-8')
+    (tmp_path / 'wrong_questions.json').write_text(json.dumps({
+        '1-2': {'chapter': 1, 'number': 2},
+        'x-y': {'chapter': 1},
+        '7': {'number': 7},
+        '3': 'not an entry',
+    }), encoding='utf-8')
+    (tmp_path / 'auto_save.json').write_text('null{', encoding='utf-8')
+    storage = open_storage(tmp_path / 'quiz.db')
+    warnings = import_legacy_files(storage, 'local', str(tmp_path))
+    assert len(warnings) == 5
+    assert list(storage.wrong_questions('local')) == ['1-2']
+    storage.close()
+
+    # 整个错题本无法解析时同样跳过
+    (tmp_path / 'wrong_questions.json').write_text('[', encoding='utf-8')
+    storage = open_storage(tmp_path / 'other.db')
+    assert any('错题本' in w for w in import_legacy_files(storage, 'local', str(tmp_path)))
+    assert storage.wrong_questions('local') == {}
+    storage.close()
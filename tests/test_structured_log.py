@@ -0,0 +1,90 @@
+import io
+import json
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import structured_log
+from structured_log import RequestLogMiddleware, begin_request, configure, end_request, get_logger, request_id
+
+
+@pytest.fixture
+def output(monkeypatch):
+    """quiz 记录器的输出流，测试结束后还原记录器配置"""
+    logger = logging.getLogger(structured_log.ROOT)
+    saved = logger.handlers[:], logger.level, logger.propagate
+    monkeypatch.setattr(structured_log, '_sample_rate', structured_log._sample_rate)
+    yield io.StringIO()
+    logger.handlers[:], logger.level, logger.propagate = saved
+
+
+def lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_fields_and_request_id(output):
+    configure(stream=output, level='INFO', sample=1.0)
+    log = get_logger('test')
+    log.debug('hidden')
+    log.info('bank loaded', questions=3)
+    rid, tokens = begin_request('abc-1')
+    try:
+        assert request_id() == 'abc-1'
+        log.warning('slow', ms=12.5)
+    finally:
+        end_request(tokens)
+    assert request_id() is None
+
+    first, second = lines(output)
+    assert (first['level'], first['logger'], first['msg'], first['questions']) == ('INFO', 'quiz.test', 'bank loaded', 3)
+    assert 'request_id' not in first
+    assert (second['request_id'], second['ms']) == ('abc-1', 12.5)
+
+
+def test_invalid_request_id_is_replaced():
+    rid, tokens = begin_request('bad id\n')
+    end_request(tokens)
+    assert rid != 'bad id\n' and len(rid) == 16
+
+
+def test_unsampled_request_keeps_warnings(output):
+    configure(stream=output, level='INFO', sample=0.0)
+    log = get_logger('test')
+    log.info('outside a request')
+    rid, tokens = begin_request()
+    try:
+        log.info('dropped')
+        log.error('kept')
+    finally:
+        end_request(tokens)
+    assert [entry['msg'] for entry in lines(output)] == ['outside a request', 'kept']
+
+
+def test_configure_replaces_handler(output):
+    configure(stream=output, level='INFO', sample=1.0)
+    configure(stream=output, level='INFO', sample=1.0)
+    get_logger('test').info('once')
+    assert len(lines(output)) == 1
+
+
+def test_middleware_logs_each_request(output):
+    configure(stream=output, level='INFO', sample=1.0)
+    app = FastAPI()
+
+    @app.get('/ok')
+    def ok():
+        get_logger('api').info('handled')
+        return {'status': 'ok'}
+
+    app.add_middleware(RequestLogMiddleware)
+    with TestClient(app) as client:
+        response = client.get('/ok', headers={'X-Request-ID': 'req-42'})
+        generated = client.get('/missing').headers['x-request-id']
+    assert response.headers['x-request-id'] == 'req-42'
+
+    handled, first, second = lines(output)
+    assert handled['msg'] == 'handled' and handled['request_id'] == 'req-42'
+    assert (first['msg'], first['path'], first['status'], first['request_id']) == ('request', '/ok', 200, 'req-42')
+    assert (second['status'], second['request_id']) == (404, generated)
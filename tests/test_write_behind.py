@@ -0,0 +1,106 @@
+import asyncio
+import threading
+
+import pytest
+
+from question_store import id_key, question_id
+from storage import SQLiteStorage
+from write_behind import QueueFull, WrongQuestionWriter
+
+Q1, Q2 = question_id(1, 1), question_id(1, 2)
+
+
+class CountingStorage(SQLiteStorage):
+    """记录每次批量写入；release 未设置时写入一直等待"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.batches = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def write_wrong_batch(self, updates):
+        self.release.wait()
+        self.batches.append(updates)
+        super().write_wrong_batch(updates)
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return CountingStorage(tmp_path / 'quiz.db')
+
+
+def test_updates_are_coalesced(storage):
+    async def main():
+        writer = WrongQuestionWriter(storage, linger=0.05)
+        await writer.submit('a', {Q1: {'your_answer': 'A'}})
+        await writer.submit('a', {Q1: {'your_answer': 'B'}, Q2: {'your_answer': 'C'}})
+        await writer.submit('b', {Q1: {'your_answer': 'D'}})
+        # 还没写入时读取也能看到
+        assert (await writer.wrong_questions('a'))[id_key(Q1)]['your_answer'] == 'B'
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(main())
+    assert len(storage.batches) == 1
+    assert storage.batches[0]['a'][Q1] == {'your_answer': 'B'}
+    assert storage.wrong_questions('a')[id_key(Q1)]['your_answer'] == 'B'
+    assert set(storage.wrong_questions('b')) == {id_key(Q1)}
+    assert writer.pending == {}
+
+
+def test_repeated_deletes_do_not_stop_the_writer(storage):
+    storage.set_wrong('a', Q1, {'your_answer': 'A'})
+    storage.batches.clear()
+    storage.release.clear()
+
+    async def main():
+        writer = WrongQuestionWriter(storage, linger=0.01)
+        await writer.submit('a', {Q1: None})
+        # 第一次删除正在写入时又提交一次删除：第一批写完后题目已不在 pending 中，第二批仍要正常收尾
+        await asyncio.sleep(0.05)
+        await writer.submit('a', {Q1: None, Q2: {'your_answer': 'C'}})
+        storage.release.set()
+        await writer.flush()
+        await writer.submit('a', {Q2: None})
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(main())
+    assert len(storage.batches) == 3
+    assert storage.wrong_questions('a') == {}
+    assert writer.pending == {}
+
+
+def test_close_flushes_pending_updates(storage):
+    async def main():
+        writer = WrongQuestionWriter(storage, linger=1.0)
+        await writer.submit('a', {Q1: {'your_answer': 'A'}})
+        await writer.close()
+        with pytest.raises(QueueFull):
+            await writer.submit('a', {Q2: {'your_answer': 'B'}})
+
+    asyncio.run(main())
+    assert list(storage.wrong_questions('a')) == [id_key(Q1)]
+
+
+def test_full_queue_rejects_submit(storage):
+    storage.release.clear()
+
+    async def main():
+        writer = WrongQuestionWriter(storage, max_depth=1, linger=0, put_timeout=0.05)
+        await writer.submit('a', {Q1: {'your_answer': 'A'}})
+        # 第一批被写入任务取走后卡在存储上，队列只能再放一个
+        await asyncio.sleep(0.05)
+        await writer.submit('b', {Q1: {'your_answer': 'B'}})
+        with pytest.raises(QueueFull):
+            await writer.submit('c', {Q1: {'your_answer': 'C'}})
+        # 被拒绝的更新不会留在 pending 中
+        assert 'c' not in writer.pending
+        assert writer.stats['rejected'] == 1
+        storage.release.set()
+        await writer.close()
+
+    asyncio.run(main())
+    assert storage.wrong_questions('c') == {}
+    assert set(storage.wrong_questions('b')) == {id_key(Q1)}
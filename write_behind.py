@@ -0,0 +1,153 @@
+"""错题写入队列
+
+API 收到的错题更新先放进有界的 asyncio 队列，后台任务把一段时间内的更新合并成一个事务写入存储。
+一个班级在测验结束时同时提交，成百上千个请求只需要少数几次事务。
+
+    合并    同一用户同一道题的多次更新只写最后一次；记录为None表示删除，同样经过队列，保证先后顺序
+    有界    队列满时提交方等待，超过 put_timeout 仍放不进去则抛出 QueueFull，由调用方返回“请稍后重试”
+    可读    尚未落盘的更新保存在 pending 中，读取时叠加在存储结果之上，提交后立即可见
+    关闭    close() 停止接收新的更新，并把队列中剩余的更新全部写完
+
+存储写入是同步的，在线程池中执行（executor 为 None 时使用事件循环的默认线程池），不会阻塞事件循环。
+"""
+import asyncio
+
+from question_store import NUMBER_BITS, id_key
+from structured_log import get_logger
+
+log = get_logger('write_behind')
+
+MAX_RETRIES = 5
+
+
+class QueueFull(Exception):
+    """队列已满，提交方应稍后重试"""
+
+
+class WrongQuestionWriter:
+    def __init__(self, storage, max_depth=1000, batch_size=1000, linger=0.05, put_timeout=1.0, executor=None):
+        self.storage = storage
+        self.executor = executor
+        self.max_depth = max_depth
+        self.batch_size = batch_size
+        self.linger = linger
+        self.put_timeout = put_timeout
+        self.pending = {}   # {用户: {题目id: 错题记录}}，已提交但尚未写入存储
+        self.stats = {'submitted': 0, 'batches': 0, 'rows': 0, 'rejected': 0, 'max_depth': 0}
+        self._queue = None
+        self._worker = None
+        self._closed = False
+
+    def start(self):
+        """在当前事件循环中启动后台写入任务（重复调用无影响）"""
+        if self._worker is None:
+            self._queue = asyncio.Queue(self.max_depth)
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, user, entries):
+        """提交一个用户的错题更新，entries 为 {题目id: 错题记录}"""
+        if self._closed:
+            raise QueueFull("写入队列已关闭")
+        self.start()
+        # 先记入 pending 再入队，保证写入完成时总能找到对应的 pending 记录
+        pending = self.pending.setdefault(user, {})
+        pending.update(entries)
+        try:
+            self._queue.put_nowait((user, entries))
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(self._queue.put((user, entries)), self.put_timeout)
+            except asyncio.TimeoutError:
+                self._discard(user, entries)
+                self.stats['rejected'] += 1
+                raise QueueFull("写入队列已满")
+        self.stats['submitted'] += 1
+        self.stats['max_depth'] = max(self.stats['max_depth'], self._queue.qsize())
+
+    async def wrong_questions(self, user, chapter=None):
+        """该用户的错题本：存储中的记录叠加尚未写入的更新"""
+        # 先取 pending 的快照再读存储：读存储期间写完的更新在快照里，不会漏掉
+        pending = dict(self.pending.get(user, {}))
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(self.executor, self.storage.wrong_questions, user, chapter)
+        for qid, entry in pending.items():
+            if chapter is not None and qid >> NUMBER_BITS != chapter:
+                continue
+            if entry is None:
+                result.pop(id_key(qid), None)
+            else:
+                result[id_key(qid)] = dict(entry, correct_count=entry.get('correct_count', 0))
+        return result
+
+    def _discard(self, user, entries):
+        """从 pending 中去掉已写入（或被拒绝）的更新；期间又有新的更新时保留新值"""
+        pending = self.pending.get(user)
+        if pending is None:
+            return
+        for qid, entry in entries.items():
+            # 删除的记录是 None，不能用 pending.get(qid) 比较：题目已不在 pending 中时也会得到 None
+            if qid in pending and pending[qid] is entry:
+                del pending[qid]
+        if not pending:
+            del self.pending[user]
+
+    async def _next_batch(self):
+        """取出一批更新并按(用户, 题目)合并；队列关闭且为空时返回None"""
+        item = await self._queue.get()
+        if item is None:
+            return None
+        items = [item]
+        # 等待一小段时间，把同一波提交合并进同一个事务
+        await asyncio.sleep(self.linger)
+        while len(items) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            if item is None:
+                # 关闭标记放回去，写完这一批后再退出
+                self._queue.put_nowait(None)
+                break
+            items.append(item)
+
+        batch = {}
+        for user, entries in items:
+            batch.setdefault(user, {}).update(entries)
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._next_batch()
+            if batch is None:
+                return
+            # 写入失败时重试几次；重试期间队列会逐渐填满，提交方随之等待
+            for attempt in range(MAX_RETRIES):
+                try:
+                    await loop.run_in_executor(self.executor, self.storage.write_wrong_batch, batch)
+                    break
+                except Exception as e:
+                    log.warning('wrong question write failed', attempt=attempt + 1, error=str(e))
+                    await asyncio.sleep(self.linger * 2 ** attempt)
+            else:
+                log.error('wrong question batch dropped', rows=sum(len(e) for e in batch.values()))
+            self.stats['batches'] += 1
+            for user, entries in batch.items():
+                self.stats['rows'] += len(entries)
+                self._discard(user, entries)
+
+    async def flush(self):
+        """等待当前队列中的更新全部写入"""
+        if self._worker is None:
+            return
+        while self.pending and not self._worker.done():
+            await asyncio.sleep(self.linger)
+
+    async def close(self):
+        """停止接收新的更新，写完队列中剩余的更新后返回"""
+        self._closed = True
+        if self._worker is None:
+            return
+        await self._queue.put(None)
+        await self._worker
+        self._worker = None